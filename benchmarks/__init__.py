@@ -0,0 +1 @@
+"""Performance benchmarks for wkflws_shopify."""
@@ -0,0 +1,135 @@
+"""Compare the memory and time used by each representation of large orders.
+
+Each representation is built from ``orders/{id}.json`` response bodies for orders with
+an increasing number of line items:
+
+- ``validated``: :class:`~wkflws_shopify.schemas.orders.Order`
+- ``trusted``: :func:`~wkflws_shopify.schemas.trusted.trusted_dict`
+- ``compact``: :class:`~wkflws_shopify.schemas.compact.CompactOrder`
+
+The memory is what's still allocated (measured with :mod:`tracemalloc`) while every
+order is held, after the decoded response bodies were released. The throughput is
+the number of orders parsed and encoded as JSON per second.
+
+Usage::
+
+    python -m benchmarks.compact [--line-items 50,500] [--orders N] [--runs N] [--json]
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, NamedTuple
+
+from wkflws_shopify import serialization
+from wkflws_shopify.schemas.compact import CompactOrder
+from wkflws_shopify.schemas.orders import Order
+from wkflws_shopify.schemas.trusted import trusted_dict
+from .fixtures import make_order
+
+
+class Representation(NamedTuple):
+    """How an order is parsed and encoded."""
+
+    #: create the representation from a decoded order
+    parse: Callable[[dict[str, Any]], Any]
+    #: encode the representation as JSON
+    dumps: Callable[[Any], bytes]
+
+
+REPRESENTATIONS: dict[str, Representation] = {
+    "validated": Representation(
+        Order.parse_obj, lambda order: serialization.dumps(order.dict(by_alias=True))
+    ),
+    "trusted": Representation(
+        lambda data: trusted_dict(Order, data), serialization.dumps
+    ),
+    "compact": Representation(CompactOrder.from_dict, CompactOrder.dumps),
+}
+
+
+def measure_memory(bodies: list[bytes], representation: Representation) -> int:
+    """Return the bytes allocated to hold every order in ``bodies``."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        orders = [
+            representation.parse(serialization.loads(body)["order"]) for body in bodies
+        ]
+        gc.collect()
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del orders
+    return allocated
+
+
+def measure_throughput(
+    bodies: list[bytes], representation: Representation, *, runs: int
+) -> float:
+    """Return the median number of orders parsed and encoded per second."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for body in bodies:
+            representation.dumps(
+                representation.parse(serialization.loads(body)["order"])
+            )
+        timings.append(time.perf_counter() - start)
+    return len(bodies) / statistics.median(timings)
+
+
+def run(line_items: int, *, orders: int, runs: int) -> list[dict[str, Any]]:
+    """Measure each representation of ``orders`` orders with ``line_items`` each."""
+    bodies = [
+        json.dumps({"order": make_order(order_id, line_items=line_items)}).encode()
+        for order_id in range(1, orders + 1)
+    ]
+    results = []
+    for name, representation in REPRESENTATIONS.items():
+        results.append(
+            {
+                "line_items": line_items,
+                "representation": name,
+                "bytes_per_order": measure_memory(bodies, representation) // orders,
+                "orders_per_second": round(
+                    measure_throughput(bodies, representation, runs=runs), 1
+                ),
+            }
+        )
+    return results
+
+
+def main(argv=None) -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.compact", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("--line-items", default="50,500")
+    parser.add_argument("--orders", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="output JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for line_items in (int(n) for n in args.line_items.split(",")):
+        results += run(line_items, orders=args.orders, runs=args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            print(
+                f"{r['line_items']:>5} line items {r['representation']:<10} "
+                f"{r['bytes_per_order']:>10} bytes/order "
+                f"{r['orders_per_second']:>10.1f} orders/s"
+            )
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
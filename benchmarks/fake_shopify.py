@@ -0,0 +1,512 @@
+"""Local stand-in for the Shopify Admin API.
+
+The server emulates the parts of Shopify that affect throughput and latency:
+
+- ``/admin/api/{version}/orders/{id}.json`` and the ``orders.json`` and
+  ``customers.json`` list endpoints, paginated with ``Link`` headers
+- the REST leaky bucket, reported in ``X-Shopify-Shop-Api-Call-Limit``, rejecting
+  requests made while it is full with a 429 and ``Retry-After``
+- bursts of 5xx errors (see :meth:`FakeShopify.fail_next`) and a random error rate
+- redirects (see :meth:`FakeShopify.add_redirect`)
+- a configurable response latency
+
+The server runs its own event loop in a background thread so it doesn't compete with
+the client being measured. :func:`send_webhooks` fires signed webhooks at the
+listener's route.
+
+Usage:
+
+.. code::python
+   with FakeShopify(orders=500, latency=0.05) as shopify:
+       await client.request(
+           logger,
+           myshopify_domain=shopify.domain,
+           api_path="/orders/1.json",
+           api_token="abc",
+       )
+
+The server can also be run on its own::
+
+    python -m benchmarks.fake_shopify [--port 8080] [--orders N] [--latency S]
+        [--error-rate R] [--capacity 40] [--leak-rate 2]
+"""
+
+import argparse
+import asyncio
+import base64
+from collections import deque
+import datetime
+import json
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, Iterable, Optional
+import urllib.parse
+
+from wkflws_shopify.http import AsyncHttpClient
+from wkflws_shopify.ratelimit import CALL_LIMIT_HEADER
+from wkflws_shopify.triggers.verify import HMAC_HEADER, sign
+from .fixtures import make_customer, make_order
+
+Response = tuple[int, dict[str, str], bytes]
+
+#: Id of the first order. Order ids are consecutive.
+FIRST_ORDER_ID = 48829967047
+#: Id of the first customer. Customer ids are consecutive.
+FIRST_CUSTOMER_ID = 7913927416923
+#: ``updated_at`` of the first order. Each order was updated a minute after the last.
+FIRST_UPDATED_AT = datetime.datetime.fromisoformat("2022-10-13T14:16:16-04:00")
+#: Default and maximum page size of list endpoints.
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 250
+
+_RESOURCE_PATH = re.compile(
+    r"^/admin/api/(?P<version>[^/]+)/(?P<resource>orders|customers)"
+    r"(?:/(?P<id>\d+))?\.json$"
+)
+
+
+class FakeShopify:
+    """HTTP/1.1 server responding like the Shopify Admin API."""
+
+    def __init__(
+        self,
+        *,
+        orders: int = 100,
+        customers: int = 10,
+        line_items: int = 1,
+        capacity: Optional[int] = 40,
+        leak_rate: float = 2.0,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        """Initialize a new FakeShopify.
+
+        Args:
+            orders: The number of orders in the shop.
+            customers: The number of customers in the shop.
+            line_items: The number of line items of each order.
+            capacity: The size of the leaky bucket. ``None`` disables rate limiting.
+            leak_rate: Requests drained from the bucket per second.
+            latency: Seconds to wait before responding.
+            latency_jitter: Maximum random seconds added to ``latency``.
+            error_rate: Fraction of requests answered with ``error_status``.
+            error_status: The status of the random errors.
+            seed: Seed for the latency jitter and random errors.
+            host: The address to listen on.
+            port: The port to listen on. *Default is any free port.*
+        """
+        self.line_items = line_items
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.host = host
+        self.port = port
+
+        #: The shop's orders mapped to their id.
+        self.orders: dict[int, dict[str, Any]] = {}
+        for i in range(orders):
+            self.add_order(FIRST_ORDER_ID + i, updated_at=_minutes_after_first(i))
+        #: The shop's customers mapped to their id.
+        self.customers: dict[int, dict[str, Any]] = {
+            FIRST_CUSTOMER_ID + i: make_customer(FIRST_CUSTOMER_ID + i)
+            for i in range(customers)
+        }
+        #: Paths which are redirected mapped to their status and location.
+        self.redirects: dict[str, tuple[int, str]] = {}
+
+        #: Number of requests received.
+        self.request_count = 0
+        #: Number of requests rejected because the bucket was full.
+        self.throttled_count = 0
+        #: Each request received as a tuple of method and path.
+        self.requests: list[tuple[str, str]] = []
+
+        self._rng = random.Random(seed)
+        self._failures: deque[int] = deque()
+        self._bucket_level = 0.0
+        self._bucket_updated_at = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._writers: set[asyncio.StreamWriter] = set()
+
+    @property
+    def domain(self) -> str:
+        """The ``host:port`` of the server, used in place of a myshopify domain."""
+        return f"{self.host}:{self.port}"
+
+    def add_order(self, order_id: int, **fields: Any) -> dict[str, Any]:
+        """Add (or replace) an order.
+
+        Args:
+            order_id: The order's id.
+            fields: Values replacing those of the generated order.
+        """
+        order = self.orders[order_id] = make_order(order_id, line_items=self.line_items)
+        order.update(fields)
+        return order
+
+    def fail_next(self, count: int, status: int = 503):
+        """Respond to the next ``count`` requests with ``status``."""
+        self._failures.extend([status] * count)
+
+    def fill(self, level: float):
+        """Set the fill of the leaky bucket, as if other apps had used the shop."""
+        self._bucket_level = level
+        self._bucket_updated_at = time.monotonic()
+
+    def add_redirect(self, path: str, location: str, status: int = 301):
+        """Redirect requests for ``path`` (without the query string) to ``location``."""
+        self.redirects[path] = (status, location)
+
+    def route(
+        self, method: str, path: str, headers: dict[str, str], body: bytes
+    ) -> Response:
+        """Return the status, headers and body of the response to a request."""
+        parts = urllib.parse.urlsplit(path)
+        match = _RESOURCE_PATH.match(parts.path)
+        if method != "GET" or match is None:
+            return json_response({"errors": "Not Found"}, status=404)
+
+        resource = match["resource"]
+        records = self.orders if resource == "orders" else self.customers
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        fields = query["fields"].split(",") if "fields" in query else None
+
+        if match["id"] is not None:
+            record = records.get(int(match["id"]))
+            if record is None:
+                return json_response({"errors": "Not Found"}, status=404)
+            return json_response({resource[:-1]: _only(record, fields)})
+
+        return self._list(parts.path, resource, records.values(), query, fields=fields)
+
+    def _list(
+        self,
+        path: str,
+        key: str,
+        records: Iterable[dict[str, Any]],
+        query: dict[str, str],
+        *,
+        fields: Optional[list[str]],
+    ) -> Response:
+        """Return a page of ``records``."""
+        try:
+            limit = min(int(query.get("limit", DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            return json_response({"errors": "Invalid limit"}, status=400)
+
+        if "page_info" in query:
+            # Like Shopify, filters can't be changed once paginating.
+            try:
+                cursor = json.loads(base64.urlsafe_b64decode(query["page_info"]))
+            except ValueError:
+                return json_response({"errors": "Invalid page_info"}, status=400)
+            offset, filters = cursor["offset"], cursor["filters"]
+        else:
+            offset = 0
+            filters = {
+                k: v
+                for k, v in query.items()
+                if k in ("ids", "updated_at_min", "status", "order")
+            }
+
+        selected = list(records)
+        if "ids" in filters:
+            ids = {int(i) for i in filters["ids"].split(",") if i}
+            selected = [r for r in selected if r["id"] in ids]
+        if "updated_at_min" in filters:
+            updated_at_min = datetime.datetime.fromisoformat(filters["updated_at_min"])
+            selected = [
+                r
+                for r in selected
+                if datetime.datetime.fromisoformat(r["updated_at"]) >= updated_at_min
+            ]
+        sort_field, _, direction = filters.get("order", "id asc").partition(" ")
+        selected.sort(
+            key=lambda r: (
+                (
+                    datetime.datetime.fromisoformat(r[sort_field])
+                    if sort_field.endswith("_at")
+                    else r[sort_field]
+                ),
+                r["id"],
+            ),
+            reverse=direction == "desc",
+        )
+
+        page = selected[offset : offset + limit]  # noqa: E203 # black formatting
+        links = []
+        if offset + limit < len(selected):
+            links.append(self._link(path, limit, offset + limit, filters, "next"))
+        if offset > 0:
+            links.append(
+                self._link(path, limit, max(0, offset - limit), filters, "previous")
+            )
+
+        return json_response(
+            {key: [_only(r, fields) for r in page]},
+            headers={"Link": ", ".join(links)} if links else None,
+        )
+
+    def _link(
+        self, path: str, limit: int, offset: int, filters: dict[str, str], rel: str
+    ) -> str:
+        cursor = json.dumps({"offset": offset, "filters": filters}).encode("utf-8")
+        query = urllib.parse.urlencode(
+            {"limit": limit, "page_info": base64.urlsafe_b64encode(cursor).decode()}
+        )
+        return f'<http://{self.domain}{path}?{query}>; rel="{rel}"'
+
+    async def respond(
+        self, method: str, path: str, headers: dict[str, str], body: bytes
+    ) -> Response:
+        """Return the response to a request.
+
+        Latency, rate limiting, errors and redirects are applied before the request
+        is passed to :meth:`route`.
+        """
+        delay = self.latency + self._rng.random() * self.latency_jitter
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        rate_limit_headers: dict[str, str] = {}
+        if self.capacity is not None and not path.endswith("/graphql.json"):
+            now = time.monotonic()
+            self._bucket_level = max(
+                0.0,
+                self._bucket_level - (now - self._bucket_updated_at) * self.leak_rate,
+            )
+            self._bucket_updated_at = now
+
+            if self._bucket_level + 1 > self.capacity:
+                self.throttled_count += 1
+                retry_after = (self._bucket_level + 1 - self.capacity) / self.leak_rate
+                return json_response(
+                    {"errors": "Exceeded 2 calls per second for api client."},
+                    status=429,
+                    headers={
+                        "Retry-After": f"{retry_after:.2f}",
+                        CALL_LIMIT_HEADER: f"{self.capacity}/{self.capacity}",
+                    },
+                )
+            self._bucket_level += 1
+            rate_limit_headers[CALL_LIMIT_HEADER] = (
+                f"{int(self._bucket_level + 0.5)}/{self.capacity}"
+            )
+
+        if self._failures:
+            status: Optional[int] = self._failures.popleft()
+        elif self.error_rate and self._rng.random() < self.error_rate:
+            status = self.error_status
+        else:
+            status = None
+        if status is not None:
+            return json_response(
+                {"errors": "Internal Server Error"},
+                status=status,
+                headers=rate_limit_headers,
+            )
+
+        redirect = self.redirects.get(urllib.parse.urlsplit(path).path)
+        if redirect is not None:
+            return redirect[0], {"Location": redirect[1], **rate_limit_headers}, b""
+
+        status, response_headers, response_body = self.route(
+            method, path, headers, body
+        )
+        return status, {**response_headers, **rate_limit_headers}, response_body
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    k, _, v = line.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length") or 0)
+                body = await reader.readexactly(length) if length else b""
+
+                self.request_count += 1
+                self.requests.append((method, path))
+                status, response_headers, response_body = await self.respond(
+                    method, path, headers, body
+                )
+                lines = [f"HTTP/1.1 {status} Fake"]
+                lines += [f"{k}: {v}" for k, v in response_headers.items()]
+                lines.append(f"Content-Length: {len(response_body)}")
+                writer.write(
+                    ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + response_body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def start(self):
+        """Start the server in a background thread."""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+            self._server.close()
+            # Close the connections still open and wait for their handlers to finish.
+            for writer in self._writers:
+                writer.close()
+            tasks = asyncio.all_tasks(self._loop)
+            if tasks:
+                self._loop.run_until_complete(
+                    asyncio.gather(*tasks, return_exceptions=True)
+                )
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop(self):
+        """Stop the server."""
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = self._thread = None
+
+    def __enter__(self) -> "FakeShopify":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _minutes_after_first(minutes: int) -> str:
+    """Return the ``updated_at`` of an order updated ``minutes`` after the first."""
+    return (FIRST_UPDATED_AT + datetime.timedelta(minutes=minutes)).isoformat()
+
+
+def _only(record: dict[str, Any], fields: Optional[list[str]]) -> dict[str, Any]:
+    """Return ``fields`` of ``record`` (all fields if ``None``)."""
+    if fields is None:
+        return record
+    return {k: v for k, v in record.items() if k in fields}
+
+
+def json_response(
+    data: Any, status: int = 200, headers: Optional[dict[str, str]] = None
+) -> Response:
+    """Build a JSON response."""
+    return (
+        status,
+        {"Content-Type": "application/json", **(headers or {})},
+        json.dumps(data).encode("utf-8"),
+    )
+
+
+async def send_webhooks(
+    url: str,
+    webhooks: Iterable[tuple[dict[str, str], str]],
+    *,
+    secret: Optional[str] = None,
+    concurrency: int = 10,
+    client: Optional[AsyncHttpClient] = None,
+) -> list[tuple[int, float]]:
+    """POST webhooks to the listener at ``url``.
+
+    Args:
+        url: The URL of the listener's webhook route (e.g.
+            ``http://127.0.0.1:8000/shopify/webhook/``)
+        webhooks: The headers and body of each webhook (see
+            :func:`benchmarks.fixtures.make_webhook_burst`).
+        secret: Sign each webhook with this secret.
+        concurrency: The maximum number of webhooks sent at once.
+        client: The client used to send the webhooks.
+
+    Returns:
+        The status code and number of seconds taken by each webhook.
+    """
+    http_client = client or AsyncHttpClient(max_connections_per_shop=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(headers: dict[str, str], body: str) -> tuple[int, float]:
+        encoded = body.encode("utf-8")
+        headers = {**headers, "Content-Type": "application/json"}
+        if secret is not None:
+            headers[HMAC_HEADER] = sign(secret, encoded)
+        async with semaphore:
+            started_at = time.perf_counter()
+            response = await http_client.fetch(
+                "POST", url, headers=headers, body=encoded
+            )
+            return response.status_code, time.perf_counter() - started_at
+
+    try:
+        return list(await asyncio.gather(*(send(h, b) for h, b in webhooks)))
+    finally:
+        if client is None:
+            http_client.close()
+
+
+def main(argv=None) -> int:
+    """Run the server until interrupted."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.fake_shopify", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--orders", type=int, default=100)
+    parser.add_argument("--line-items", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--capacity", type=int, default=40, help="0 disables limits")
+    parser.add_argument("--leak-rate", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    shopify = FakeShopify(
+        orders=args.orders,
+        line_items=args.line_items,
+        capacity=args.capacity or None,
+        leak_rate=args.leak_rate,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        host=args.host,
+        port=args.port,
+    )
+    with shopify:
+        print(f"Listening on http://{shopify.domain}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""Generate synthetic Shopify payloads for the benchmarks.
+
+Payloads are deterministic for a given set of arguments so results can be compared
+between runs.
+"""
+
+import json
+from typing import Any
+
+
+def make_address(n: int = 0) -> dict[str, Any]:
+    """Return a Shopify address payload."""
+    return {
+        "address1": f"{100 + n} Fake Street",
+        "address2": "",
+        "city": "Oak Lawn",
+        "province": "Illinois",
+        "province_code": "IL",
+        "zip": "60453",
+        "country": "United States",
+        "country_code": "US",
+        "latitude": "41.725390",
+        "longitude": "-87.750750",
+        "name": "John Smith",
+        "first_name": "John",
+        "last_name": "Smith",
+        "phone": "(555) 123-4567",
+        "company": "",
+    }
+
+
+def make_customer(
+    customer_id: int = 7913927416923, *, addresses: int = 0
+) -> dict[str, Any]:
+    """Return a Shopify customer payload with ``addresses`` saved addresses."""
+    return {
+        "addresses": [make_address(i) for i in range(addresses)],
+        "currency": "USD",
+        "created_at": "2022-06-28T16:00:44-04:00",
+        "default_address": make_address(),
+        "email": "jsmith@gmail.com",
+        "email_marketing_consent": {
+            "state": "subscribed",
+            "opt_in_level": "single_opt_in",
+            "consent_updated_at": None,
+        },
+        "first_name": "John",
+        "id": customer_id,
+        "last_name": "Smith",
+        "last_order_id": 6869967970482,
+        "last_order_name": "22520",
+        "phone": None,
+        "sms_marketing_consent": None,
+        "state": "enabled",
+        "tags": "wholesale,vip",
+        "tax_exempt": False,
+        "total_spent": "814.37",
+        "verified_email": True,
+    }
+
+
+def make_line_item(n: int = 0, *, tax_lines: int = 2) -> dict[str, Any]:
+    """Return a Shopify line item payload with ``tax_lines`` taxes."""
+    return {
+        "id": 62103096238871 + n,
+        "price": f"{10 + n % 90}.99",
+        "product_id": 8672033808842 + n,
+        "quantity": 1 + n % 5,
+        "requires_shipping": True,
+        "sku": f"MM-{7482 + n}",
+        "title": f"MultiMaster Tool {n}",
+        "variant_id": 8766203028238 + n,
+        "variant_title": "Blue",
+        "vendor": "CLOSEOUT",
+        "gift_card": False,
+        "total_discount": "0.00",
+        "tax_lines": [
+            {
+                "title": f"Tax {i}",
+                "price": "1.25",
+                "rate": "0.0625",
+                "channel_liable": False,
+            }
+            for i in range(tax_lines)
+        ],
+    }
+
+
+def make_order(
+    order_id: int = 48829967047,
+    *,
+    line_items: int = 1,
+    customer_addresses: int = 0,
+    updated_at: str = "2022-10-13T14:16:16-04:00",
+) -> dict[str, Any]:
+    """Return a Shopify REST order payload.
+
+    Args:
+        order_id: The order's id.
+        line_items: The number of line items.
+        customer_addresses: The number of addresses saved by the customer.
+        updated_at: When the order was last updated.
+    """
+    return {
+        "id": order_id,
+        "billing_address": make_address(),
+        "buyer_accepts_marketing": True,
+        "cancel_reason": None,
+        "cancelled_at": None,
+        "cart_token": "68da1ff222b115cf342211fbf182d5fc",
+        "checkout_token": "8292bbb46d35c9587f9b50a34bdce5e5",
+        "closed_at": None,
+        "created_at": "2022-10-13T14:15:00-04:00",
+        "currency": "USD",
+        "current_total_discounts": "20.00",
+        "current_total_price": "570.08",
+        "current_subtotal_price": "479.99",
+        "current_total_tax": "0.00",
+        "customer": make_customer(addresses=customer_addresses),
+        "email": "jsmith@gmail.com",
+        "landing_site": "/?utm_medium=store-directory&utm_source=summersizzle",
+        "line_items": [make_line_item(i) for i in range(line_items)],
+        "name": str(order_id % 100000),
+        "note": None,
+        "number": 21520,
+        "order_number": 22520,
+        "phone": None,
+        "presentment_currency": "USD",
+        "processed_at": "2022-10-13T14:14:58-04:00",
+        "referring_site": "",
+        "shipping_address": make_address(),
+        "subtotal_price": "479.99",
+        "tags": "wholesale",
+        "taxes_includes": False,
+        "test": False,
+        "token": "a36beeb6d4d334ee3078eb9b564858bc",
+        "total_discounts": "20.00",
+        "total_line_items_price": "499.99",
+        "total_outstanding": "0.00",
+        "total_price": "570.08",
+        "total_tax": "0.00",
+        "total_tip_received": "0.00",
+        "total_weight": 36287,
+        "updated_at": updated_at,
+        "order_status_url": "https://hey.horse/8019189128/orders/a36beeb6d4d334ee3078eb9b564858bc/authenticate",  # noqa: E501
+    }
+
+
+def make_webhook_burst(
+    count: int,
+    *,
+    topic: str = "orders/updated",
+    shop: str = "heyhorse.myshopify.com",
+    orders: int = 10,
+    line_items: int = 5,
+) -> list[tuple[dict[str, str], str]]:
+    """Return the headers and body of ``count`` webhooks about ``orders`` orders.
+
+    Each webhook has a unique webhook id and a newer ``updated_at`` than the previous
+    webhook about the same order.
+    """
+    bodies: dict[int, dict[str, Any]] = {}
+    webhooks = []
+    for i in range(count):
+        order_id = 48829967047 + i % orders
+        if order_id not in bodies:
+            bodies[order_id] = make_order(order_id, line_items=line_items)
+        order = dict(
+            bodies[order_id],
+            updated_at=f"2022-10-13T14:{i // 60 % 60:02}:{i % 60:02}-04:00",
+        )
+        webhooks.append(
+            (
+                {
+                    "x-shopify-topic": topic,
+                    "x-shopify-shop-domain": shop,
+                    "x-shopify-api-version": "2022-04",
+                    "x-shopify-webhook-id": f"00000000-0000-0000-0000-{i:012}",
+                },
+                json.dumps(order),
+            )
+        )
+    return webhooks
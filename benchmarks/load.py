@@ -0,0 +1,205 @@
+"""Measure the throughput and tail latency of the HTTP client and the listener.
+
+``http`` requests orders from a local :class:`~benchmarks.fake_shopify.FakeShopify`
+with :class:`~wkflws_shopify.http.AsyncHttpClient`. The fake can be made slow,
+unreliable or strictly rate limited to see how the client's rate limiter and retries
+behave under contention.
+
+``webhooks`` fires a burst of signed webhooks at a running listener (e.g.
+``wkflws_shopify.triggers.listener`` served by uvicorn).
+
+Usage::
+
+    python -m benchmarks.load http [--requests 500] [--concurrency 20]
+        [--latency 0.05] [--latency-jitter 0.02] [--error-rate 0.01]
+        [--capacity 40] [--leak-rate 2] [--json]
+    python -m benchmarks.load webhooks --url URL [--count 1000] [--concurrency 50]
+        [--secret SECRET] [--json]
+"""
+
+import argparse
+import asyncio
+from collections import Counter
+import json
+from logging import getLogger
+import statistics
+import sys
+import time
+from typing import Any
+
+from wkflws_shopify.http import AsyncHttpClient, HttpError
+from wkflws_shopify.ratelimit import RateLimiter
+from wkflws_shopify.retry import RetryPolicy
+from .fake_shopify import FakeShopify, FIRST_ORDER_ID, send_webhooks
+from .fixtures import make_webhook_burst
+
+logger = getLogger("benchmarks.load")
+
+
+def summarize(
+    latencies: list[float], statuses: list[int], elapsed: float
+) -> dict[str, Any]:
+    """Summarize the results of a load test.
+
+    Args:
+        latencies: The seconds taken by each call.
+        statuses: The final status code of each call.
+        elapsed: The seconds taken by the whole test.
+    """
+    ordered = sorted(latencies)
+    quantiles = (
+        statistics.quantiles(ordered, n=100, method="inclusive")
+        if len(ordered) > 1
+        else ordered
+    )
+
+    def percentile(p: int) -> float:
+        return round(quantiles[min(p, len(quantiles)) - 1] * 1000, 3)
+
+    return {
+        "calls": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "calls_per_sec": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else None,
+        "statuses": {str(k): v for k, v in sorted(Counter(statuses).items())},
+    }
+
+
+async def load_http(
+    *,
+    requests: int,
+    concurrency: int,
+    shopify: FakeShopify,
+    retry_policy: RetryPolicy,
+) -> dict[str, Any]:
+    """Request ``requests`` orders from ``shopify``, ``concurrency`` at a time."""
+    client = AsyncHttpClient(
+        scheme="http",
+        max_connections_per_shop=concurrency,
+        rate_limiter=RateLimiter(),
+        # Every call should reach the server.
+        coalesce_requests=False,
+        retry_policy=retry_policy,
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    order_count = len(shopify.orders)
+    latencies: list[float] = []
+    statuses: list[int] = []
+
+    async def get(i: int):
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(
+                    logger,
+                    myshopify_domain=shopify.domain,
+                    api_path=f"/orders/{FIRST_ORDER_ID + i % order_count}.json",
+                    api_token="load",
+                )
+                status = response.status_code
+            except HttpError as e:
+                status = e.status_code
+            latencies.append(time.perf_counter() - started_at)
+            statuses.append(status)
+
+    started_at = time.perf_counter()
+    try:
+        await asyncio.gather(*(get(i) for i in range(requests)))
+    finally:
+        client.close()
+    results = summarize(latencies, statuses, time.perf_counter() - started_at)
+    results["server_requests"] = shopify.request_count
+    results["server_throttled"] = shopify.throttled_count
+    results["client_retries"] = retry_policy.stats.retries
+    return results
+
+
+async def load_webhooks(
+    url: str, *, count: int, concurrency: int, secret: str
+) -> dict[str, Any]:
+    """Send ``count`` webhooks to the listener at ``url``."""
+    started_at = time.perf_counter()
+    results = await send_webhooks(
+        url, make_webhook_burst(count), secret=secret, concurrency=concurrency
+    )
+    elapsed = time.perf_counter() - started_at
+    return summarize(
+        [seconds for _, seconds in results], [status for status, _ in results], elapsed
+    )
+
+
+def main(argv=None) -> int:
+    """Run a load test."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.load", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("--json", action="store_true", help="output JSON")
+    subparsers = parser.add_subparsers(dest="target", required=True)
+
+    http_parser = subparsers.add_parser("http", help="load the HTTP client")
+    http_parser.add_argument("--requests", type=int, default=500)
+    http_parser.add_argument("--concurrency", type=int, default=20)
+    http_parser.add_argument("--orders", type=int, default=100)
+    http_parser.add_argument("--line-items", type=int, default=5)
+    http_parser.add_argument("--latency", type=float, default=0.0)
+    http_parser.add_argument("--latency-jitter", type=float, default=0.0)
+    http_parser.add_argument("--error-rate", type=float, default=0.0)
+    http_parser.add_argument(
+        "--capacity", type=int, default=0, help="0 (default) disables limits"
+    )
+    http_parser.add_argument("--leak-rate", type=float, default=2.0)
+    http_parser.add_argument(
+        "--retry-delay", type=float, default=0.1, help="base delay between retries"
+    )
+
+    webhooks_parser = subparsers.add_parser("webhooks", help="load the listener")
+    webhooks_parser.add_argument("--url", required=True)
+    webhooks_parser.add_argument("--count", type=int, default=1000)
+    webhooks_parser.add_argument("--concurrency", type=int, default=50)
+    webhooks_parser.add_argument("--secret", default="load")
+
+    args = parser.parse_args(argv)
+
+    if args.target == "http":
+        with FakeShopify(
+            orders=args.orders,
+            line_items=args.line_items,
+            capacity=args.capacity or None,
+            leak_rate=args.leak_rate,
+            latency=args.latency,
+            latency_jitter=args.latency_jitter,
+            error_rate=args.error_rate,
+        ) as shopify:
+            results = asyncio.run(
+                load_http(
+                    requests=args.requests,
+                    concurrency=args.concurrency,
+                    shopify=shopify,
+                    retry_policy=RetryPolicy(
+                        base_delay=args.retry_delay, deadline=None
+                    ),
+                )
+            )
+    else:
+        results = asyncio.run(
+            load_webhooks(
+                args.url,
+                count=args.count,
+                concurrency=args.concurrency,
+                secret=args.secret,
+            )
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for key, value in results.items():
+            print(f"{key:<20} {value}")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Measure the time taken to turn a Shopify order response into a node's output.
+
+Each pipeline parses an ``orders/{id}.json`` response body, builds the ``get_order``
+output and encodes it as JSON, for orders with an increasing number of line items:
+
+- ``validated``: :class:`~wkflws_shopify.schemas.orders.Order` validation and
+  ``.dict(by_alias=True)`` (the default)
+- ``trusted``: :func:`~wkflws_shopify.schemas.trusted.trusted_dict` (``trusted``
+  parameter)
+
+Each pipeline is run with every available serialization backend.
+
+Usage::
+
+    python -m benchmarks.serialization [--line-items 1,50,500] [--runs N] [--json]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Any, Callable
+
+from wkflws_shopify.schemas.orders import Order
+from wkflws_shopify.schemas.trusted import trusted_dict
+from wkflws_shopify.serialization import BACKENDS, JSONBackend
+from .fixtures import make_order
+
+PIPELINES: dict[str, Callable[[dict[str, Any]], dict[str, Any]]] = {
+    "validated": lambda data: Order(**data).dict(by_alias=True),
+    "trusted": lambda data: trusted_dict(Order, data),
+}
+
+
+def available_backends() -> list[JSONBackend]:
+    """Return an instance of each backend which can be used."""
+    backends = []
+    for backend_cls in BACKENDS.values():
+        try:
+            backends.append(backend_cls())
+        except ImportError:
+            pass
+    return backends
+
+
+def measure(
+    body: bytes,
+    pipeline: Callable[[dict[str, Any]], dict[str, Any]],
+    backend: JSONBackend,
+    *,
+    runs: int,
+) -> float:
+    """Return the median milliseconds taken to process ``body``."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        backend.dumps(pipeline(backend.loads(body)["order"]))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main(argv=None) -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.serialization", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("--line-items", default="1,50,500")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="output JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for line_items in (int(n) for n in args.line_items.split(",")):
+        body = json.dumps({"order": make_order(line_items=line_items)}).encode()
+        for backend in available_backends():
+            for name, pipeline in PIPELINES.items():
+                results.append(
+                    {
+                        "line_items": line_items,
+                        "backend": backend.name,
+                        "pipeline": name,
+                        "median_ms": round(
+                            measure(body, pipeline, backend, runs=args.runs), 3
+                        ),
+                    }
+                )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            print(
+                f"{r['line_items']:>5} line items {r['backend']:<8} "
+                f"{r['pipeline']:<10} {r['median_ms']:>10.3f}ms"
+            )
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Measure the cold start import time of the node entry points.
+
+Every node execution is a new Python process so the time taken to import a node's
+module is paid on every call. Each entry point is imported in a fresh interpreter with
+``python -X importtime`` and the median cumulative import time is reported.
+
+Usage::
+
+    python -m benchmarks.startup [--runs N] [--json] [--check]
+
+``--check`` compares the results to the budget in ``startup_budget.json`` and exits
+with a non-zero status if an entry point is over budget or imports a module it
+shouldn't.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any
+
+#: Budget for each entry point's import time and the modules it must not import.
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), "startup_budget.json")
+
+
+def measure(module: str, *, runs: int = 5) -> dict[str, Any]:
+    """Import ``module`` in ``runs`` fresh interpreters.
+
+    Args:
+        module: The module to import.
+        runs: The number of interpreters to start.
+
+    Returns:
+        The median cumulative import time of ``module`` in milliseconds and the
+        modules imported along with it.
+    """
+    timings = []
+    modules: list[str] = []
+    code = f"import {module}, sys; print('\\n'.join(sys.modules))"
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        modules = result.stdout.split()
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module:
+                timings.append(int(parts[1]) / 1000)
+                break
+
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(timings), 2),
+        "min_ms": round(min(timings), 2),
+        "modules": sorted(modules),
+    }
+
+
+def check(results: list[dict[str, Any]], budget: dict[str, Any]) -> list[str]:
+    """Return a description of each budget violation in ``results``."""
+    errors = []
+    for result in results:
+        entry = budget[result["module"]]
+        if result["median_ms"] > entry["max_ms"]:
+            errors.append(
+                f"{result['module']} took {result['median_ms']}ms to import "
+                f"(budget {entry['max_ms']}ms)"
+            )
+        for forbidden in entry.get("forbidden_modules", []):
+            if forbidden in result["modules"]:
+                errors.append(f"{result['module']} imported {forbidden}")
+    return errors
+
+
+def main(argv=None) -> int:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.startup", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="output JSON")
+    parser.add_argument("--check", action="store_true", help="enforce the budget")
+    args = parser.parse_args(argv)
+
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+
+    results = [measure(module, runs=args.runs) for module in budget]
+
+    if args.json:
+        print(
+            json.dumps(
+                [{k: v for k, v in r.items() if k != "modules"} for r in results],
+                indent=2,
+            )
+        )
+    else:
+        for r in results:
+            print(f"{r['module']:<60} {r['median_ms']:>8.2f}ms (min {r['min_ms']}ms)")
+
+    if args.check:
+        errors = check(results, budget)
+        for error in errors:
+            print(f"FAIL: {error}", file=sys.stderr)
+        return 1 if errors else 0
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
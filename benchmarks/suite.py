@@ -0,0 +1,315 @@
+"""Measure the throughput of the schemas, JSON encoding, HTTP client and listener.
+
+Every benchmark uses synthetic payloads from :mod:`benchmarks.fixtures`. HTTP requests
+are made to a local :class:`~benchmarks.fake_shopify.FakeShopify` server.
+
+Results can be written to a JSON file. When a baseline file from a previous run is
+given, each benchmark's median is compared to the baseline and the run fails if any
+benchmark is slower than the tolerance allows.
+
+Usage::
+
+    python -m benchmarks.suite [--quick] [--filter TEXT] [--output FILE]
+        [--baseline FILE] [--tolerance 0.25]
+"""
+
+import argparse
+import asyncio
+import contextlib
+from dataclasses import dataclass
+import datetime
+import json
+from logging import getLogger
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, ContextManager, Iterator
+
+from wkflws.http import Request, Response
+
+from wkflws_shopify import serialization
+from wkflws_shopify.encoders import ShopifyJSONEncoder
+from wkflws_shopify.http import AsyncHttpClient
+from wkflws_shopify.ratelimit import RateLimiter
+from wkflws_shopify.schemas.compact import CompactOrder
+from wkflws_shopify.schemas.customer import Customer
+from wkflws_shopify.schemas.orders import Order
+from wkflws_shopify.triggers import dedup, listener, verify
+from .fake_shopify import FakeShopify, FIRST_ORDER_ID
+from .fixtures import make_customer, make_order, make_webhook_burst
+
+#: Number of line items of the orders used by the schema and encoder benchmarks.
+LINE_ITEMS = (1, 50, 500)
+#: Secret used to sign the webhooks sent to the listener.
+WEBHOOK_SECRET = "benchmark"
+
+logger = getLogger("benchmarks.suite")
+
+
+@dataclass
+class Benchmark:
+    """Describe a benchmark."""
+
+    #: unique name of the benchmark
+    name: str
+    #: context manager yielding the function to measure. Async functions are awaited.
+    setup: Callable[[], ContextManager[Callable[[], Any]]]
+    #: number of items (e.g. orders, events, requests) processed by each call
+    items: int = 1
+
+
+def get_benchmarks(*, quick: bool = False) -> list[Benchmark]:
+    """Return every benchmark.
+
+    Args:
+        quick: Use smaller workloads.
+    """
+    benchmarks = []
+    for line_items in LINE_ITEMS:
+        data = make_order(line_items=line_items)
+        benchmarks += [
+            Benchmark(
+                f"schemas.order_parse[line_items={line_items}]",
+                _const(lambda data=data: Order(**data)),
+            ),
+            Benchmark(
+                f"schemas.compact_parse[line_items={line_items}]",
+                _const(lambda data=data: CompactOrder.from_dict(data)),
+            ),
+            Benchmark(
+                f"schemas.order_dict[line_items={line_items}]",
+                _const(
+                    lambda order=Order(**data): order.dict(by_alias=True),
+                ),
+            ),
+            Benchmark(
+                f"encoder.shopify_json_encoder[line_items={line_items}]",
+                _const(
+                    lambda output=Order(**data).dict(by_alias=True): json.dumps(
+                        output, cls=ShopifyJSONEncoder
+                    )
+                ),
+            ),
+            Benchmark(
+                f"encoder.serialization[line_items={line_items}]",
+                _const(
+                    lambda output=Order(**data).dict(
+                        by_alias=True
+                    ): serialization.dumps(output)
+                ),
+            ),
+        ]
+
+    customer = make_customer(addresses=250)
+    benchmarks.append(
+        Benchmark(
+            "schemas.customer_parse[addresses=250]",
+            _const(lambda: Customer(**customer)),
+        )
+    )
+
+    events = 100 if quick else 1000
+    benchmarks.append(
+        Benchmark(
+            f"webhook.process_and_accept[events={events}]",
+            lambda: _webhooks(events),
+            items=events,
+        )
+    )
+
+    requests = 50 if quick else 500
+    benchmarks.append(
+        Benchmark(
+            f"http.request[requests={requests},concurrency=10]",
+            lambda: _http_requests(requests, concurrency=10),
+            items=requests,
+        )
+    )
+    return benchmarks
+
+
+def _const(func: Callable[[], Any]) -> Callable[[], ContextManager[Callable[[], Any]]]:
+    """Return a setup function for ``func`` which needs no setup."""
+    return lambda: contextlib.nullcontext(func)
+
+
+@contextlib.contextmanager
+def _webhooks(count: int) -> Iterator[Callable[[], Any]]:
+    """Process and accept a burst of signed webhooks."""
+    burst = [
+        (dict(headers, **{verify.HMAC_HEADER: verify.sign(WEBHOOK_SECRET, body)}), body)
+        for headers, body in (
+            (headers, body.encode("utf-8"))
+            for headers, body in make_webhook_burst(count)
+        )
+    ]
+
+    async def run():
+        # Each run receives the webhooks for the first time.
+        dedup.set_dedup_store(dedup.MemoryDedupStore(window=3600, max_size=count))
+        for headers, body in burst:
+            event = await listener.process_webhook_request(
+                Request("https://wkfl.ws/shopify/webhook/", headers, body.decode()),
+                Response(),
+            )
+            assert event is not None
+            await listener.accept_event(event)
+
+    verify.set_verifier(verify.WebhookVerifier(default_secret=WEBHOOK_SECRET))
+    try:
+        yield run
+    finally:
+        verify.set_verifier(None)
+        dedup.set_dedup_store(None)
+
+
+@contextlib.contextmanager
+def _http_requests(count: int, *, concurrency: int) -> Iterator[Callable[[], Any]]:
+    """Request orders from the fake Shopify server."""
+    # The bucket is large enough that requests are never throttled.
+    with FakeShopify(
+        orders=count, line_items=5, capacity=10**6, leak_rate=10**6
+    ) as shopify:
+        client = AsyncHttpClient(
+            scheme="http",
+            max_connections_per_shop=concurrency,
+            rate_limiter=RateLimiter(),
+        )
+        semaphore: asyncio.Semaphore
+
+        async def get(order_id: int):
+            async with semaphore:
+                await client.request(
+                    logger,
+                    myshopify_domain=shopify.domain,
+                    api_path=f"/orders/{order_id}.json",
+                    api_token="benchmark",
+                )
+
+        async def run():
+            nonlocal semaphore
+            semaphore = asyncio.Semaphore(concurrency)
+            await asyncio.gather(*(get(FIRST_ORDER_ID + i) for i in range(count)))
+
+        try:
+            yield run
+        finally:
+            client.close()
+
+
+def measure(benchmark: Benchmark, *, runs: int) -> dict[str, Any]:
+    """Run ``benchmark`` ``runs`` times (after a warm up run).
+
+    Returns:
+        The median and minimum time of a run in milliseconds and the number of items
+        processed per second.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        with benchmark.setup() as func:
+
+            def call():
+                result = func()
+                if asyncio.iscoroutine(result):
+                    loop.run_until_complete(result)
+
+            call()
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                call()
+                timings.append(time.perf_counter() - start)
+    finally:
+        loop.close()
+
+    median = statistics.median(timings)
+    return {
+        "median_ms": round(median * 1000, 4),
+        "min_ms": round(min(timings) * 1000, 4),
+        "items_per_sec": round(benchmark.items / median, 1),
+        "runs": runs,
+    }
+
+
+def compare(
+    results: dict[str, Any], baseline: dict[str, Any], *, tolerance: float
+) -> list[str]:
+    """Return a description of each benchmark slower than its baseline.
+
+    Args:
+        results: The current results.
+        baseline: The results of a previous run.
+        tolerance: The fraction a benchmark's median may increase by (e.g. 0.25 is
+            25% slower).
+    """
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            continue
+        change = result["median_ms"] / previous["median_ms"] - 1
+        if change > tolerance:
+            regressions.append(
+                f"{name} took {result['median_ms']}ms "
+                f"(baseline {previous['median_ms']}ms, {change:+.0%})"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.suite", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("--quick", action="store_true", help="use smaller workloads")
+    parser.add_argument("--runs", type=int, default=None)
+    parser.add_argument("--filter", help="only run benchmarks containing this text")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare to the results in this JSON file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown compared to the baseline (default 0.25 = 25%%)",
+    )
+    args = parser.parse_args(argv)
+    runs = args.runs or (3 if args.quick else 20)
+
+    results: dict[str, Any] = {
+        "metadata": {
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "json_backend": serialization.get_backend().name,
+        },
+        "benchmarks": {},
+    }
+    for benchmark in get_benchmarks(quick=args.quick):
+        if args.filter and args.filter not in benchmark.name:
+            continue
+        result = results["benchmarks"][benchmark.name] = measure(benchmark, runs=runs)
+        print(
+            f"{benchmark.name:<60} {result['median_ms']:>10.3f}ms "
+            f"{result['items_per_sec']:>12.1f}/s",
+            file=sys.stderr,
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
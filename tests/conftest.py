@@ -0,0 +1,285 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from typing import Any, Callable, Optional
+
+import pytest
+
+#: Signature for the functions responding to requests made to the local server.
+#: Accepts the method, path, headers and body and returns a status code, headers and
+#: body.
+Responder = Callable[
+    [str, str, dict[str, str], bytes], tuple[int, dict[str, str], bytes]
+]
+
+
+ORDER_PAYLOAD = """{
+  "id": 48829967047,
+  "billing_address": {
+    "address1": "123 Fake Street",
+    "address2": "",
+    "city": "Oak Lawn",
+    "province": "Illinois",
+    "province_code": "IL",
+    "zip": "60453",
+    "country": "United States",
+    "country_code": "US",
+    "latitude": "41.725390",
+    "longitude": "-87.750750",
+    "name": "John Smith",
+    "first_name": "John",
+    "last_name": "Smith",
+    "phone": "(555) 123-4567",
+    "company": ""
+  },
+  "buyer_accepts_marketing": true,
+  "cancel_reason": null,
+  "cancelled_at": null,
+  "cart_token": "68da1ff222b115cf342211fbf182d5fc",
+  "checkout_token": "8292bbb46d35c9587f9b50a34bdce5e5",
+  "closed_at": null,
+  "created_at": "2022-10-13T14:15:00-04:00",
+  "currency": "USD",
+  "current_total_discounts": "20.00",
+  "current_total_price": "570.08",
+  "current_subtotal_price": "479.99",
+  "current_total_tax": "0.00",
+  "customer": {
+    "addresses": [],
+    "currency": "USD",
+    "created_at": "2022-06-28T16:00:44-04:00",
+    "default_address": {
+      "address1": "123 Fake Street",
+      "address2": "",
+      "city": "Oak Lawn",
+      "province": "Illinois",
+      "province_code": "IL",
+      "zip": "60453",
+      "country": "United States",
+      "country_code": "US",
+      "latitude": null,
+      "longitude": null,
+      "name": "John Smith",
+      "first_name": "John",
+      "last_name": "Smith",
+      "phone": "(555) 123-4567",
+      "company": ""
+    },
+    "email": "jsmith@gmail.com",
+    "email_marketing_consent": {
+      "state": "subscribed",
+      "opt_in_level": "single_opt_in",
+      "consent_updated_at": null
+    },
+    "first_name": "John",
+    "id": 7913927416923,
+    "last_name": "Smith",
+    "last_order_id": 6869967970482,
+    "last_order_name": "22520",
+    "phone": null,
+    "sms_marketing_consent": null,
+    "state": "enabled",
+    "tags": "",
+    "tax_exempt": false,
+    "total_spent": "814.37",
+    "verified_email": true
+  },
+  "email": "jsmith@gmail.com",
+  "landing_site": "/?utm_medium=store-directory&utm_source=summersizzle",
+  "line_items": [
+    {
+      "id": 62103096238871,
+      "price": "499.99",
+      "product_id": 8672033808842,
+      "quantity": 1,
+      "requires_shipping": true,
+      "sku": "MM-7482",
+      "title": "MultiMaster Tool",
+      "variant_id": 8766203028238,
+      "variant_title": "",
+      "vendor": "CLOSEOUT",
+      "gift_card": false,
+      "total_discount": "0.00",
+      "tax_lines": []
+    }
+  ],
+  "name": "22520",
+  "note": null,
+  "number": 21520,
+  "order_number": 22520,
+  "phone": null,
+  "presentment_currency": "USD",
+  "processed_at": "2022-10-13T14:14:58-04:00",
+  "referring_site": "",
+  "shipping_address": {
+    "address1": "123 Fake Street",
+    "address2": "",
+    "city": "Oak Lawn",
+    "province": "Illinois",
+    "province_code": "IL",
+    "zip": "60453",
+    "country": "United States",
+    "country_code": "US",
+    "latitude": "41.725390",
+    "longitude": "-87.750750",
+    "name": "John Smith",
+    "first_name": "John",
+    "last_name": "Smith",
+    "phone": "(555) 123-4567",
+    "company": ""
+  },
+  "subtotal_price": "479.99",
+  "tags": "",
+  "taxes_includes": false,
+  "test": false,
+  "token": "a36beeb6d4d334ee3078eb9b564858bc",
+  "total_discounts": "20.00",
+  "total_line_items_price": "499.99",
+  "total_outstanding": "0.00",
+  "total_price": "570.08",
+  "total_tax": "0.00",
+  "total_tip_received": "0.00",
+  "total_weight": 36287,
+  "updated_at": "2022-10-13T14:16:16-04:00",
+  "order_status_url": "https://hey.horse/8019189128/orders/a36beeb6d4d334ee3078eb9b564858bc/authenticate?key=c61f1b3c528e953b99bd189278ab7d5e"
+}"""  # noqa
+
+
+def make_order(order_id: int = 48829967047, **fields: Any) -> dict[str, Any]:
+    """Return a Shopify REST order payload for ``order_id``."""
+    order = json.loads(ORDER_PAYLOAD)
+    order["id"] = order_id
+    order.update(fields)
+    return order
+
+
+def make_pos_order(order_id: int = 48829967048) -> dict[str, Any]:
+    """Return an order placed at a point of sale for a custom item.
+
+    It has no customer, email, addresses, cart or checkout and its line item has no
+    SKU, variant or vendor.
+    """
+    order = make_order(
+        order_id,
+        cart_token=None,
+        checkout_token=None,
+        customer=None,
+        email=None,
+        landing_site=None,
+        referring_site=None,
+    )
+    del order["billing_address"], order["shipping_address"]
+    order["line_items"][0].update(
+        product_id=None, sku=None, variant_id=None, variant_title=None, vendor=None
+    )
+    return order
+
+
+def make_customer_without_address(customer_id: int = 7913927416924) -> dict[str, Any]:
+    """Return a customer created with only a phone number."""
+    customer = json.loads(ORDER_PAYLOAD)["customer"]
+    del customer["default_address"]
+    customer.update(
+        id=customer_id,
+        email=None,
+        first_name=None,
+        last_name=None,
+        phone="+15551234567",
+        last_order_id=None,
+        last_order_name=None,
+        total_spent="0.00",
+    )
+    return customer
+
+
+class LocalServer(ThreadingHTTPServer):
+    """HTTP/1.1 server standing in for Shopify during tests."""
+
+    daemon_threads = True
+
+    def __init__(self, responder: Responder):
+        self.responder = responder
+        #: Number of TCP connections accepted by the server.
+        self.connections = 0
+        #: Each request received as a tuple of method and path.
+        self.requests: list[tuple[str, str]] = []
+        super().__init__(("127.0.0.1", 0), _Handler)
+
+    @property
+    def domain(self) -> str:
+        """The ``host:port`` of this server, used in place of a myshopify domain."""
+        return f"127.0.0.1:{self.server_address[1]}"
+
+    def process_request(self, request, client_address):  # noqa: D102
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: LocalServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.server.requests.append((self.command, self.path))
+
+        status, headers, resp_body = self.server.responder(
+            self.command, self.path, dict(self.headers.items()), body
+        )
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        if "Transfer-Encoding" in headers:
+            self.end_headers()
+            for i in range(0, len(resp_body), 7):
+                chunk = resp_body[i : i + 7]  # noqa: E203
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(resp_body)))
+            self.end_headers()
+            self.wfile.write(resp_body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+
+def json_response(
+    data: Any, status: int = 200, headers: Optional[dict[str, str]] = None
+) -> tuple[int, dict[str, str], bytes]:
+    """Build a JSON response for a :data:`Responder`."""
+    return (
+        status,
+        {"Content-Type": "application/json", **(headers or {})},
+        json.dumps(data).encode("utf-8"),
+    )
+
+
+@pytest.fixture
+def local_server():
+    """Start a local HTTP server. Set ``responder`` to control its responses."""
+    server = LocalServer(lambda *a: json_response({}))
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def reset_webhook_state():
+    """Forget webhooks received and verifiers configured by previous tests."""
+    from wkflws_shopify.triggers import dedup, listener, verify
+
+    dedup.set_dedup_store(None)
+    verify.set_verifier(None)
+    listener.set_event_batcher(None)
+    listener.set_event_coalescer(None)
+    yield
+    dedup.set_dedup_store(None)
+    verify.set_verifier(None)
+    listener.set_event_batcher(None)
+    listener.set_event_coalescer(None)
@@ -0,0 +1,250 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from wkflws.events import Event
+from wkflws.http import Request, Response
+
+from wkflws_shopify.triggers import listener
+from wkflws_shopify.triggers.batching import EventBatcher
+
+SHOP = "heyhorse.myshopify.com"
+
+
+def make_event(identifier, order_id=None, topic="orders/updated"):
+    """Create a webhook event."""
+    metadata = {"x-shopify-shop-domain": SHOP, "x-shopify-topic": topic}
+    return Event(identifier, metadata, {"id": order_id})
+
+
+class Recorder:
+    """Records published batches."""
+
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, events):
+        """Record the identifiers of ``events``."""
+        self.batches.append([e.identifier for e in events])
+
+
+async def test_batcher__max_size():
+    """Verify a batch is published once it's full."""
+    recorder = Recorder()
+    batcher = EventBatcher(recorder, max_size=2, linger=60)
+
+    for i in range(5):
+        batcher.submit(make_event(str(i)))
+    await asyncio.sleep(0.01)
+
+    assert recorder.batches == [["0", "1"], ["2", "3"]]
+
+    await batcher.flush()
+    assert recorder.batches == [["0", "1"], ["2", "3"], ["4"]]
+    assert batcher.stats.asdict() == {
+        "events": 5,
+        "batches": 3,
+        "failed_batches": 0,
+        "dropped_events": 0,
+        "max_batch_size": 2,
+    }
+
+
+async def test_batcher__linger():
+    """Verify a partial batch is published after the linger time."""
+    recorder = Recorder()
+    batcher = EventBatcher(recorder, max_size=100, linger=0.01)
+
+    batcher.submit(make_event("a"))
+    batcher.submit(make_event("b"))
+    await asyncio.sleep(0.05)
+
+    assert recorder.batches == [["a", "b"]]
+
+    batcher.submit(make_event("c"))
+    await asyncio.sleep(0.05)
+    assert recorder.batches == [["a", "b"], ["c"]]
+    await batcher.flush()
+
+
+async def test_batcher__failed_publish():
+    """Verify a failed batch is published later, before newer events."""
+    calls = []
+
+    async def publish(events):
+        calls.append([e.identifier for e in events])
+        if len(calls) <= 2:
+            raise RuntimeError("kafka is down")
+
+    batcher = EventBatcher(publish, max_size=1, linger=0, retry_delay=0.01)
+    batcher.submit(make_event("a"))
+    batcher.submit(make_event("b"))
+    await asyncio.sleep(0.1)
+
+    assert calls == [["a"], ["a"], ["a"], ["b"]]
+    assert batcher.stats.failed_batches == 2
+    assert batcher.stats.batches == 2
+    await batcher.flush()
+
+
+async def test_batcher__flush_gives_up():
+    """Verify flushing stops retrying a batch which can't be published."""
+    calls = []
+
+    async def publish(events):
+        calls.append(len(events))
+        raise RuntimeError("kafka is down")
+
+    batcher = EventBatcher(publish, max_size=10, linger=60, retry_delay=0.001)
+    batcher.submit(make_event("a"))
+    batcher.submit(make_event("b"))
+    await batcher.flush(max_retries=2)
+
+    assert calls == [2, 2, 2]
+    assert batcher.stats.failed_batches == 3
+
+
+async def test_batcher__partially_published(monkeypatch):
+    """Verify only the events which failed are retried and dropped eventually."""
+    sent = []
+
+    async def send_event(event):
+        sent.append(event.identifier)
+        if event.identifier.startswith("bad"):
+            raise ValueError("invalid payload")
+
+    webhook = SimpleNamespace(producer=None, send_event=send_event)
+    monkeypatch.setattr(listener, "_webhook", webhook)
+    dropped = []
+    batcher = EventBatcher(
+        listener.publish_events,
+        max_size=10,
+        linger=0,
+        retry_delay=0.001,
+        max_attempts=3,
+        on_drop=dropped.append,
+    )
+
+    for event in (
+        make_event("1", 1),
+        make_event("bad", 2),
+        make_event("2-after-bad", 2),
+        make_event("3", 3),
+    ):
+        batcher.submit(event)
+    await asyncio.sleep(0.02)
+    batcher.submit(make_event("4", 4))
+    await batcher.flush()
+
+    assert sorted(sent) == ["1", "2-after-bad", "3", "4", "bad", "bad", "bad"]
+    assert sent.index("2-after-bad") > sent.index("bad")
+    assert [e.identifier for e in dropped] == ["bad"]
+    assert batcher.stats.dropped_events == 1
+    assert batcher._pending == []
+
+
+def test_ordering_key():
+    """Verify events are ordered per shop and resource."""
+    assert listener.ordering_key(make_event("a", 1)) == f"{SHOP}:1"
+    refund = Event(
+        "b",
+        {"x-shopify-shop-domain": SHOP, "x-shopify-topic": "refunds/create"},
+        {"order_id": 2},
+    )
+    assert listener.ordering_key(refund) == f"{SHOP}:2"
+    assert listener.ordering_key(make_event("c")) == SHOP
+
+
+async def test_publish_events__kafka(monkeypatch):
+    """Verify events are produced before waiting and keyed by resource."""
+    produced = []
+    loop = asyncio.get_running_loop()
+
+    class Producer:
+        async def produce(self, *, event, key, topic):
+            produced.append((event.identifier, key, topic))
+            result = loop.create_future()
+            loop.call_later(0.01, result.set_result, None)
+            return result
+
+    webhook = SimpleNamespace(producer=Producer(), kafka_topic="shopify")
+    monkeypatch.setattr(listener, "_webhook", webhook)
+
+    await listener.publish_events([make_event("a", 1), make_event("b", 2)])
+
+    assert produced == [
+        ("a", f"{SHOP}:1", "shopify"),
+        ("b", f"{SHOP}:2", "shopify"),
+    ]
+
+
+async def test_publish_events__kafka_failed_delivery(monkeypatch):
+    """Verify events whose delivery failed are reported."""
+    loop = asyncio.get_running_loop()
+
+    class Producer:
+        async def produce(self, *, event, key, topic):
+            if event.identifier == "c":
+                raise BufferError("queue full")
+            result = loop.create_future()
+            if event.identifier == "a":
+                result.set_exception(RuntimeError("timed out"))
+            else:
+                result.set_result(None)
+            return result
+
+    webhook = SimpleNamespace(producer=Producer(), kafka_topic="shopify")
+    monkeypatch.setattr(listener, "_webhook", webhook)
+
+    result = await listener.publish_events(
+        [make_event("a", 1), make_event("b", 2), make_event("c", 3)]
+    )
+
+    assert sorted(e.identifier for e in result.failed) == ["a", "c"]
+    assert result.skipped == []
+
+
+async def test_publish_events__inline(monkeypatch):
+    """Verify events for the same resource are sent in order without Kafka."""
+    sent = []
+
+    async def send_event(event):
+        # The first event for each order is slower than the second.
+        await asyncio.sleep(0.02 if event.identifier.endswith("1") else 0)
+        sent.append(event.identifier)
+
+    webhook = SimpleNamespace(producer=None, send_event=send_event)
+    monkeypatch.setattr(listener, "_webhook", webhook)
+
+    await listener.publish_events(
+        [
+            make_event("a1", 1),
+            make_event("b1", 2),
+            make_event("a2", 1),
+            make_event("b2", 2),
+        ]
+    )
+
+    assert sent.index("a1") < sent.index("a2")
+    assert sent.index("b1") < sent.index("b2")
+
+
+async def test_process_webhook_request__batched(monkeypatch):
+    """Verify events are queued instead of returned when batching is enabled."""
+    recorder = Recorder()
+    batcher = EventBatcher(recorder, max_size=10, linger=60)
+    listener.set_event_batcher(batcher)
+
+    body = json.dumps({"idempotency_key": "abc", "id": 1})
+    request = Request(
+        "https://wkfl.ws/shopify/webhook/",
+        {"x-shopify-topic": "orders/updated", "x-shopify-shop-domain": SHOP},
+        body,
+    )
+    response = Response()
+
+    assert await listener.process_webhook_request(request, response) is None
+    assert response.status_code == 204
+
+    await listener.flush_pending_events()
+    assert recorder.batches == [["abc"]]
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_suite(*args: str) -> subprocess.CompletedProcess:
+    """Run the benchmark suite with ``args``."""
+    return subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--quick", *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+def test_suite__baseline(tmp_path):
+    """Verify results are written and regressions from the baseline are reported."""
+    output = tmp_path / "results.json"
+
+    result = run_suite("--filter", "order_parse", "--output", str(output))
+
+    assert result.returncode == 0, result.stderr
+    results = json.loads(output.read_text())
+    assert set(results["benchmarks"]) == {
+        "schemas.order_parse[line_items=1]",
+        "schemas.order_parse[line_items=50]",
+        "schemas.order_parse[line_items=500]",
+    }
+
+    # Pretend the benchmarks used to be much faster.
+    for benchmark in results["benchmarks"].values():
+        benchmark["median_ms"] /= 100
+    output.write_text(json.dumps(results))
+
+    result = run_suite("--filter", "line_items=1]", "--baseline", str(output))
+
+    assert result.returncode == 1
+    assert "REGRESSION: schemas.order_parse[line_items=1]" in result.stderr
+
+
+def test_suite__webhook_and_http():
+    """Verify the listener and HTTP benchmarks run."""
+    result = run_suite("--runs", "1")
+
+    assert result.returncode == 0, result.stderr
+    names = json.loads(result.stdout)["benchmarks"]
+    assert "webhook.process_and_accept[events=100]" in names
+    assert "http.request[requests=50,concurrency=10]" in names
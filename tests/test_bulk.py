@@ -0,0 +1,366 @@
+import gzip
+import json
+import logging
+
+from conftest import json_response
+import pytest
+
+from wkflws_shopify import bulk, http, ratelimit
+from wkflws_shopify.graphql import GraphQLClient
+from wkflws_shopify.schemas.bulk import BulkOrder
+from wkflws_shopify.schemas.trusted import trusted_dict
+
+logger = logging.getLogger("tests")
+
+MONEY = {"shopMoney": {"amount": "10.00"}}
+ADDRESS = {
+    "address1": "123 Fake Street",
+    "address2": "",
+    "city": "Oak Lawn",
+    "province": "Illinois",
+    "province_code": "IL",
+    "zip": "60453",
+    "country": "United States",
+    "country_code": "US",
+    "latitude": 41.72539,
+    "longitude": -87.75075,
+    "name": "John Smith",
+    "first_name": "John",
+    "last_name": "Smith",
+    "phone": None,
+    "company": None,
+}
+
+
+def bulk_order(order_id):
+    """Return an order as written to a bulk operation's result file."""
+    return {
+        "id": f"gid://shopify/Order/{order_id}",
+        "name": f"#{order_id}",
+        "email": "jsmith@gmail.com",
+        "phone": None,
+        "note": None,
+        "tags": ["vip", "wholesale"],
+        "test": False,
+        "created_at": "2022-10-13T14:15:00Z",
+        "updated_at": "2022-10-13T14:16:16Z",
+        "processed_at": "2022-10-13T14:14:58Z",
+        "cancelled_at": None,
+        "closed_at": None,
+        "cancel_reason": None,
+        "currency": "USD",
+        "presentment_currency": "USD",
+        "buyer_accepts_marketing": True,
+        "current_total_discounts": MONEY,
+        "current_total_price": MONEY,
+        "current_subtotal_price": MONEY,
+        "current_total_tax": MONEY,
+        "subtotal_price": MONEY,
+        "total_discounts": MONEY,
+        "total_outstanding": MONEY,
+        "total_price": MONEY,
+        "total_tax": MONEY,
+        "total_tip_received": MONEY,
+        "total_weight": 100,
+        "billing_address": ADDRESS,
+        "shipping_address": ADDRESS,
+    }
+
+
+def bulk_line_item(line_item_id, order_id):
+    """Return a line item as written to a bulk operation's result file."""
+    return {
+        "id": f"gid://shopify/LineItem/{line_item_id}",
+        "sku": "MM-7482",
+        "title": "MultiMaster Tool",
+        "quantity": 1,
+        "vendor": "CLOSEOUT",
+        "variant_title": "",
+        "requires_shipping": True,
+        "gift_card": False,
+        "price": MONEY,
+        "total_discount": MONEY,
+        "product": {"id": "gid://shopify/Product/5"},
+        "variant": {"id": "gid://shopify/ProductVariant/6"},
+        "__parentId": f"gid://shopify/Order/{order_id}",
+    }
+
+
+RESULTS = [
+    bulk_order(1),
+    bulk_line_item(11, 1),
+    bulk_line_item(12, 1),
+    bulk_order(2),
+    bulk_order(3),
+    bulk_line_item(31, 3),
+]
+
+
+class BulkServer:
+    """Responds to bulk operation queries and serves the result file."""
+
+    def __init__(self, domain, *, running_polls=2, status="COMPLETED", gzip=False):
+        self.domain = domain
+        self.running_polls = running_polls
+        self.status = status
+        self.gzip = gzip
+        self.queries = []
+
+    def __call__(self, method, path, headers, body):
+        """Respond to a request."""
+        if path == "/results.jsonl":
+            data = b"".join(json.dumps(r).encode() + b"\n" for r in RESULTS)
+            response_headers = {"Transfer-Encoding": "chunked"}
+            if self.gzip:
+                data = gzip.compress(data)
+                response_headers["Content-Encoding"] = "gzip"
+            return 200, response_headers, data
+
+        request = json.loads(body)
+        self.queries.append(request)
+        if "bulkOperationRunQuery" in request["query"]:
+            data = {
+                "bulkOperationRunQuery": {
+                    "bulkOperation": {
+                        "id": "gid://shopify/BulkOperation/1",
+                        "status": "CREATED",
+                    },
+                    "userErrors": [],
+                }
+            }
+        elif self.running_polls:
+            self.running_polls -= 1
+            data = {
+                "node": {
+                    "id": "gid://shopify/BulkOperation/1",
+                    "status": "RUNNING",
+                    "objectCount": "3",
+                }
+            }
+        else:
+            data = {
+                "node": {
+                    "id": "gid://shopify/BulkOperation/1",
+                    "status": self.status,
+                    "errorCode": None if self.status == "COMPLETED" else "TIMEOUT",
+                    "objectCount": "6",
+                    "url": f"http://{self.domain}/results.jsonl",
+                    "partialDataUrl": None,
+                }
+            }
+        return json_response({"data": data})
+
+
+@pytest.fixture
+def client():
+    """Create a GraphQL client for the local server."""
+    return GraphQLClient(
+        http_client=http.AsyncHttpClient(scheme="http"),
+        rate_limiter=ratelimit.CostRateLimiter(),
+    )
+
+
+@pytest.mark.parametrize("compressed", (False, True))
+async def test_export_orders(local_server, client, compressed):
+    """Verify orders are exported, stitched and parsed."""
+    server = BulkServer(local_server.domain, gzip=compressed)
+    local_server.responder = server
+
+    orders = [
+        order
+        async for order in bulk.export_orders(
+            logger,
+            myshopify_domain=local_server.domain,
+            api_token="abc",
+            client=client,
+            http_client=client.http_client,
+            poll_interval=0.001,
+        )
+    ]
+
+    assert [o.api_id for o in orders] == [1, 2, 3]
+    assert all(isinstance(o, BulkOrder) for o in orders)
+    assert [li.id_ for li in orders[0].line_items] == [11, 12]
+    assert orders[1].line_items == []
+    assert orders[2].line_items[0].product_id == 5
+    assert orders[2].line_items[0].variant_id == 6
+    assert orders[0].tags == "vip, wholesale"
+    assert str(orders[0].total_price) == "10.00"
+
+    assert server.queries[0]["variables"]["query"] == bulk.ORDERS_QUERY
+    # One mutation, two polls while running and one when completed.
+    assert len(server.queries) == 4
+
+
+async def test_wait_for_bulk_operation__failed(local_server, client):
+    """Verify a failed operation raises an error."""
+    local_server.responder = BulkServer(
+        local_server.domain, running_polls=0, status="FAILED"
+    )
+
+    with pytest.raises(bulk.BulkOperationError) as e:
+        await bulk.wait_for_bulk_operation(
+            logger,
+            myshopify_domain=local_server.domain,
+            api_token="abc",
+            operation_id="gid://shopify/BulkOperation/1",
+            client=client,
+        )
+
+    assert e.value.operation.error_code == "TIMEOUT"
+
+
+async def test_wait_for_bulk_operation__timeout(local_server, client):
+    """Verify polling stops once the timeout is reached."""
+    local_server.responder = BulkServer(local_server.domain, running_polls=100)
+
+    with pytest.raises(bulk.BulkOperationError):
+        await bulk.wait_for_bulk_operation(
+            logger,
+            myshopify_domain=local_server.domain,
+            api_token="abc",
+            operation_id="gid://shopify/BulkOperation/1",
+            client=client,
+            poll_interval=0.01,
+            timeout=0.05,
+        )
+
+
+async def test_start_bulk_query__user_errors(local_server, client):
+    """Verify rejected queries raise an error."""
+    local_server.responder = lambda *a: json_response(
+        {
+            "data": {
+                "bulkOperationRunQuery": {
+                    "bulkOperation": None,
+                    "userErrors": [{"field": None, "message": "already running"}],
+                }
+            }
+        }
+    )
+
+    with pytest.raises(bulk.BulkOperationError, match="already running"):
+        await bulk.start_bulk_query(
+            logger,
+            myshopify_domain=local_server.domain,
+            api_token="abc",
+            query=bulk.ORDERS_QUERY,
+            client=client,
+        )
+
+
+async def test_stitch__grandchildren():
+    """Verify descendants are attached to their parent."""
+
+    async def records():
+        yield {"id": "gid://shopify/Order/1"}
+        yield {"id": "gid://shopify/LineItem/2", "__parentId": "gid://shopify/Order/1"}
+        yield {
+            "id": "gid://shopify/Discount/3",
+            "__parentId": "gid://shopify/LineItem/2",
+        }
+
+    result = [r async for r in bulk.stitch(records(), children={})]
+
+    assert result == [
+        {
+            "id": "gid://shopify/Order/1",
+            "LineItem": [
+                {
+                    "id": "gid://shopify/LineItem/2",
+                    "Discount": [{"id": "gid://shopify/Discount/3"}],
+                }
+            ],
+        }
+    ]
+
+
+async def test_iter_jsonl__lines_across_chunks():
+    """Verify lines split across chunks (and chunks of many lines) are parsed."""
+    data = b"".join(json.dumps(r).encode() + b"\n" for r in RESULTS) + b'{"a": 1}'
+
+    class Client:
+        def __init__(self, chunk_size):
+            self.chunk_size = chunk_size
+
+        async def stream(self, url):
+            for i in range(0, len(data), self.chunk_size):
+                yield data[i : i + self.chunk_size]  # noqa: E203 # black formatting
+
+    for chunk_size in (7, len(data)):
+        records = [
+            r async for r in bulk.iter_jsonl("/file", http_client=Client(chunk_size))
+        ]
+
+        assert records == RESULTS + [{"a": 1}]
+
+
+async def test_stream__reads_in_chunks(local_server):
+    """Verify streamed bodies are yielded in chunks and the connection reused."""
+    local_server.responder = lambda *a: (200, {}, b"x" * 1000)
+    client = http.AsyncHttpClient(scheme="http")
+    url = f"http://{local_server.domain}/file"
+
+    chunks = [c async for c in client.stream(url, chunk_size=100)]
+    assert len(chunks) == 10
+    assert b"".join(chunks) == b"x" * 1000
+
+    assert b"".join([c async for c in client.stream(url)]) == b"x" * 1000
+    assert local_server.connections == 1
+
+
+async def test_stream__error(local_server):
+    """Verify error responses raise an HttpError."""
+    local_server.responder = lambda *a: (403, {}, b"expired")
+    client = http.AsyncHttpClient(scheme="http")
+
+    with pytest.raises(http.HttpError) as e:
+        async for _ in client.stream(f"http://{local_server.domain}/file"):
+            pass
+
+    assert e.value.status_code == 403
+    assert e.value.body == "expired"
+
+
+def test_parse_compact_order():
+    """Verify a compact order has the same fields as the stitched order."""
+    record = {**bulk_order(1), "line_items": [bulk_line_item(11, 1)]}
+
+    order = bulk.parse_compact_order(record)
+
+    assert order.asdict() == trusted_dict(BulkOrder, bulk.normalize(record))
+    assert order.line_items[0]["variant_id"] == 6
+
+
+def test_parse_order__null_fields():
+    """Verify fields GraphQL returns as null are accepted.
+
+    e.g. custom line items, deleted variants and orders without an email or address.
+    """
+    record = {
+        **bulk_order(1),
+        "email": None,
+        "billing_address": None,
+        "shipping_address": {**ADDRESS, "province": None, "province_code": None},
+        "line_items": [
+            {
+                **bulk_line_item(11, 1),
+                "sku": None,
+                "variant_title": None,
+                "product": None,
+                "variant": None,
+            }
+        ],
+    }
+    del record["line_items"][0]["__parentId"]
+
+    order = bulk.parse_order(record)
+    compact = bulk.parse_compact_order(record)
+
+    assert order.email is None
+    assert order.billing_address is None
+    assert order.line_items[0].sku is None
+    assert order.line_items[0].variant_id is None
+    assert order.line_items[0].product_id is None
+    assert compact.line_items[0]["variant_id"] is None
+    assert compact.asdict()["email"] is None
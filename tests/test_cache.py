@@ -0,0 +1,124 @@
+import json
+
+from conftest import json_response, make_order
+import pytest
+from wkflws.events import Event
+
+from wkflws_shopify import cache, http
+from wkflws_shopify.get_order.node import get_order
+from wkflws_shopify.triggers import listener
+
+
+@pytest.fixture(params=("memory", "sqlite"))
+def backend(request, tmp_path):
+    """Each cache backend."""
+    if request.param == "memory":
+        return cache.MemoryCacheBackend(ttl=60, max_size=2)
+    return cache.SQLiteCacheBackend(str(tmp_path / "cache.db"), ttl=60, max_size=2)
+
+
+@pytest.fixture
+def order_cache():
+    """Enable an in memory order cache."""
+    c = cache.OrderCache(cache.MemoryCacheBackend(ttl=60, max_size=10))
+    cache.set_order_cache(c)
+    yield c
+    cache.set_order_cache(None)
+
+
+def test_backend__get_set(backend):
+    """Verify values are stored and hits/misses counted."""
+    assert backend.get("a") is None
+    backend.set("a", {"value": 1})
+
+    assert backend.get("a") == {"value": 1}
+    assert backend.stats.hits == 1
+    assert backend.stats.misses == 1
+
+
+def test_backend__lru_eviction(backend):
+    """Verify the least recently used entry is evicted when full."""
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+
+    assert backend.get("b") is None, "Expected least recently used entry evicted"
+    assert backend.get("a") == 1
+    assert backend.get("c") == 3
+    assert backend.stats.evictions == 1
+
+
+def test_backend__ttl(backend):
+    """Verify expired entries aren't returned."""
+    backend.ttl = -1
+    backend.set("a", 1)
+
+    assert backend.get("a") is None
+    assert backend.stats.expirations == 1
+
+
+def test_backend__delete(backend):
+    backend.set("a", 1)
+
+    assert backend.delete("a") is True
+    assert backend.delete("a") is False
+    assert backend.get("a") is None
+
+
+def test_sqlite_backend__shared(tmp_path):
+    """Verify separate connections (i.e. processes) share entries."""
+    path = str(tmp_path / "cache.db")
+    writer = cache.SQLiteCacheBackend(path, ttl=60, max_size=10)
+    reader = cache.SQLiteCacheBackend(path, ttl=60, max_size=10)
+
+    writer.set("a", {"price": "1.00"})
+    assert reader.get("a") == {"price": "1.00"}
+
+    reader.delete("a")
+    assert writer.get("a") is None
+
+
+async def test_get_order__cached(local_server, order_cache):
+    """Verify repeated calls for an order only query Shopify once."""
+    local_server.responder = lambda m, p, h, b: json_response({"order": make_order(1)})
+    http.set_client(http.AsyncHttpClient(scheme="http"))
+    context = {"myshopify_domain": local_server.domain, "shopify_token": "abc"}
+    try:
+        first = await get_order({"order_id": 1}, context)
+        second = await get_order({"order_id": 1}, context)
+    finally:
+        http.set_client(None)
+
+    assert first == second
+    assert len(local_server.requests) == 1
+    assert order_cache.stats.hits == 1
+    assert order_cache.stats.misses == 1
+
+
+@pytest.mark.parametrize(
+    "topic,payload",
+    (
+        ("orders/updated", make_order(1)),
+        ("orders/cancelled", make_order(1)),
+        ("refunds/create", {"id": 99, "order_id": 1}),
+    ),
+)
+async def test_accept_event__invalidates_order(order_cache, topic, payload):
+    """Verify order webhooks remove the order from the cache."""
+    order_cache.set("heyhorse.myshopify.com", 1, make_order(1))
+    order_cache.set("heyhorse.myshopify.com", 2, make_order(2))
+    event = Event(
+        identifier="abc123",
+        metadata={
+            "x-shopify-topic": topic,
+            "x-shopify-shop-domain": "heyhorse.myshopify.com",
+        },
+        data=json.loads(json.dumps(payload)),
+    )
+
+    await listener.accept_event(event)
+
+    assert order_cache.get("heyhorse.myshopify.com", 1) is None
+    assert order_cache.get("heyhorse.myshopify.com", 2) is not None
+    assert order_cache.stats.invalidations == 1
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+from wkflws.events import Event
+from wkflws.http import Request, Response
+
+from wkflws_shopify.triggers import listener
+from wkflws_shopify.triggers.coalesce import EventCoalescer
+
+SHOP = "heyhorse.myshopify.com"
+KEY = (SHOP, "orders/updated", 1)
+
+
+def make_event(identifier, updated_at, order_id=1):
+    """Create an ``orders/updated`` event."""
+    metadata = {"x-shopify-shop-domain": SHOP, "x-shopify-topic": "orders/updated"}
+    return Event(identifier, metadata, {"id": order_id, "updated_at": updated_at})
+
+
+class Recorder:
+    """Records forwarded events."""
+
+    def __init__(self):
+        self.events = []
+
+    async def __call__(self, event):
+        """Record the identifier of ``event``."""
+        self.events.append(event.identifier)
+
+
+async def test_coalescer__newest_forwarded():
+    """Verify only the newest event received within the window is forwarded."""
+    recorder = Recorder()
+    coalescer = EventCoalescer(recorder, window=0.02, max_size=10)
+
+    assert coalescer.submit(KEY, make_event("a", "2022-05-04T10:00:00-04:00"))
+    assert coalescer.submit(KEY, make_event("c", "2022-05-04T10:00:02-04:00"))
+    # Out of order delivery of an older version.
+    assert coalescer.submit(KEY, make_event("b", "2022-05-04T10:00:01-04:00"))
+    await asyncio.sleep(0.05)
+
+    assert recorder.events == ["c"]
+    assert coalescer.stats.asdict() == {
+        "received": 3,
+        "forwarded": 1,
+        "coalesced": 1,
+        "stale": 1,
+    }
+
+
+async def test_coalescer__stale_after_forwarding():
+    """Verify events older than the forwarded version are dropped."""
+    recorder = Recorder()
+    coalescer = EventCoalescer(recorder, window=60, max_size=10)
+
+    coalescer.submit(KEY, make_event("b", "2022-05-04T10:00:01-04:00"))
+    await coalescer.flush()
+    coalescer.submit(KEY, make_event("a", "2022-05-04T10:00:00-04:00"))
+    coalescer.submit(KEY, make_event("c", "2022-05-04T10:00:02-04:00"))
+    await coalescer.flush()
+
+    assert recorder.events == ["b", "c"]
+    assert coalescer.stats.stale == 1
+
+
+async def test_coalescer__keys_independent():
+    """Verify events for different resources aren't coalesced."""
+    recorder = Recorder()
+    coalescer = EventCoalescer(recorder, window=60, max_size=10)
+
+    coalescer.submit(KEY, make_event("a", "2022-05-04T10:00:00-04:00"))
+    coalescer.submit(
+        (SHOP, "orders/updated", 2), make_event("b", "2022-05-04T10:00:00-04:00", 2)
+    )
+    await coalescer.flush()
+
+    assert sorted(recorder.events) == ["a", "b"]
+
+
+async def test_coalescer__missing_updated_at():
+    """Verify events without ``updated_at`` are returned to the caller."""
+    coalescer = EventCoalescer(Recorder(), window=60, max_size=10)
+    assert not coalescer.submit(KEY, make_event("a", None))
+
+
+def test_coalesce_key():
+    """Verify only topics registered for coalescing have a key."""
+    assert listener.coalesce_key(make_event("a", "2022-05-04T10:00:00Z")) == KEY
+
+    event = make_event("a", "2022-05-04T10:00:00Z")
+    event.metadata["x-shopify-topic"] = "orders/create"
+    assert listener.coalesce_key(event) is None
+
+
+async def test_process_webhook_request__coalesced(monkeypatch):
+    """Verify update webhooks are held and the newest is sent."""
+    sent = []
+
+    async def send_event(event):
+        sent.append(event.identifier)
+
+    monkeypatch.setattr(listener.settings, "WEBHOOK_COALESCE_ENABLED", True)
+    monkeypatch.setattr(listener.settings, "WEBHOOK_COALESCE_WINDOW", 60)
+    monkeypatch.setattr(listener.get_webhook(), "send_event", send_event)
+
+    for i, updated_at in enumerate(("10:00:00", "10:00:05", "10:00:03")):
+        body = json.dumps(
+            {
+                "idempotency_key": str(i),
+                "id": 1,
+                "updated_at": f"2022-05-04T{updated_at}-04:00",
+            }
+        )
+        request = Request(
+            "https://wkfl.ws/shopify/webhook/",
+            {"x-shopify-topic": "orders/updated", "x-shopify-shop-domain": SHOP},
+            body,
+        )
+        assert await listener.process_webhook_request(request, Response()) is None
+
+    await listener.flush_pending_events()
+    assert sent == ["1"]
@@ -0,0 +1,89 @@
+from benchmarks.compact import run
+from benchmarks.fixtures import make_order as make_large_order
+from conftest import make_order
+import pytest
+
+from wkflws_shopify import serialization
+from wkflws_shopify.schemas.compact import CompactOrder, Table
+from wkflws_shopify.schemas.orders import LineItem, Order
+
+
+@pytest.mark.parametrize("line_items", (0, 1, 50))
+def test_compact_order__same_json(line_items):
+    """Verify a compact order is encoded like the validated order."""
+    data = make_large_order(line_items=line_items)
+
+    order = CompactOrder.from_dict(data)
+
+    assert order.dumps() == serialization.dumps(Order(**data).dict(by_alias=True))
+    assert list(order.asdict()) == [f.alias for f in Order.__fields__.values()]
+    assert len(order.line_items) == line_items
+
+
+def test_compact_order__fields():
+    data = make_order(1)
+    order = CompactOrder.from_dict(data)
+
+    assert order.api_id == 1
+    assert order["total_price"] == data["total_price"]
+    assert order["line_items"] == list(order.line_items)
+    assert order.line_items[0]["price"] == data["line_items"][0]["price"]
+    assert order.line_items[-1] == order.line_items[len(order.line_items) - 1]
+    with pytest.raises(IndexError):
+        order.line_items[len(order.line_items)]
+
+
+def test_table__columns():
+    """Verify integers and booleans are packed and repeated strings are shared."""
+    # Decode the payload so each line item's strings are distinct objects.
+    data = serialization.loads(serialization.dumps(make_large_order(line_items=3)))
+    assert data["line_items"][0]["vendor"] is not data["line_items"][1]["vendor"]
+    table = Table.from_rows(LineItem, data["line_items"])
+
+    assert list(table.column("quantity")) == [
+        li["quantity"] for li in data["line_items"]
+    ]
+    assert table.column("quantity").typecode == "q"
+    assert table.column("gift_card").typecode == "b"
+    assert table[0]["gift_card"] is False
+    vendors = table.column("vendor")
+    assert vendors[0] is vendors[1]
+    with pytest.raises(KeyError):
+        table.column("nope")
+
+
+def test_table__nested_rows():
+    """Verify each row's tax lines are returned with it."""
+    line_items = [
+        {**li, "tax_lines": li["tax_lines"][:n]}
+        for n, li in enumerate(make_large_order(line_items=3)["line_items"])
+    ]
+    table = Table.from_rows(LineItem, line_items)
+
+    assert [len(row["tax_lines"]) for row in table] == [0, 1, 2]
+    assert table[2]["tax_lines"] == line_items[2]["tax_lines"]
+
+
+def test_table__invalid_value():
+    """Verify a row which can't be stored leaves the table unchanged."""
+    line_items = make_large_order(line_items=2)["line_items"]
+    table = Table.from_rows(LineItem, line_items[:1])
+
+    with pytest.raises(ValueError) as e:
+        table.extend([line_items[1], {**line_items[1], "quantity": "2"}])
+
+    assert str(e.value) == "LineItem.quantity: expected int values"
+    assert len(table) == 1
+    assert list(table) == [Table.from_rows(LineItem, line_items[:1])[0]]
+    table.append(line_items[1])
+    assert [row["tax_lines"] for row in table] == [li["tax_lines"] for li in line_items]
+
+
+def test_benchmark():
+    """Verify compact orders use less memory than the other representations."""
+    results = {r["representation"]: r for r in run(50, orders=2, runs=1)}
+
+    assert set(results) == {"validated", "trusted", "compact"}
+    compact = results["compact"]["bytes_per_order"]
+    assert compact * 3 < results["trusted"]["bytes_per_order"]
+    assert compact * 3 < results["validated"]["bytes_per_order"]
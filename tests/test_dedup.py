@@ -0,0 +1,142 @@
+import json
+
+import pytest
+from wkflws.http import Request, Response
+
+from wkflws_shopify.triggers import dedup, listener
+
+PAYLOAD = json.dumps({"idempotency_key": "abc-123", "order_id": 1})
+
+
+@pytest.fixture(params=("memory", "sqlite"))
+def store(request, tmp_path):
+    """Each dedup store."""
+    if request.param == "memory":
+        return dedup.MemoryDedupStore(window=60, max_size=2)
+    return dedup.SQLiteDedupStore(str(tmp_path / "dedup.db"), window=60)
+
+
+def make_request(webhook_id=None, body=PAYLOAD):
+    """Create a webhook request."""
+    headers = {"x-shopify-topic": "subscription_billing_attempt/failed"}
+    if webhook_id is not None:
+        headers["x-shopify-webhook-id"] = webhook_id
+    return Request("https://wkfl.ws/shopify/webhook/", headers, body)
+
+
+def test_store__seen(store):
+    """Verify a key is only new the first time it is seen."""
+    assert store.seen("a") is False
+    assert store.seen("a") is True
+    assert store.seen("b") is False
+    assert store.stats.asdict() == {"checked": 3, "duplicates": 1}
+
+
+def test_store__window(store):
+    """Verify keys are forgotten after the window."""
+    store.window = -1
+    assert store.seen("a") is False
+    assert store.seen("a") is False
+
+
+def test_store__forget(store):
+    """Verify forgotten keys are new again."""
+    store.seen("a")
+    store.forget("a")
+    assert store.seen("a") is False
+
+
+def test_memory_store__max_size():
+    """Verify the oldest key is forgotten when the store is full."""
+    store = dedup.MemoryDedupStore(window=60, max_size=2)
+    store.seen("a")
+    store.seen("b")
+    store.seen("c")
+
+    assert store.seen("a") is False
+    assert store.seen("c") is True
+
+
+def test_sqlite_store__shared(tmp_path):
+    """Verify keys are shared between stores using the same database."""
+    path = str(tmp_path / "dedup.db")
+    first = dedup.SQLiteDedupStore(path, window=60)
+    second = dedup.SQLiteDedupStore(path, window=60)
+
+    assert first.seen("a") is False
+    assert second.seen("a") is True
+
+
+async def test_process_webhook_request__duplicate_webhook_id():
+    """Verify a redelivered webhook is acknowledged without an event."""
+    response = Response()
+    assert await listener.process_webhook_request(make_request("1"), response)
+
+    response = Response()
+    # The body isn't parsed for a duplicate.
+    event = await listener.process_webhook_request(
+        make_request("1", body="not json"), response
+    )
+    assert event is None
+    assert response.status_code == 200
+
+
+async def test_process_webhook_request__duplicate_idempotency_key():
+    """Verify the idempotency key is used when there is no webhook id."""
+    assert await listener.process_webhook_request(make_request(), Response())
+
+    response = Response()
+    assert await listener.process_webhook_request(make_request(), response) is None
+    assert response.status_code == 200
+
+
+async def test_process_webhook_request__invalid_body_is_forgotten():
+    """Verify a request which failed to process is accepted when redelivered."""
+    with pytest.raises(json.JSONDecodeError):
+        await listener.process_webhook_request(
+            make_request("1", body="not json"), Response()
+        )
+
+    assert await listener.process_webhook_request(make_request("1"), Response())
+
+
+async def test_process_webhook_request__disabled(monkeypatch):
+    """Verify every request is processed when deduplication is disabled."""
+    monkeypatch.setattr(dedup.settings, "WEBHOOK_DEDUP_ENABLED", False)
+
+    assert await listener.process_webhook_request(make_request("1"), Response())
+    assert await listener.process_webhook_request(make_request("1"), Response())
+
+
+async def test_process_webhook_request__failed_publish_is_forgotten(monkeypatch):
+    """Verify a webhook whose event couldn't be published is accepted when redelivered.
+
+    The webhook publishes the returned event after the request is processed.
+    """
+    from wkflws.triggers.webhook import WebhookTrigger
+
+    published = []
+
+    async def send_event(self, event):
+        if not published:
+            published.append(None)
+            raise ConnectionError("event bus unavailable")
+        published.append(event)
+
+    monkeypatch.setattr(WebhookTrigger, "send_event", send_event)
+    webhook = listener.get_webhook()
+
+    for webhook_id in ("1", None):
+        published.clear()
+        event = await listener.process_webhook_request(
+            make_request(webhook_id), Response()
+        )
+        with pytest.raises(ConnectionError):
+            await webhook.send_event(event)
+
+        redelivery = await listener.process_webhook_request(
+            make_request(webhook_id), Response()
+        )
+        assert redelivery is not None
+        await webhook.send_event(redelivery)
+        assert published[-1] is redelivery
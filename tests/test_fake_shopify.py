@@ -0,0 +1,184 @@
+import logging
+
+from benchmarks.fake_shopify import (
+    FakeShopify,
+    FIRST_ORDER_ID,
+    send_webhooks,
+)
+from benchmarks.fixtures import make_webhook_burst
+from benchmarks.load import load_http
+import pytest
+
+from wkflws_shopify.http import AsyncHttpClient
+from wkflws_shopify.pagination import paginate
+from wkflws_shopify.ratelimit import CALL_LIMIT_HEADER, RateLimiter
+from wkflws_shopify.retry import RetryPolicy
+from wkflws_shopify.triggers import verify
+
+logger = logging.getLogger("tests")
+
+
+@pytest.fixture
+def shopify():
+    """Start a fake Shopify server without rate limits."""
+    with FakeShopify(orders=12, capacity=None) as server:
+        yield server
+
+
+def make_client(**kwargs) -> AsyncHttpClient:
+    """Create a client for the fake server which retries quickly."""
+    kwargs.setdefault(
+        "retry_policy", RetryPolicy(base_delay=0.01, max_delay=0.05, deadline=5)
+    )
+    return AsyncHttpClient(scheme="http", rate_limiter=RateLimiter(), **kwargs)
+
+
+async def request(client: AsyncHttpClient, shopify: FakeShopify, api_path: str):
+    return await client.request(
+        logger, myshopify_domain=shopify.domain, api_path=api_path, api_token="abc"
+    )
+
+
+async def test_paginate(shopify):
+    """Verify list endpoints are paginated with Link headers."""
+    client = make_client()
+    try:
+        orders = [
+            order
+            async for order in paginate(
+                logger,
+                myshopify_domain=shopify.domain,
+                api_path="/orders.json?limit=5&order=updated_at+desc&fields=id",
+                api_token="abc",
+                key="orders",
+                client=client,
+            )
+        ]
+    finally:
+        client.close()
+
+    assert [o["id"] for o in orders] == [FIRST_ORDER_ID + i for i in range(11, -1, -1)]
+    assert orders[0] == {"id": FIRST_ORDER_ID + 11}
+    assert shopify.request_count == 3
+
+
+async def test_updated_at_min(shopify):
+    """Verify orders can be filtered on the time they were last updated."""
+    client = make_client()
+    try:
+        response = await request(
+            client,
+            shopify,
+            "/orders.json?updated_at_min=2022-10-13T14:26:16-04:00&fields=id",
+        )
+    finally:
+        client.close()
+
+    assert response.json() == {
+        "orders": [{"id": FIRST_ORDER_ID + 10}, {"id": FIRST_ORDER_ID + 11}]
+    }
+
+
+async def test_leaky_bucket():
+    """Verify requests made while the bucket is full are rejected."""
+    with FakeShopify(capacity=40, leak_rate=2) as shopify:
+        shopify.fill(40)
+        client = make_client()
+        try:
+            response = await client.fetch(
+                "GET", f"http://{shopify.domain}/admin/api/2022-04/orders.json"
+            )
+        finally:
+            client.close()
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "0.50"
+    assert response.headers[CALL_LIMIT_HEADER] == "40/40"
+    assert shopify.throttled_count == 1
+
+
+async def test_leaky_bucket__retried():
+    """Verify throttled requests are retried once the bucket has drained."""
+    with FakeShopify(capacity=40, leak_rate=2) as shopify:
+        shopify.fill(40)
+        client = make_client()
+        try:
+            response = await request(client, shopify, f"/orders/{FIRST_ORDER_ID}.json")
+        finally:
+            client.close()
+
+    assert response.status_code == 200
+    assert shopify.throttled_count >= 1
+    assert shopify.request_count == 1 + shopify.throttled_count
+
+
+async def test_fail_next(shopify):
+    """Verify a burst of errors is retried."""
+    shopify.fail_next(2, status=503)
+    client = make_client()
+    try:
+        response = await request(client, shopify, f"/orders/{FIRST_ORDER_ID}.json")
+    finally:
+        client.close()
+
+    assert response.json()["order"]["id"] == FIRST_ORDER_ID
+    assert shopify.request_count == 3
+
+
+async def test_redirect(shopify):
+    """Verify redirects are followed."""
+    shopify.add_redirect(
+        "/admin/api/2022-04/orders/1.json",
+        f"/admin/api/2022-04/orders/{FIRST_ORDER_ID}.json",
+    )
+    client = make_client()
+    try:
+        response = await request(client, shopify, "/orders/1.json")
+    finally:
+        client.close()
+
+    assert response.json()["order"]["id"] == FIRST_ORDER_ID
+    assert shopify.request_count == 2
+
+
+async def test_send_webhooks(local_server):
+    """Verify signed webhooks are sent to the listener."""
+    verifier = verify.WebhookVerifier(default_secret="secret")
+    received = []
+
+    def responder(method, path, headers, body):
+        headers = {k.lower(): v for k, v in headers.items()}
+        received.append(
+            verifier.verify(
+                headers[verify.SHOP_DOMAIN_HEADER], body, headers[verify.HMAC_HEADER]
+            )
+        )
+        return 200, {}, b""
+
+    local_server.responder = responder
+
+    results = await send_webhooks(
+        f"http://{local_server.domain}/shopify/webhook/",
+        make_webhook_burst(5),
+        secret="secret",
+        concurrency=2,
+    )
+
+    assert [status for status, _ in results] == [200] * 5
+    assert received == [True] * 5
+
+
+async def test_load_http():
+    """Verify the load test reports the status of each call."""
+    with FakeShopify(orders=5, capacity=None, error_rate=0.2) as shopify:
+        results = await load_http(
+            requests=20,
+            concurrency=5,
+            shopify=shopify,
+            retry_policy=RetryPolicy(base_delay=0.01, deadline=None),
+        )
+
+    assert results["calls"] == 20
+    assert results["statuses"] == {"200": 20}
+    assert results["server_requests"] == 20 + results["client_retries"]
+    assert results["p50_ms"] <= results["p99_ms"] <= results["max_ms"]
@@ -0,0 +1,47 @@
+import urllib.parse
+
+from conftest import json_response, make_order
+import pytest
+
+from wkflws_shopify import http
+from wkflws_shopify.get_orders import node
+
+
+@pytest.fixture
+def shopify(local_server):
+    """Serve orders 1-600 (except 13) from the local server."""
+    existing = set(range(1, 601)) - {13}
+
+    def responder(method, path, headers, body):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(path).query)
+        ids = [int(i) for i in query["ids"][0].split(",")]
+        assert query["status"] == ["any"]
+        return json_response({"orders": [make_order(i) for i in ids if i in existing]})
+
+    local_server.responder = responder
+    http.set_client(http.AsyncHttpClient(scheme="http"))
+    yield local_server
+    http.set_client(None)
+
+
+async def test_get_orders(shopify):
+    """Verify orders are fetched in chunks and missing ids are reported."""
+    order_ids = [600, *range(1, 300), 13, 1]
+
+    result = await node.get_orders(
+        {"order_ids": order_ids},
+        {"myshopify_domain": shopify.domain, "shopify_token": "abc"},
+    )
+
+    assert len(shopify.requests) == 2, "Expected the ids to be split in 2 chunks"
+    assert [o["id"] for o in result["orders"]] == [600, *range(1, 13), *range(14, 300)]
+    assert result["missing_order_ids"] == [13]
+
+
+async def test_get_orders__requires_ids(shopify):
+    """Verify at least one order id is required."""
+    with pytest.raises(ValueError):
+        await node.get_orders(
+            {"order_ids": []},
+            {"myshopify_domain": shopify.domain, "shopify_token": "abc"},
+        )
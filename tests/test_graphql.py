@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+
+from conftest import json_response
+import pytest
+
+from wkflws_shopify import http, ratelimit
+from wkflws_shopify.graphql import GraphQLClient, GraphQLError
+
+logger = logging.getLogger("tests")
+
+QUERY = "query ($id: ID!) { order(id: $id) { name } }"
+
+
+def graphql_response(data=None, errors=None, available=990.0, restore_rate=50.0):
+    """Create a GraphQL response reporting the cost budget."""
+    body = {
+        "extensions": {
+            "cost": {
+                "requestedQueryCost": 10,
+                "actualQueryCost": 1,
+                "throttleStatus": {
+                    "maximumAvailable": 1000.0,
+                    "currentlyAvailable": available,
+                    "restoreRate": restore_rate,
+                },
+            }
+        }
+    }
+    if data is not None:
+        body["data"] = data
+    if errors is not None:
+        body["errors"] = errors
+    return json_response(body)
+
+
+@pytest.fixture
+def client():
+    """Create a GraphQL client using its own cost budget."""
+    return GraphQLClient(
+        http_client=http.AsyncHttpClient(scheme="http"),
+        rate_limiter=ratelimit.CostRateLimiter(),
+    )
+
+
+async def test_execute(local_server, client):
+    """Verify the query and variables are sent and the data returned."""
+    received = {}
+
+    def responder(method, path, headers, body):
+        received.update(method=method, path=path, body=json.loads(body))
+        return graphql_response({"order": {"name": "#1001"}})
+
+    local_server.responder = responder
+
+    data = await client.execute(
+        logger,
+        myshopify_domain=local_server.domain,
+        api_token="abc",
+        query=QUERY,
+        variables={"id": "gid://shopify/Order/1"},
+    )
+
+    assert data == {"order": {"name": "#1001"}}
+    assert received == {
+        "method": "POST",
+        "path": "/admin/api/2022-04/graphql.json",
+        "body": {"query": QUERY, "variables": {"id": "gid://shopify/Order/1"}},
+    }
+
+
+async def test_execute__updates_budget(local_server, client):
+    """Verify the bucket and cost estimate come from the response."""
+    local_server.responder = lambda *a: graphql_response({}, available=500.0)
+
+    await client.execute(
+        logger, myshopify_domain=local_server.domain, api_token="abc", query=QUERY
+    )
+
+    bucket = client.rate_limiter.get_bucket(local_server.domain)
+    assert 500.0 <= bucket.available < 510.0
+    assert client.estimate_cost(QUERY) == 10
+    assert client.estimate_cost("{ shop { name } }") == client.default_cost
+
+
+async def test_execute__throttled(local_server, client):
+    """Verify throttled queries wait for the budget to be restored and retry."""
+    responses = [
+        graphql_response(
+            errors=[{"message": "Throttled", "extensions": {"code": "THROTTLED"}}],
+            available=0.0,
+            restore_rate=1000.0,
+        ),
+        graphql_response({"shop": {"name": "heyhorse"}}),
+    ]
+    local_server.responder = lambda *a: responses.pop(0)
+
+    data = await client.execute(
+        logger, myshopify_domain=local_server.domain, api_token="abc", query=QUERY
+    )
+
+    assert data == {"shop": {"name": "heyhorse"}}
+    assert client.throttled_queries == 1
+
+
+async def test_execute__errors(local_server, client):
+    """Verify query errors are raised."""
+    local_server.responder = lambda *a: graphql_response(
+        {"order": None}, errors=[{"message": "Invalid id"}]
+    )
+
+    with pytest.raises(GraphQLError) as e:
+        await client.execute(
+            logger, myshopify_domain=local_server.domain, api_token="abc", query=QUERY
+        )
+
+    assert str(e.value) == "Invalid id"
+    assert e.value.data == {"order": None}
+
+
+async def test_execute__not_rest_rate_limited(local_server, client):
+    """Verify queries don't use the REST request bucket."""
+    local_server.responder = lambda *a: graphql_response({})
+
+    await client.execute(
+        logger, myshopify_domain=local_server.domain, api_token="abc", query=QUERY
+    )
+
+    bucket = client.http_client.rate_limiter.get_bucket(local_server.domain)
+    assert bucket.level == 0
+
+
+def test_cost_bucket__reserve():
+    """Verify queries wait once the budget is exhausted."""
+    now = [0.0]
+    bucket = ratelimit.CostBucket(capacity=100, restore_rate=10, clock=lambda: now[0])
+
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(60) == pytest.approx(2.0)
+
+    now[0] = 2.0
+    bucket.record_throttle_status(
+        60,
+        {"maximumAvailable": 100, "currentlyAvailable": 50, "restoreRate": 10},
+    )
+    # The second query is still in flight.
+    assert bucket.available == pytest.approx(-10.0)
+
+
+async def test_cost_bucket__concurrent_queries_paced():
+    """Verify concurrent queries are spread over the restore rate."""
+    bucket = ratelimit.CostBucket(capacity=10, restore_rate=200)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    await asyncio.gather(*(bucket.acquire(10) for _ in range(3)))
+
+    # The 2nd and 3rd queries each wait for 10 points (0.05s) to be restored.
+    assert loop.time() - start >= 0.09
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+
+from conftest import json_response
+import pytest
+
+from wkflws_shopify import http
+from wkflws_shopify.http import AsyncHttpClient, HttpError
+
+logger = logging.getLogger("tests")
+
+
+async def test_async_request__reuses_connection(local_server):
+    """Verify sequential requests to a shop share a single keep-alive connection."""
+    local_server.responder = lambda m, p, h, b: json_response({"order": {"id": 1}})
+    client = AsyncHttpClient(scheme="http")
+
+    for _ in range(5):
+        response = await client.request(
+            logger,
+            myshopify_domain=local_server.domain,
+            api_path="/orders/1.json",
+            api_token="abc",
+        )
+        assert response.status_code == 200
+        assert response.json() == {"order": {"id": 1}}
+
+    assert local_server.connections == 1, "Expected the connection to be reused"
+    assert local_server.requests == [("GET", "/admin/api/2022-04/orders/1.json")] * 5
+
+
+async def test_async_request__pool_limit(local_server):
+    """Verify concurrent requests never open more than the pool limit."""
+    client = AsyncHttpClient(scheme="http", max_connections_per_shop=2)
+
+    responses = await asyncio.gather(
+        *(
+            client.request(
+                logger,
+                myshopify_domain=local_server.domain,
+                api_path=f"/orders/{i}.json",
+                api_token="abc",
+            )
+            for i in range(10)
+        )
+    )
+
+    assert all(r.status_code == 200 for r in responses)
+    pool = client.get_pool("http", "127.0.0.1", local_server.server_address[1])
+    assert pool.connections_opened <= 2
+
+
+async def test_async_request__prunes_idle_connections(local_server):
+    """Verify expired idle connections are closed and unused pools removed."""
+    client = AsyncHttpClient(scheme="http", idle_timeout=0.05)
+    await client.request(
+        logger,
+        myshopify_domain=local_server.domain,
+        api_path="/orders/1.json",
+        api_token="abc",
+    )
+    (pool,) = client._pools.values()
+    (conn,) = pool._idle
+    await asyncio.sleep(0.1)
+
+    client.get_pool("http", "other.myshopify.com", 80)
+
+    assert conn.writer.is_closing()
+    assert list(client._pools) == [("http", "other.myshopify.com", 80)]
+
+
+def test_async_request__new_loop_closes_connections(local_server):
+    """Verify idle connections of a previous event loop are closed."""
+    client = AsyncHttpClient(scheme="http")
+    first, second = asyncio.new_event_loop(), asyncio.new_event_loop()
+
+    def request(loop):
+        return loop.run_until_complete(
+            client.request(
+                logger,
+                myshopify_domain=local_server.domain,
+                api_path="/orders/1.json",
+                api_token="abc",
+            )
+        )
+
+    try:
+        request(first)
+        (pool,) = client._pools.values()
+        (conn,) = pool._idle
+
+        request(second)
+
+        assert conn.writer.is_closing()
+        assert pool not in client._pools.values()
+    finally:
+        client.close()
+        first.close()
+        second.close()
+
+
+async def test_async_request__sends_headers_and_payload(local_server):
+    """Verify the access token and JSON payload are sent."""
+    received = {}
+
+    def responder(method, path, headers, body):
+        received.update(method=method, headers=headers, body=body)
+        return json_response({}, status=201)
+
+    local_server.responder = responder
+    client = AsyncHttpClient(scheme="http")
+
+    response = await client.request(
+        logger,
+        myshopify_domain=local_server.domain,
+        api_path="/orders.json",
+        api_token="abc",
+        json_data={"order": {"note": "hi"}},
+    )
+
+    assert response.status_code == 201
+    assert received["method"] == "POST"
+    assert received["headers"]["X-Shopify-Access-Token"] == "abc"
+    assert json.loads(received["body"]) == {"order": {"note": "hi"}}
+
+
+async def test_async_request__chunked_response(local_server):
+    """Verify chunked transfer encoded responses are decoded."""
+    data = {"orders": [{"id": i} for i in range(20)]}
+    local_server.responder = lambda m, p, h, b: json_response(
+        data, headers={"Transfer-Encoding": "chunked"}
+    )
+    client = AsyncHttpClient(scheme="http")
+
+    for _ in range(2):
+        response = await client.request(
+            logger,
+            myshopify_domain=local_server.domain,
+            api_path="/orders.json",
+            api_token="abc",
+        )
+        assert response.json() == data
+
+    assert local_server.connections == 1
+
+
+async def test_async_request__follows_redirect(local_server):
+    """Verify redirects are followed."""
+
+    def responder(method, path, headers, body):
+        if path.endswith("/old.json"):
+            return 301, {"Location": "/admin/api/2022-04/new.json"}, b""
+        return json_response({"moved": True})
+
+    local_server.responder = responder
+    client = AsyncHttpClient(scheme="http")
+
+    response = await client.request(
+        logger,
+        myshopify_domain=local_server.domain,
+        api_path="/old.json",
+        api_token="abc",
+    )
+
+    assert response.json() == {"moved": True}
+
+
+async def test_async_request__client_error(local_server):
+    """Verify a client error raises an HttpError."""
+    local_server.responder = lambda m, p, h, b: json_response(
+        {"errors": "Not Found"}, status=404
+    )
+    client = AsyncHttpClient(scheme="http")
+
+    with pytest.raises(HttpError) as exc_info:
+        await client.request(
+            logger,
+            myshopify_domain=local_server.domain,
+            api_path="/orders/1.json",
+            api_token="abc",
+        )
+
+    assert exc_info.value.status_code == 404
+    assert "Not Found" in exc_info.value.body
+
+
+async def test_make_async_http_request__shared_client(local_server):
+    """Verify the module level function uses the shared client."""
+    client = AsyncHttpClient(scheme="http")
+    http.set_client(client)
+    try:
+        assert http.get_client() is client
+        response = await http.make_async_http_request(
+            logger,
+            myshopify_domain=local_server.domain,
+            api_path="/orders/1.json",
+            api_token="abc",
+        )
+    finally:
+        http.set_client(None)
+
+    assert response.status_code == 200
+
+
+async def test_async_request__coalesces_identical_gets(local_server):
+    """Verify concurrent identical GETs share one request."""
+    client = AsyncHttpClient(scheme="http")
+
+    def request(path):
+        return client.request(
+            logger,
+            myshopify_domain=local_server.domain,
+            api_path=path,
+            api_token="abc",
+        )
+
+    responses = await asyncio.gather(
+        *(request("/orders/1.json") for _ in range(5)), request("/orders/2.json")
+    )
+
+    assert len(local_server.requests) == 2
+    assert all(r is responses[0] for r in responses[:5])
+    assert responses[5] is not responses[0]
+    assert client.coalesced_requests == 4
+
+    # Once complete the request is no longer shared.
+    await request("/orders/1.json")
+    assert len(local_server.requests) == 3
+
+
+async def test_async_request__coalesce_disabled(local_server):
+    """Verify coalescing can be disabled."""
+    client = AsyncHttpClient(scheme="http", coalesce_requests=False)
+
+    await asyncio.gather(
+        *(
+            client.request(
+                logger,
+                myshopify_domain=local_server.domain,
+                api_path="/orders/1.json",
+                api_token="abc",
+            )
+            for _ in range(3)
+        )
+    )
+
+    assert len(local_server.requests) == 3
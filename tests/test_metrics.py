@@ -0,0 +1,180 @@
+import json
+import logging
+
+from conftest import json_response, make_order
+import pytest
+from wkflws.http import Request, Response
+
+from wkflws_shopify import metrics
+from wkflws_shopify.http import AsyncHttpClient
+from wkflws_shopify.ratelimit import LeakyBucket, RateLimiter
+from wkflws_shopify.retry import RetryPolicy
+from wkflws_shopify.triggers import listener, verify
+
+logger = logging.getLogger("tests")
+
+
+@pytest.fixture
+def registry():
+    """Record metrics in a new registry."""
+    registry = metrics.MetricsRegistry(buckets=(0.1, 1.0))
+    metrics.set_metrics(registry)
+    yield registry
+    metrics.set_metrics(None)
+
+
+def test_disabled_by_default():
+    assert metrics.get_metrics() is None
+
+
+def test_endpoint_label():
+    assert metrics.endpoint_label("/orders/450789469.json?fields=id") == (
+        "/orders/{id}.json"
+    )
+    assert metrics.endpoint_label("/customers/7/orders.json") == (
+        "/customers/{id}/orders.json"
+    )
+    assert metrics.endpoint_label("/graphql.json") == "/graphql.json"
+
+
+def test_render(registry):
+    """Verify metrics are exported in the Prometheus text format."""
+    registry.increment("requests_total", shop='a"b')
+    registry.increment("requests_total", 2, shop='a"b')
+    registry.observe("duration_seconds", 0.05, topic="orders/create")
+    registry.observe("duration_seconds", 0.5, topic="orders/create")
+    registry.observe("duration_seconds", 5, topic="orders/create")
+
+    assert registry.render() == (
+        "# TYPE requests_total counter\n"
+        'requests_total{shop="a\\"b"} 3\n'
+        "# TYPE duration_seconds histogram\n"
+        'duration_seconds_bucket{topic="orders/create",le="0.1"} 1\n'
+        'duration_seconds_bucket{topic="orders/create",le="1"} 2\n'
+        'duration_seconds_bucket{topic="orders/create",le="+Inf"} 3\n'
+        'duration_seconds_sum{topic="orders/create"} 5.55\n'
+        'duration_seconds_count{topic="orders/create"} 3\n'
+    )
+
+
+async def test_http_request(registry, local_server):
+    """Verify request durations, statuses, retries and rate limit waits are recorded."""
+    responses = [
+        json_response(
+            {"errors": "unavailable"}, status=503, headers={"Retry-After": "0"}
+        ),
+        json_response({"order": {"id": 1}}),
+        json_response({"order": {"id": 1}}),
+    ]
+    local_server.responder = lambda *args: responses.pop(0)
+    domain = local_server.domain
+
+    rate_limiter = RateLimiter()
+    # The second request waits for the first to leak from the bucket.
+    rate_limiter._buckets[domain] = LeakyBucket(capacity=1, leak_rate=100, headroom=0)
+    client = AsyncHttpClient(
+        scheme="http",
+        rate_limiter=rate_limiter,
+        retry_policy=RetryPolicy(rng=lambda: 0.0),
+    )
+    try:
+        for _ in range(2):
+            await client.request(
+                logger,
+                myshopify_domain=domain,
+                api_path="/orders/1.json",
+                api_token="a",
+            )
+    finally:
+        client.close()
+
+    labels = dict(shop=domain, endpoint="/orders/{id}.json")
+    assert registry.get_counter(metrics.HTTP_RESPONSES, status="200", **labels) == 2
+    assert registry.get_counter(metrics.HTTP_RESPONSES, status="503", **labels) == 1
+    assert registry.get_counter(metrics.HTTP_RETRIES, **labels) == 1
+    assert registry.get_counter(metrics.HTTP_BACKOFF_SECONDS, shop=domain) == 0
+    assert registry.get_counter(metrics.RATE_LIMIT_WAIT_SECONDS, shop=domain) > 0
+    histogram = registry.get_histogram(
+        metrics.HTTP_REQUEST_DURATION, method="GET", status="200", **labels
+    )
+    assert histogram is not None and histogram.count == 2
+
+
+async def test_webhook(registry):
+    """Verify webhook processing and acceptance is timed by topic."""
+    headers = {
+        "x-shopify-topic": "orders/create",
+        "x-shopify-shop-domain": "heyhorse.myshopify.com",
+        "x-shopify-webhook-id": "daea8817-0caf-420a-8d03-615277bf5b6a",
+    }
+    request = Request(
+        "https://wkfl.ws/shopify/webhook/", headers, json.dumps(make_order())
+    )
+
+    event = await listener.process_webhook_request(request, Response())
+    assert event is not None
+    await listener.accept_event(event)
+    # Redelivery
+    await listener.process_webhook_request(request, Response())
+
+    process = registry.get_histogram(
+        metrics.WEBHOOK_PROCESS_DURATION, topic="orders/create", status="204"
+    )
+    duplicate = registry.get_histogram(
+        metrics.WEBHOOK_PROCESS_DURATION, topic="orders/create", status="200"
+    )
+    accept = registry.get_histogram(
+        metrics.WEBHOOK_ACCEPT_DURATION, topic="orders/create"
+    )
+    assert process is not None and process.count == 1
+    assert duplicate is not None and duplicate.count == 1
+    assert accept is not None and accept.count == 1
+    assert registry.get_counter(metrics.WEBHOOK_EVENTS, topic="orders/create") == 1
+
+
+async def test_webhook__unknown_topic(registry):
+    """Verify only registered topics of verified webhooks are used as labels."""
+
+    async def process(topic):
+        headers = {"x-shopify-topic": topic, "x-shopify-webhook-id": topic}
+        request = Request("https://wkfl.ws/shopify/webhook/", headers, "{}")
+        response = Response()
+        await listener.process_webhook_request(request, response)
+        return response.status_code
+
+    assert await process("made/up") == 204
+    verify.set_verifier(verify.WebhookVerifier(default_secret="secret"))
+    assert await process("orders/create") == 401
+
+    for topic in ("made/up", "orders/create"):
+        for status in ("204", "401"):
+            assert (
+                registry.get_histogram(
+                    metrics.WEBHOOK_PROCESS_DURATION, topic=topic, status=status
+                )
+                is None
+            )
+    for status in ("204", "401"):
+        histogram = registry.get_histogram(
+            metrics.WEBHOOK_PROCESS_DURATION, topic="unknown", status=status
+        )
+        assert histogram is not None and histogram.count == 1
+
+
+async def test_serve_metrics(registry):
+    registry.increment(metrics.WEBHOOK_EVENTS, topic="orders/create")
+    response = Response()
+
+    await listener.serve_metrics(Request("https://wkfl.ws/", {}, ""), response)
+
+    assert response.status_code == 200
+    assert response.headers == {"Content-Type": metrics.PROMETHEUS_CONTENT_TYPE}
+    assert 'shopify_webhook_events_total{topic="orders/create"} 1\n' in response.body
+
+
+async def test_serve_metrics__disabled():
+    response = Response()
+
+    await listener.serve_metrics(Request("https://wkfl.ws/", {}, ""), response)
+
+    assert response.status_code == 404
@@ -0,0 +1,194 @@
+from datetime import datetime, timezone
+import logging
+import sqlite3
+
+from benchmarks.fake_shopify import FakeShopify, FIRST_ORDER_ID
+from benchmarks.fixtures import make_customer
+from conftest import make_order
+import pytest
+from wkflws.events import Event
+
+from wkflws_shopify import http, mirror as mirror_m
+from wkflws_shopify.mirror import (
+    backfill_orders,
+    OrderMirror,
+    set_order_mirror,
+    split_tags,
+)
+from wkflws_shopify.query_orders.node import query_orders
+from wkflws_shopify.triggers import listener
+
+logger = logging.getLogger("tests")
+SHOP = "heyhorse.myshopify.com"
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    """Mirror orders to a temporary database."""
+    mirror = OrderMirror(str(tmp_path / "mirror.sqlite3"))
+    set_order_mirror(mirror)
+    yield mirror
+    set_order_mirror(None)
+    mirror.close()
+
+
+def ids(orders) -> list[int]:
+    return [o["id"] for o in orders]
+
+
+def test_split_tags():
+    assert split_tags("VIP, wholesale,,  Net 30 ") == ["vip", "wholesale", "net 30"]
+    assert split_tags("") == []
+    assert split_tags(None) == []
+
+
+def test_query_orders(mirror):
+    """Verify orders are found by each indexed field."""
+    mirror.add_orders(
+        SHOP,
+        [
+            make_order(
+                1, tags="VIP, wholesale", created_at="2022-10-01T10:00:00-04:00"
+            ),
+            make_order(2, tags="vip", email="Other@Example.com"),
+            make_order(
+                3,
+                customer={**make_customer(5), "email": "other@example.com"},
+                created_at="2022-10-20T10:00:00Z",
+            ),
+        ],
+    )
+    mirror.add_order("other.myshopify.com", make_order(4, tags="vip"))
+
+    assert ids(mirror.query_orders(SHOP)) == [3, 2, 1]
+    assert ids(mirror.query_orders(SHOP, tag="Vip")) == [2, 1]
+    assert ids(mirror.query_orders(SHOP, tag="wholesale")) == [1]
+    assert ids(mirror.query_orders(SHOP, email="other@example.COM")) == [2]
+    assert ids(mirror.query_orders(SHOP, customer_id=5)) == [3]
+    assert ids(mirror.query_orders(SHOP, sku="MM-7482", limit=2)) == [3, 2]
+    assert ids(
+        mirror.query_orders(
+            SHOP,
+            created_at_min=datetime(2022, 10, 1, 14, tzinfo=timezone.utc),
+            created_at_max=datetime(2022, 10, 13, 18, 15, tzinfo=timezone.utc),
+        )
+    ) == [2, 1]
+    assert mirror.query_orders(SHOP, tag="vip", customer_id=5) == []
+    assert mirror.find_customers(SHOP, "OTHER@example.com")[0]["id"] == 5
+
+
+def test_add_order__stale(mirror):
+    """Verify an order is only replaced by a more recent version."""
+    mirror.add_order(SHOP, make_order(1, tags="a", updated_at="2022-10-13T14:16:16Z"))
+    mirror.add_order(SHOP, make_order(1, tags="b", updated_at="2022-10-13T14:16:15Z"))
+
+    assert mirror.get_order(SHOP, 1)["tags"] == "a"
+    assert ids(mirror.query_orders(SHOP, tag="b")) == []
+
+    mirror.add_order(SHOP, make_order(1, tags="c", updated_at="2022-10-13T14:16:17Z"))
+
+    assert mirror.get_order(SHOP, 1)["tags"] == "c"
+    assert ids(mirror.query_orders(SHOP, tag="a")) == []
+    assert ids(mirror.query_orders(SHOP, tag="c")) == [1]
+
+
+def test_add_orders__invalid(mirror):
+    """Verify no order of a batch is stored if one can't be stored."""
+    with pytest.raises(KeyError):
+        mirror.add_orders(SHOP, [make_order(1), {"email": "no-id@example.com"}])
+
+    assert mirror.query_orders(SHOP) == []
+
+
+def test_add_customer(mirror):
+    """Verify an order's partial customer doesn't replace the customer."""
+    customer = {**make_customer(5), "updated_at": "2022-10-13T14:16:16-04:00"}
+    mirror.add_customer(SHOP, customer)
+    mirror.add_order(SHOP, make_order(1, customer={"id": 5, "email": "old@a.com"}))
+
+    assert mirror.get_customer(SHOP, 5) == customer
+    assert mirror.get_customer(SHOP, 6) is None
+
+
+async def test_mirror_event(mirror):
+    """Verify the listener stores orders and customers received by webhook."""
+
+    async def accept(topic, data):
+        metadata = {"x-shopify-topic": topic, "x-shopify-shop-domain": SHOP}
+        await listener.accept_event(Event("abc123", metadata, data))
+
+    await accept("orders/create", make_order(1, tags="vip"))
+    await accept("customers/update", make_customer(5))
+
+    assert ids(mirror.query_orders(SHOP, tag="vip")) == [1]
+    assert mirror.get_customer(SHOP, 5)["id"] == 5
+
+    await accept("orders/delete", {"id": 1})
+
+    assert mirror.get_order(SHOP, 1) is None
+    assert mirror.query_orders(SHOP, sku="MM-7482") == []
+
+
+async def test_backfill_orders(mirror):
+    http.set_client(http.AsyncHttpClient(scheme="http"))
+    try:
+        with FakeShopify(orders=300, capacity=None) as shopify:
+            count = await backfill_orders(
+                logger,
+                myshopify_domain=shopify.domain,
+                api_token="abc",
+                mirror=mirror,
+            )
+            requests = len(shopify.requests)
+    finally:
+        http.set_client(None)
+
+    assert count == 300
+    assert requests == 2
+    assert len(mirror.query_orders(shopify.domain, limit=1000)) == 300
+    assert mirror.get_order(shopify.domain, FIRST_ORDER_ID)["id"] == FIRST_ORDER_ID
+
+
+async def test_query_orders_node(mirror):
+    mirror.add_orders(SHOP, [make_order(1, tags="vip"), make_order(2)])
+
+    result = await query_orders({"tag": "vip"}, {"myshopify_domain": SHOP})
+    trusted = await query_orders(
+        {"tag": "vip", "trusted": True}, {"myshopify_domain": SHOP}
+    )
+
+    assert ids(result["orders"]) == [1]
+    assert result["orders"][0]["tags"] == "vip"
+    assert trusted["orders"][0]["total_price"] == make_order(1)["total_price"]
+
+
+async def test_query_orders_node__disabled():
+    with pytest.raises(RuntimeError):
+        await query_orders({"tag": "vip"}, {"myshopify_domain": SHOP})
+
+
+async def test_mirror_event__failure(mirror, monkeypatch):
+    """Verify the workflow is started when the event can't be mirrored."""
+
+    def add_order(shop, order):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(mirror, "add_order", add_order)
+    metadata = {"x-shopify-topic": "orders/updated", "x-shopify-shop-domain": SHOP}
+
+    trigger, data = await listener.accept_event(
+        Event("abc123", metadata, make_order(1))
+    )
+
+    assert trigger == "wkflws_shopify.triggers.orders_updated"
+    assert data["id"] == 1
+    assert mirror.get_order(SHOP, 1) is None
+
+
+def test_get_order_mirror__path_required(monkeypatch):
+    """Verify the mirror isn't stored at a path which may not persist."""
+    monkeypatch.setattr(mirror_m.settings, "MIRROR_ENABLED", True)
+    monkeypatch.setattr(mirror_m.settings, "MIRROR_PATH", None)
+
+    with pytest.raises(RuntimeError):
+        mirror_m.get_order_mirror()
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import urllib.parse
+
+from conftest import json_response, make_order
+import pytest
+
+from wkflws_shopify.http import AsyncHttpClient
+from wkflws_shopify.pagination import paginate, paginate_pages, parse_link_header
+from wkflws_shopify.schemas.compact import CompactOrder
+from wkflws_shopify.schemas.orders import Order
+
+logger = logging.getLogger("tests")
+
+
+@pytest.fixture
+def shopify(local_server):
+    """Serve 3 pages of 2 orders each."""
+
+    def responder(method, path, headers, body):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(path).query)
+        page = int(query.get("page_info", ["0"])[0])
+        response_headers = {}
+        if page < 2:
+            response_headers["Link"] = (
+                f"<http://{local_server.domain}/admin/api/2022-04/orders.json?"
+                f'limit=2&page_info={page + 1}>; rel="next"'
+            )
+        return json_response(
+            {"orders": [make_order(page * 2 + 1), make_order(page * 2 + 2)]},
+            headers=response_headers,
+        )
+
+    local_server.responder = responder
+    return local_server
+
+
+def test_parse_link_header():
+    value = (
+        "<https://a.myshopify.com/admin/api/2022-04/orders.json?page_info=abc>; "
+        'rel="previous", <https://a.myshopify.com/admin/api/2022-04/orders.json?'
+        'page_info=def>; rel="next"'
+    )
+
+    assert parse_link_header(value) == {
+        "previous": "https://a.myshopify.com/admin/api/2022-04/orders.json?"
+        "page_info=abc",
+        "next": "https://a.myshopify.com/admin/api/2022-04/orders.json?page_info=def",
+    }
+    assert parse_link_header(None) == {}
+
+
+@pytest.mark.parametrize("prefetch", (False, True))
+async def test_paginate(shopify, prefetch):
+    """Verify every record is returned by following the next links."""
+    records = [
+        record
+        async for record in paginate(
+            logger,
+            myshopify_domain=shopify.domain,
+            api_path="/orders.json?limit=2",
+            api_token="abc",
+            key="orders",
+            model=Order,
+            prefetch=prefetch,
+            client=AsyncHttpClient(scheme="http"),
+        )
+    ]
+
+    assert [r.api_id for r in records] == [1, 2, 3, 4, 5, 6]
+    assert shopify.requests == [
+        ("GET", "/admin/api/2022-04/orders.json?limit=2"),
+        ("GET", "/admin/api/2022-04/orders.json?limit=2&page_info=1"),
+        ("GET", "/admin/api/2022-04/orders.json?limit=2&page_info=2"),
+    ]
+
+
+async def test_paginate__parse(shopify):
+    """Verify records are converted with ``parse`` when given."""
+    records = [
+        record
+        async for record in paginate(
+            logger,
+            myshopify_domain=shopify.domain,
+            api_path="/orders.json?limit=2",
+            api_token="abc",
+            key="orders",
+            parse=CompactOrder.from_dict,
+            client=AsyncHttpClient(scheme="http"),
+        )
+    ]
+
+    assert all(isinstance(r, CompactOrder) for r in records)
+    assert [r.api_id for r in records] == [1, 2, 3, 4, 5, 6]
+
+
+@pytest.mark.parametrize("prefetch,expected_requests", ((False, 1), (True, 2)))
+async def test_paginate_pages__prefetch(shopify, prefetch, expected_requests):
+    """Verify the next page is only requested early when prefetching."""
+    pages = paginate_pages(
+        logger,
+        myshopify_domain=shopify.domain,
+        api_path="/orders.json?limit=2",
+        api_token="abc",
+        key="orders",
+        prefetch=prefetch,
+        client=AsyncHttpClient(scheme="http"),
+    )
+
+    page = await pages.__anext__()
+    await asyncio.sleep(0.1)
+    await pages.aclose()
+
+    assert [r["id"] for r in page] == [1, 2]
+    assert len(shopify.requests) == expected_requests
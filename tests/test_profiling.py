@@ -0,0 +1,140 @@
+import json
+import pstats
+import time
+
+from conftest import json_response, make_order
+import pytest
+from wkflws.http import Request, Response
+
+from wkflws_shopify import http, profiling
+from wkflws_shopify.conf import settings
+from wkflws_shopify.get_order.node import get_order
+from wkflws_shopify.triggers import listener
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    """Write profiles to a temporary directory."""
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def read_profiles(directory) -> list[dict]:
+    return [json.loads(p.read_text()) for p in sorted(directory.glob("*.json"))]
+
+
+async def test_get_order__context_flag(profile_dir, local_server):
+    """Verify each phase of a node execution is timed when requested."""
+    local_server.responder = lambda *args: json_response({"order": make_order(1)})
+    http.set_client(http.AsyncHttpClient(scheme="http"))
+    context = {"myshopify_domain": local_server.domain, "shopify_token": "abc"}
+    try:
+        await get_order({"order_id": 1}, context)
+        assert read_profiles(profile_dir) == []
+
+        await get_order({"order_id": 1}, {**context, "profile": True})
+    finally:
+        http.set_client(None)
+
+    (profile,) = read_profiles(profile_dir)
+    assert profile["name"] == "get_order"
+    assert profile["metadata"] == {"shop": local_server.domain}
+    assert set(profile["phases"]) == {
+        "network",
+        "rate_limit",
+        "json_decode",
+        "validation",
+        "serialization",
+        "other",
+    }
+    assert profile["total_seconds"] >= sum(profile["phases"].values()) - 1e-6
+    assert profile["capture_file"] is None
+
+
+def test_phase__not_profiling(profile_dir):
+    with profiling.phase(profiling.NETWORK):
+        pass
+
+    assert profiling.phase(profiling.NETWORK) is profiling.phase(profiling.VALIDATION)
+    assert list(profile_dir.iterdir()) == []
+
+
+def test_profile__nested(profile_dir):
+    """Verify nested invocations are part of the outer profile."""
+    with profiling.profile("outer", enabled=True) as outer:
+        with profiling.profile("inner", enabled=True) as inner:
+            with profiling.phase(profiling.VALIDATION):
+                pass
+
+    assert inner is None
+    assert "validation" in outer.phases
+    assert [p["name"] for p in read_profiles(profile_dir)] == ["outer"]
+
+
+def test_profile__cprofile(profile_dir, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_CAPTURE", "cprofile")
+
+    with profiling.profile("captured", enabled=True) as profile:
+        sorted(range(1000), key=lambda i: -i)
+
+    stats = pstats.Stats(str(profile_dir / profile.capture_file))
+    assert any(func[2] == "<lambda>" for func in stats.stats)
+
+
+def test_profile__sampling(profile_dir, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_CAPTURE", "sampling")
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_INTERVAL", 0.001)
+
+    def wait_here():
+        time.sleep(0.05)
+
+    with profiling.profile("sampled", enabled=True) as profile:
+        wait_here()
+
+    assert profile.capture_file.endswith(".folded")
+    folded = (profile_dir / profile.capture_file).read_text()
+    assert "test_profile__sampling" in folded
+    assert "wait_here" in folded
+
+
+def test_profile__unwritable(tmp_path, monkeypatch, caplog):
+    """Verify a profile which can't be written doesn't change the result."""
+    not_a_directory = tmp_path / "profiles"
+    not_a_directory.write_text("")
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(not_a_directory))
+
+    with profiling.profile("unwritable", enabled=True) as profile:
+        result = 42
+
+    assert result == 42
+    assert profile.total is not None
+    assert "Unable to write profile" in caplog.text
+
+    with pytest.raises(KeyError):
+        with profiling.profile("unwritable", enabled=True):
+            raise KeyError("order")
+
+
+async def test_process_webhook_request__enabled(profile_dir, monkeypatch):
+    """Verify webhooks are profiled when enabled in settings."""
+    monkeypatch.setattr(settings, "PROFILE_ENABLED", True)
+    headers = {
+        "x-shopify-topic": "orders/create",
+        "x-shopify-shop-domain": "heyhorse.myshopify.com",
+        "x-shopify-webhook-id": "daea8817-0caf-420a-8d03-615277bf5b6a",
+    }
+    request = Request(
+        "https://wkfl.ws/shopify/webhook/", headers, json.dumps(make_order())
+    )
+
+    event = await listener.process_webhook_request(request, Response())
+    await listener.accept_event(event)
+
+    accept, process = sorted(read_profiles(profile_dir), key=lambda p: p["name"])
+    assert process["name"] == "process_webhook_request"
+    assert process["metadata"] == {
+        "topic": "orders/create",
+        "shop": "heyhorse.myshopify.com",
+    }
+    assert {"dedup", "json_decode"} <= set(process["phases"])
+    assert accept["name"] == "accept_event"
@@ -0,0 +1,90 @@
+from conftest import json_response, make_order
+from pydantic import ValidationError
+import pytest
+
+from wkflws_shopify import cache, http
+from wkflws_shopify.get_order.node import get_order
+from wkflws_shopify.schemas.orders import Order
+from wkflws_shopify.schemas.projection import project
+
+
+@pytest.fixture
+def shopify(local_server):
+    """Respond with the fields of order 1 requested with ``fields=``."""
+
+    def responder(method, path, headers, body):
+        order = make_order(1)
+        if "?fields=" in path:
+            fields = path.split("?fields=", 1)[1].split(",")
+            order = {k: v for k, v in order.items() if k in fields}
+        return json_response({"order": order})
+
+    local_server.responder = responder
+    http.set_client(http.AsyncHttpClient(scheme="http"))
+    yield local_server
+    http.set_client(None)
+
+
+def test_project():
+    """Verify projected models only contain the requested fields."""
+    model = project(Order, ["id", "email", "line_items"])
+    order = model(**make_order(1))
+
+    assert order.dict(by_alias=True) == {
+        "id": 1,
+        "email": "jsmith@gmail.com",
+        "line_items": Order(**make_order(1)).dict(by_alias=True)["line_items"],
+    }
+    assert project(Order, ["line_items", "email", "id"]) is model
+
+
+def test_project__required_fields_validated():
+    """Verify projected fields keep their validation."""
+    with pytest.raises(ValidationError):
+        project(Order, ["id", "email"])(id=1)
+
+
+def test_project__unknown_field():
+    """Verify fields must exist in the model."""
+    with pytest.raises(ValueError, match="nope"):
+        project(Order, ["id", "nope"])
+
+
+async def test_get_order__fields(shopify):
+    """Verify only the requested fields are retrieved and output."""
+    context = {"myshopify_domain": shopify.domain, "shopify_token": "abc"}
+
+    output = await get_order({"order_id": 1, "fields": ["id", "total_price"]}, context)
+
+    assert output == {"id": 1, "total_price": Order(**make_order(1)).total_price}
+    assert shopify.requests == [
+        ("GET", "/admin/api/2022-04/orders/1.json?fields=id,total_price")
+    ]
+
+
+async def test_get_order__unknown_field(shopify):
+    """Verify unknown fields are rejected before querying Shopify."""
+    context = {"myshopify_domain": shopify.domain, "shopify_token": "abc"}
+
+    with pytest.raises(ValidationError):
+        await get_order({"order_id": 1, "fields": ["id", "nope"]}, context)
+
+    assert shopify.requests == []
+
+
+async def test_get_order__fields_not_cached(shopify):
+    """Verify partial orders aren't cached but cached orders are projected."""
+    order_cache = cache.OrderCache(cache.MemoryCacheBackend(ttl=60, max_size=10))
+    cache.set_order_cache(order_cache)
+    context = {"myshopify_domain": shopify.domain, "shopify_token": "abc"}
+    try:
+        await get_order({"order_id": 1, "fields": ["id"]}, context)
+        assert order_cache.get(shopify.domain, 1) is None
+
+        await get_order({"order_id": 1}, context)
+        output = await get_order({"order_id": 1, "fields": ["id"]}, context)
+    finally:
+        cache.set_order_cache(None)
+
+    assert output == {"id": 1}
+    assert len(shopify.requests) == 2
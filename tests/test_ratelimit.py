@@ -0,0 +1,101 @@
+import logging
+
+from conftest import json_response
+
+from wkflws_shopify.http import AsyncHttpClient
+from wkflws_shopify.ratelimit import LeakyBucket, parse_call_limit, RateLimiter
+
+logger = logging.getLogger("tests")
+
+
+class FakeClock:
+    """Clock which only advances when told to."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+def test_parse_call_limit():
+    assert parse_call_limit("32/40") == (32, 40)
+    assert parse_call_limit(None) is None
+    assert parse_call_limit("garbage") is None
+
+
+def test_leaky_bucket__queues_requests_when_full():
+    """Verify requests beyond the capacity are spaced out at the leak rate."""
+    clock = FakeClock()
+    bucket = LeakyBucket(capacity=40, headroom=1, clock=clock)
+
+    delays = [bucket.reserve() for _ in range(42)]
+
+    assert delays[:39] == [0.0] * 39, "Expected no delay until the bucket is full"
+    # drains 2 requests per second
+    assert delays[39] == 0.5
+    assert delays[40] == 1.0
+    assert delays[41] == 1.5
+
+
+def test_leaky_bucket__drains_over_time():
+    """Verify the bucket drains at the leak rate."""
+    clock = FakeClock()
+    bucket = LeakyBucket(capacity=40, clock=clock)
+    for _ in range(10):
+        bucket.reserve()
+        bucket.release()
+
+    clock.now += 2.5
+
+    assert bucket.level == 5.0
+
+
+def test_leaky_bucket__learns_from_header():
+    """Verify the bucket fill and size are updated from Shopify's header."""
+    clock = FakeClock()
+    bucket = LeakyBucket(clock=clock)
+
+    bucket.reserve()
+    bucket.reserve()
+    bucket.record_response("70/80")
+
+    assert bucket.capacity == 80
+    assert bucket.leak_rate == 4.0
+    # one request is still in flight.
+    assert bucket.level == 71.0
+    assert [bucket.reserve() for _ in range(8)] == [0.0] * 8
+    assert bucket.reserve() == 0.25
+
+
+def test_rate_limiter__bucket_per_shop():
+    """Verify each shop gets its own bucket."""
+    limiter = RateLimiter()
+
+    assert limiter.get_bucket("a.myshopify.com") is limiter.get_bucket(
+        "a.myshopify.com"
+    )
+    assert limiter.get_bucket("a.myshopify.com") is not limiter.get_bucket(
+        "b.myshopify.com"
+    )
+
+
+async def test_async_request__updates_bucket(local_server):
+    """Verify the client feeds the call limit header to the shop's bucket."""
+    local_server.responder = lambda m, p, h, b: json_response(
+        {}, headers={"X-Shopify-Shop-Api-Call-Limit": "12/80"}
+    )
+    limiter = RateLimiter()
+    client = AsyncHttpClient(scheme="http", rate_limiter=limiter)
+
+    await client.request(
+        logger,
+        myshopify_domain=local_server.domain,
+        api_path="/orders/1.json",
+        api_token="abc",
+    )
+
+    bucket = limiter.get_bucket(local_server.domain)
+    assert bucket.capacity == 80
+    assert 11.0 < bucket.level <= 12.0
@@ -0,0 +1,100 @@
+import logging
+
+from conftest import json_response
+import pytest
+
+from wkflws_shopify.http import AsyncHttpClient, HttpError
+from wkflws_shopify.retry import parse_retry_after, RetryPolicy
+
+logger = logging.getLogger("tests")
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.0") == 2.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_policy__full_jitter():
+    """Verify the delay is a random portion of the capped exponential backoff."""
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, rng=lambda: 0.5)
+
+    assert [policy.backoff(i) for i in range(1, 6)] == [0.5, 1.0, 2.0, 2.5, 2.5]
+
+
+def test_retry_policy__honors_retry_after():
+    """Verify the Retry-After header takes precedence over the backoff."""
+    policy = RetryPolicy(rng=lambda: 0.5)
+    state = policy.start()
+
+    assert state.next_delay("2.0") == 2.0
+    assert policy.stats.retry_after_honored == 1
+    assert policy.stats.backoff_seconds == 2.0
+
+
+def test_retry_policy__max_retries():
+    """Verify retries stop once the maximum is reached."""
+    policy = RetryPolicy(max_retries=5, deadline=None, rng=lambda: 0.0)
+    state = policy.start(max_retries=2)
+
+    assert state.next_delay() == 0.0
+    assert state.next_delay() == 0.0
+    assert state.next_delay() is None
+    assert policy.stats.retries == 2
+    assert policy.stats.retries_exhausted == 1
+
+
+def test_retry_policy__deadline():
+    """Verify retries stop when waiting would exceed the deadline."""
+    now = [0.0]
+    policy = RetryPolicy(deadline=10.0, jitter=False, clock=lambda: now[0])
+    state = policy.start()
+
+    now[0] = 5.0
+    assert state.next_delay("4") == 4.0
+    now[0] = 9.5
+    assert state.next_delay() is None
+    assert policy.stats.deadlines_exceeded == 1
+
+
+async def test_async_request__retries_throttled_request(local_server):
+    """Verify a throttled request is retried after the Retry-After delay."""
+    responses = [
+        json_response({}, status=429, headers={"Retry-After": "0.01"}),
+        json_response({}, status=503),
+        json_response({"ok": True}),
+    ]
+    local_server.responder = lambda m, p, h, b: responses.pop(0)
+    policy = RetryPolicy(base_delay=0.01)
+    client = AsyncHttpClient(scheme="http", retry_policy=policy)
+
+    response = await client.request(
+        logger,
+        myshopify_domain=local_server.domain,
+        api_path="/orders/1.json",
+        api_token="abc",
+    )
+
+    assert response.json() == {"ok": True}
+    assert policy.stats.retries == 2
+    assert policy.stats.retry_after_honored == 1
+
+
+async def test_async_request__retries_exceeded(local_server):
+    """Verify an HttpError is raised once retries are exhausted."""
+    local_server.responder = lambda m, p, h, b: json_response({}, status=500)
+    client = AsyncHttpClient(scheme="http", retry_policy=RetryPolicy(base_delay=0.001))
+
+    with pytest.raises(HttpError) as exc_info:
+        await client.request(
+            logger,
+            myshopify_domain=local_server.domain,
+            api_path="/orders/1.json",
+            api_token="abc",
+            num_retries=2,
+        )
+
+    assert exc_info.value.status_code == 500
+    assert len(local_server.requests) == 3
@@ -0,0 +1,94 @@
+import datetime
+import decimal
+import json
+import uuid
+
+from conftest import json_response, make_order
+import pytest
+
+from wkflws_shopify import http, serialization
+from wkflws_shopify.encoders import ShopifyJSONEncoder
+from wkflws_shopify.get_order.node import get_order
+from wkflws_shopify.get_orders.node import get_orders
+from wkflws_shopify.schemas.orders import Order
+from wkflws_shopify.schemas.trusted import trusted_dict
+
+
+@pytest.fixture(params=["json", "orjson"])
+def backend(request):
+    """Use each serialization backend."""
+    backend = serialization.BACKENDS[request.param]()
+    serialization.set_backend(backend)
+    yield backend
+    serialization.set_backend(None)
+
+
+def test_dumps__same_as_encoder(backend):
+    """Verify each backend encodes values the same as ShopifyJSONEncoder."""
+    data = {
+        "price": decimal.Decimal("499.99"),
+        "created_at": datetime.datetime.fromisoformat("2022-10-13T14:15:00-04:00"),
+        "id": uuid.UUID("12345678123456781234567812345678"),
+        "big": 2**70,
+        "name": "Zoë",
+        1: [None, True, 1.5],
+    }
+
+    assert json.loads(backend.dumps(data)) == json.loads(
+        json.dumps(data, cls=ShopifyJSONEncoder)
+    )
+
+
+def test_loads(backend):
+    """Verify JSON is deserialized from bytes and strings."""
+    assert backend.loads(b'{"a": [1, "b"]}') == {"a": [1, "b"]}
+    assert backend.loads('{"a": [1, "b"]}') == {"a": [1, "b"]}
+
+
+def test_http_response__json_parsed_once(backend, mocker):
+    """Verify the response body is only parsed once."""
+    response = http.HttpResponse(status_code=200, headers={}, body=b'{"a": 1}')
+    loads = mocker.spy(backend, "loads")
+
+    assert response.json() == {"a": 1}
+    assert response.json() is response.json()
+    assert loads.call_count == 1
+
+
+@pytest.mark.parametrize("line_items", [0, 1, 20])
+def test_trusted_dict(line_items):
+    """Verify the trusted output encodes the same as the validated output."""
+    data = make_order(1)
+    data["line_items"] = data["line_items"] * line_items
+    data["unknown_field"] = "dropped"
+    del data["landing_site"]  # defaults are filled in
+
+    validated = Order(**data).dict(by_alias=True)
+
+    assert json.loads(serialization.dumps(trusted_dict(Order, data))) == json.loads(
+        serialization.dumps(validated)
+    )
+
+
+async def test_get_order__trusted(local_server):
+    """Verify trusted orders are output without validation."""
+
+    def responder(method, path, headers, body):
+        if path.split("?")[0].endswith("/orders.json"):
+            return json_response({"orders": [make_order(1)]})
+        return json_response({"order": make_order(1)})
+
+    local_server.responder = responder
+    http.set_client(http.AsyncHttpClient(scheme="http"))
+    context = {"myshopify_domain": local_server.domain, "shopify_token": "abc"}
+    try:
+        trusted = await get_order({"order_id": 1, "trusted": True}, context)
+        validated = await get_order({"order_id": 1}, context)
+        orders = await get_orders({"order_ids": [1], "trusted": True}, context)
+    finally:
+        http.set_client(None)
+
+    assert trusted["total_price"] == "570.08"
+    assert validated["total_price"] == decimal.Decimal("570.08")
+    assert serialization.dumps(trusted) == serialization.dumps(validated)
+    assert orders["orders"] == [trusted]
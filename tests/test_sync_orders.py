@@ -0,0 +1,202 @@
+import datetime
+
+from benchmarks.fake_shopify import FakeShopify, FIRST_ORDER_ID, FIRST_UPDATED_AT
+from pydantic import ValidationError
+import pytest
+
+from wkflws_shopify import checkpoints, http
+from wkflws_shopify.checkpoints import (
+    Checkpoint,
+    CheckpointStore,
+    get_checkpoint_store,
+    set_checkpoint_store,
+)
+from wkflws_shopify.mirror import OrderMirror, set_order_mirror
+from wkflws_shopify.sync_orders import node
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Save checkpoints to a temporary database."""
+    store = CheckpointStore(str(tmp_path / "sync.sqlite3"))
+    set_checkpoint_store(store)
+    yield store
+    set_checkpoint_store(None)
+    store.close()
+
+
+@pytest.fixture
+def shopify(store):
+    """Serve 5 orders, each updated a minute after the previous one."""
+    http.set_client(http.AsyncHttpClient(scheme="http"))
+    with FakeShopify(orders=5, capacity=None) as server:
+        yield server
+    http.set_client(None)
+
+
+async def sync(shopify: FakeShopify, *, commit: bool = True, **message):
+    """Execute the node, committing the checkpoint like its runners do."""
+    context = {"myshopify_domain": shopify.domain, "shopify_token": "abc"}
+    output = await node.sync_orders(message, context)
+    if commit:
+        node.commit_checkpoint(message, context, output)
+    return output
+
+
+def minutes_after_first(minutes: int) -> str:
+    return (FIRST_UPDATED_AT + datetime.timedelta(minutes=minutes)).isoformat()
+
+
+async def test_sync_orders(shopify):
+    """Verify only orders changed since the last execution are output."""
+    first = await sync(shopify, max_orders=3)
+    second = await sync(shopify, max_orders=3)
+    third = await sync(shopify, max_orders=3)
+
+    assert [o["id"] for o in first["orders"]] == [FIRST_ORDER_ID + i for i in range(3)]
+    assert first["has_more"] is True
+    assert first["checkpoint"] == minutes_after_first(2)
+    assert [o["id"] for o in second["orders"]] == [
+        FIRST_ORDER_ID + 3,
+        FIRST_ORDER_ID + 4,
+    ]
+    assert second["has_more"] is False
+    assert third == {
+        "orders": [],
+        "checkpoint": minutes_after_first(4),
+        "checkpoint_token": None,
+        "has_more": False,
+    }
+    assert "updated_at_min=2022-10-13T14%3A20%3A16-04%3A00" in shopify.requests[-1][1]
+
+    shopify.add_order(FIRST_ORDER_ID + 1, updated_at=minutes_after_first(10))
+    shopify.add_order(FIRST_ORDER_ID + 5, updated_at=minutes_after_first(10))
+    fourth = await sync(shopify, trusted=True)
+
+    assert [o["id"] for o in fourth["orders"]] == [
+        FIRST_ORDER_ID + 1,
+        FIRST_ORDER_ID + 5,
+    ]
+    assert fourth["orders"][0]["updated_at"] == minutes_after_first(10)
+
+
+async def test_sync_orders__same_updated_at(shopify):
+    """Verify orders updated at the checkpoint's time are output exactly once."""
+    for i in range(5):
+        shopify.add_order(FIRST_ORDER_ID + i, updated_at=minutes_after_first(0))
+
+    synced = []
+    for _ in range(5):
+        result = await sync(shopify, max_orders=2)
+        synced += [o["id"] for o in result["orders"]]
+
+    assert synced == [FIRST_ORDER_ID + i for i in range(5)]
+    assert get_checkpoint_store().get(shopify.domain, "default") == Checkpoint(
+        updated_at=FIRST_UPDATED_AT, order_ids=synced
+    )
+
+
+async def test_sync_orders__checkpoints(shopify):
+    """Verify each checkpoint name and the ``since`` parameter are independent."""
+    since = await sync(shopify, checkpoint="recent", since=minutes_after_first(3))
+    everything = await sync(shopify)
+
+    assert [o["id"] for o in since["orders"]] == [
+        FIRST_ORDER_ID + 3,
+        FIRST_ORDER_ID + 4,
+    ]
+    assert len(everything["orders"]) == 5
+
+
+async def test_sync_orders__failure(shopify, monkeypatch):
+    """Verify the checkpoint doesn't move when an execution fails part way."""
+    monkeypatch.setattr(node, "MAX_ORDERS_PER_REQUEST", 2)
+    shopify.orders[FIRST_ORDER_ID + 3]["total_price"] = "not money"
+
+    with pytest.raises(ValidationError):
+        await sync(shopify)
+
+    assert get_checkpoint_store().get(shopify.domain, "default") is None
+    assert len(shopify.requests) == 2
+
+    shopify.orders[FIRST_ORDER_ID + 3]["total_price"] = "1.00"
+    result = await sync(shopify)
+
+    assert len(result["orders"]) == 5
+
+
+async def test_sync_orders__not_delivered(shopify):
+    """Verify orders whose output wasn't delivered are output again."""
+    lost = await sync(shopify, max_orders=2, commit=False)
+    delivered = await sync(shopify, max_orders=2)
+
+    assert [o["id"] for o in delivered["orders"]] == [o["id"] for o in lost["orders"]]
+    assert (await sync(shopify))["orders"][0]["id"] == FIRST_ORDER_ID + 2
+
+
+async def test_sync_orders__concurrent(shopify):
+    """Verify an execution only commits the checkpoint it saved.
+
+    Both executions start from the same checkpoint. Once the first one committed the
+    second one must not move the checkpoint, neither to its own nor to the first
+    execution's.
+    """
+    context = {"myshopify_domain": shopify.domain, "shopify_token": "abc"}
+    small = {"max_orders": 1}
+    large = {"max_orders": 3}
+    first = await node.sync_orders(large, context)
+    second = await node.sync_orders(small, context)
+
+    assert node.commit_checkpoint(small, context, second) is True
+    assert node.commit_checkpoint(large, context, first) is False
+    assert node.commit_checkpoint(small, context, second) is False
+    assert get_checkpoint_store().get(shopify.domain, "default") == Checkpoint(
+        updated_at=FIRST_UPDATED_AT, order_ids=[FIRST_ORDER_ID]
+    )
+    assert [o["id"] for o in (await sync(shopify))["orders"]] == [
+        FIRST_ORDER_ID + i for i in range(1, 5)
+    ]
+
+
+def test_get_checkpoint_store__path_required(monkeypatch):
+    """Verify checkpoints aren't saved to a path which may not persist."""
+    monkeypatch.setattr(checkpoints.settings, "SYNC_CHECKPOINT_PATH", None)
+
+    with pytest.raises(RuntimeError):
+        get_checkpoint_store()
+
+
+def test_checkpoint_store(store):
+    checkpoint = Checkpoint(updated_at=FIRST_UPDATED_AT, order_ids=[1, 2])
+
+    store.set("a.myshopify.com", "default", checkpoint)
+
+    assert store.get("a.myshopify.com", "default") == checkpoint
+    assert store.get("a.myshopify.com", "other") is None
+
+    pending = Checkpoint(updated_at=FIRST_UPDATED_AT, order_ids=[3])
+    token = store.set_pending("a.myshopify.com", "default", pending, base=checkpoint)
+    stale = store.set_pending("a.myshopify.com", "default", checkpoint, base=None)
+
+    assert store.get("a.myshopify.com", "default") == checkpoint
+    assert store.commit(stale) is False
+    assert store.commit(token) is True
+    assert store.get("a.myshopify.com", "default") == pending
+    assert store.commit(token) is False
+    assert store.get("b.myshopify.com", "default") is None
+    assert store.delete("a.myshopify.com", "default") is True
+    assert store.delete("a.myshopify.com", "default") is False
+
+
+async def test_sync_orders__mirror(shopify, tmp_path):
+    """Verify synced orders are stored in the order mirror when it's enabled."""
+    mirror = OrderMirror(str(tmp_path / "mirror.sqlite3"))
+    set_order_mirror(mirror)
+    try:
+        await sync(shopify, max_orders=2)
+        mirrored = mirror.query_orders(shopify.domain)
+    finally:
+        set_order_mirror(None)
+        mirror.close()
+
+    assert [o["id"] for o in mirrored] == [FIRST_ORDER_ID + 1, FIRST_ORDER_ID]
@@ -1,11 +1,18 @@
+import decimal
 import json
 
+from conftest import make_customer_without_address, make_order, make_pos_order
+from pydantic import ValidationError
 import pytest
 from wkflws.events import Event
 from wkflws.exceptions import WkflwExecutionException
 from wkflws.http import Request, Response
 
+from wkflws_shopify.encoders import ShopifyJSONEncoder
+from wkflws_shopify.schemas.orders import Order
 from wkflws_shopify.triggers import listener
+from wkflws_shopify.triggers.registry import jsonable, TopicRegistry
+from wkflws_shopify.triggers.schemas import SubscriptionBillingAttempt
 
 SUBSCRIPTION_BILLING_FAIL_PAYLOAD = """{
   "id": null,
@@ -132,3 +139,106 @@ async def test_accept_event__invalid_payload():
 
     with pytest.raises(WkflwExecutionException):
         await listener.accept_event(event)
+
+
+@pytest.mark.parametrize(
+    "shopify_topic,expected_node",
+    (
+        ("orders/create", "wkflws_shopify.triggers.orders_create"),
+        ("orders/updated", "wkflws_shopify.triggers.orders_updated"),
+        ("orders/cancelled", "wkflws_shopify.triggers.orders_cancelled"),
+    ),
+)
+async def test_accept_event__orders(shopify_topic, expected_node):
+    """Verify order topics call the correct node with a JSON serializable order."""
+    orig_data = make_order(1)
+    event = Event(
+        identifier="abc123",
+        metadata=get_request_headers(shopify_topic),
+        data=orig_data,
+    )
+
+    node, data = await listener.accept_event(event)
+
+    assert node == expected_node
+    assert data["id"] == 1
+    assert data["total_price"] == orig_data["total_price"]
+    assert data["line_items"][0]["price"] == orig_data["line_items"][0]["price"]
+    assert json.loads(json.dumps(data)) == data, "Expected JSON serializable data"
+
+
+@pytest.mark.parametrize(
+    "shopify_topic,payload",
+    (
+        ("orders/create", make_pos_order()),
+        ("orders/updated", make_order(1, customer=make_customer_without_address())),
+        ("customers/create", make_customer_without_address()),
+    ),
+    ids=("pos_order", "order_customer_without_address", "customer_without_address"),
+)
+async def test_accept_event__incomplete(shopify_topic, payload):
+    """Verify fields webhooks may omit don't prevent the trigger from starting."""
+    event = Event(
+        identifier="abc123",
+        metadata=get_request_headers(shopify_topic),
+        data=payload,
+    )
+
+    _, data = await listener.accept_event(event)
+
+    assert data["id"] == payload["id"]
+    assert json.loads(json.dumps(data)) == data, "Expected JSON serializable data"
+    if shopify_topic.startswith("customers/"):
+        assert data["default_address"] is None
+    elif data["customer"] is None:
+        assert data["shipping_address"] is None
+        assert data["line_items"][0]["sku"] is None
+    else:
+        assert data["customer"]["email"] is None
+
+
+async def test_accept_event__invalid_order():
+    """Verify an invalid payload for a supported topic raises a ValidationError."""
+    event = Event(
+        identifier="abc123",
+        metadata=get_request_headers("orders/create"),
+        data={"id": 1},
+    )
+
+    with pytest.raises(ValidationError):
+        await listener.accept_event(event)
+
+
+@pytest.mark.parametrize(
+    "schema,payload",
+    (
+        (Order, make_order(1)),
+        (SubscriptionBillingAttempt, json.loads(SUBSCRIPTION_BILLING_FAIL_PAYLOAD)),
+    ),
+)
+def test_jsonable(schema, payload):
+    """Verify a model's output is the same as its JSON encoded ``.dict()``."""
+    model = schema(**payload)
+    model.__dict__["extra"] = {"a": (decimal.Decimal("1.10"), None)}
+
+    assert jsonable(model) == json.loads(
+        json.dumps(model.dict(by_alias=True), cls=ShopifyJSONEncoder)
+    )
+
+
+def test_registry():
+    """Verify topics are declared once and looked up by name."""
+    registry = TopicRegistry()
+    topic = registry.register(
+        "orders/create", trigger="my.trigger", schema=SubscriptionBillingAttempt
+    )
+
+    assert registry.get("orders/create") is topic
+    assert registry.get("orders/updated") is None
+    assert registry.get(None) is None
+    assert "orders/create" in registry
+    assert list(registry) == [topic]
+    with pytest.raises(ValueError):
+        registry.register(
+            "orders/create", trigger="other", schema=SubscriptionBillingAttempt
+        )
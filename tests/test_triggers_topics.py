@@ -0,0 +1,20 @@
+import importlib
+import uuid
+
+import pytest
+
+from wkflws_shopify.triggers.registry import registry
+
+
+@pytest.mark.parametrize("topic", list(registry), ids=lambda t: t.name)
+async def test_topic_trigger(topic):
+    """Verify each registered topic's trigger node returns the event's data."""
+    module = importlib.import_module(topic.trigger)
+    func = getattr(module, topic.trigger.rsplit(".", 1)[1])
+    data = {"a": str(uuid.uuid4())}
+
+    result = await func(data, {})
+
+    assert (
+        data is result
+    ), "Expected result of node to be exactly the data that was provided."
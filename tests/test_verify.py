@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from wkflws.http import Request, Response
+
+from wkflws_shopify import metrics
+from wkflws_shopify.triggers import listener, verify
+
+SHOP = "heyhorse.myshopify.com"
+BODY = json.dumps({"idempotency_key": "abc-123", "order_id": 1})
+
+
+@pytest.fixture
+def registry():
+    """Record metrics in a new registry."""
+    registry = metrics.MetricsRegistry()
+    metrics.set_metrics(registry)
+    yield registry
+    metrics.set_metrics(None)
+
+
+def make_request(signature=None, shop=SHOP, body=BODY):
+    """Create a webhook request."""
+    headers = {
+        "x-shopify-topic": "subscription_billing_attempt/failed",
+        "x-shopify-shop-domain": shop,
+    }
+    if signature is not None:
+        headers["x-shopify-hmac-sha256"] = signature
+    return Request("https://wkfl.ws/shopify/webhook/", headers, body)
+
+
+def test_verify(registry):
+    """Verify signatures are checked with the shop's secret."""
+    verifier = verify.WebhookVerifier(
+        secrets={SHOP: "shop-secret"}, default_secret="default"
+    )
+    body = BODY.encode("utf-8")
+
+    assert verifier.verify(SHOP, body, verify.sign("shop-secret", body))
+    assert verifier.verify("other.myshopify.com", body, verify.sign("default", body))
+    assert not verifier.verify(SHOP, body, verify.sign("default", body))
+    assert not verifier.verify(SHOP, body + b" ", verify.sign("shop-secret", body))
+    assert not verifier.verify(SHOP, body, None)
+    assert not verifier.verify(SHOP, body, "☃")
+
+    failures = metrics.WEBHOOK_VERIFICATION_FAILURES
+    assert registry.get_counter(failures, reason="invalid_signature") == 3
+    assert registry.get_counter(failures, reason="missing_signature") == 1
+    assert registry.get_counter(failures, reason="unknown_shop") == 0
+    duration = registry.get_histogram(metrics.WEBHOOK_VERIFICATION_DURATION)
+    assert duration.count == 6
+    assert duration.sum > 0
+
+
+def test_verify__unknown_shop(registry):
+    """Verify webhooks from shops without a secret are rejected."""
+    verifier = verify.WebhookVerifier(secrets={SHOP: "shop-secret"})
+    body = BODY.encode("utf-8")
+
+    assert not verifier.verify("other.myshopify.com", body, verify.sign("x", body))
+    failures = metrics.WEBHOOK_VERIFICATION_FAILURES
+    assert registry.get_counter(failures, reason="unknown_shop") == 1
+
+
+async def test_process_webhook_request__verified():
+    """Verify a correctly signed webhook is accepted."""
+    verify.set_verifier(verify.WebhookVerifier(default_secret="secret"))
+    request = make_request(verify.sign("secret", BODY.encode("utf-8")))
+
+    assert await listener.process_webhook_request(request, Response()) is not None
+
+
+async def test_process_webhook_request__rejected():
+    """Verify a forged webhook is rejected before the body is parsed."""
+    verify.set_verifier(verify.WebhookVerifier(default_secret="secret"))
+    response = Response()
+
+    event = await listener.process_webhook_request(
+        make_request(verify.sign("wrong", b"not json"), body="not json"), response
+    )
+    assert event is None
+    assert response.status_code == 401
+
+
+async def test_process_webhook_request__from_settings(monkeypatch):
+    """Verify webhooks are only verified when a secret is configured."""
+    assert verify.get_verifier() is None
+    assert await listener.process_webhook_request(make_request(), Response())
+
+    monkeypatch.setattr(verify.settings, "WEBHOOK_SECRETS", {SHOP: "secret"})
+    response = Response()
+    assert await listener.process_webhook_request(make_request(), response) is None
+    assert response.status_code == 401
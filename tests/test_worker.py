@@ -0,0 +1,197 @@
+import asyncio
+import json
+import subprocess
+import sys
+
+from conftest import json_response, make_order
+import pytest
+
+from wkflws_shopify import http, worker
+
+
+@pytest.fixture
+def shopify(local_server):
+    """Serve every order from the local server."""
+    local_server.responder = lambda m, p, h, b: json_response(
+        {"order": make_order(int(p.rsplit("/", 1)[1].split(".")[0]))}
+    )
+    http.set_client(http.AsyncHttpClient(scheme="http"))
+    yield local_server
+    http.set_client(None)
+
+
+async def run_worker(*requests: str) -> list[dict]:
+    """Feed ``requests`` to the worker and return the decoded responses."""
+    reader = asyncio.StreamReader()
+    for request in requests:
+        reader.feed_data(request.encode("utf-8") + b"\n")
+    reader.feed_eof()
+
+    output = []
+
+    async def write(data: bytes):
+        output.append(json.loads(data))
+
+    await worker.serve(reader, write, max_concurrency=2)
+    return output
+
+
+async def test_serve(shopify):
+    """Verify each request is executed on a shared connection."""
+    context = {"myshopify_domain": shopify.domain, "shopify_token": "abc"}
+    requests = [
+        json.dumps(
+            {
+                "id": i,
+                "node": "wkflws_shopify.get_order",
+                "message": {"order_id": i},
+                "context": context,
+            }
+        )
+        for i in range(1, 6)
+    ]
+
+    responses = await run_worker(*requests)
+
+    assert sorted(r["id"] for r in responses) == [1, 2, 3, 4, 5]
+    for response in responses:
+        assert response["output"]["id"] == response["id"]
+        assert response["output"]["total_price"] == "570.08"
+    assert shopify.connections <= 2
+
+
+async def test_serve__errors():
+    """Verify failed requests return an error without stopping the worker."""
+    responses = await run_worker(
+        "not json",
+        json.dumps({"id": 1, "node": "wkflws_shopify.unknown"}),
+        json.dumps({"id": 2, "node": "wkflws_shopify.get_order", "message": {}}),
+        json.dumps(
+            {
+                "id": 3,
+                "node": "wkflws_shopify.triggers.subscription_billing_attempt_failed",
+                "message": {"a": 1},
+            }
+        ),
+    )
+
+    responses = {r["id"]: r for r in responses}
+    assert responses[None]["error"]["type"] == "JSONDecodeError"
+    assert "unsupported node" in responses[1]["error"]["message"]
+    assert responses[2]["error"]["type"] == "ValidationError"
+    assert responses[3]["output"] == {"a": 1}
+
+
+async def test_serve__request_too_long():
+    """Verify a request exceeding the limit is answered without stopping the worker."""
+    node = "wkflws_shopify.triggers.orders_create"
+    reader = asyncio.StreamReader(limit=100)
+    output = []
+
+    async def write(data: bytes):
+        output.append(json.loads(data))
+
+    async def feed():
+        reader.feed_data(json.dumps({"id": 1, "node": node}).encode() + b"\n")
+        # The newline ending the long request arrives after the limit was exceeded.
+        for _ in range(3):
+            reader.feed_data(b"x" * 80)
+            await asyncio.sleep(0)
+        reader.feed_data(b"\n" + json.dumps({"id": 2, "node": node}).encode())
+        reader.feed_eof()
+
+    await asyncio.gather(worker.serve(reader, write), feed())
+
+    assert sorted(output, key=lambda r: r["id"] or 0) == [
+        {
+            "id": None,
+            "error": {
+                "type": "LimitOverrunError",
+                "message": f"request exceeds {worker.MAX_REQUEST_SIZE} bytes",
+            },
+        },
+        {"id": 1, "output": {}},
+        {"id": 2, "output": {}},
+    ]
+
+
+#: Messages recorded by :func:`record_delivery`.
+delivered = []
+
+
+def record_delivery(message, context, output):
+    """Record the delivery of a request's output."""
+    delivered.append(message)
+
+
+async def test_serve__on_delivered(monkeypatch):
+    """Verify a node's progress is only recorded once its response was written."""
+    node = "wkflws_shopify.triggers.orders_create"
+    monkeypatch.setitem(worker.ON_DELIVERED, node, "test_worker:record_delivery")
+    delivered.clear()
+    line = json.dumps({"id": 1, "node": node, "message": {"a": 1}}).encode()
+
+    async def serve(write):
+        reader = asyncio.StreamReader()
+        reader.feed_data(line + b"\n")
+        reader.feed_eof()
+        await worker.serve(reader, write)
+
+    async def broken_pipe(data: bytes):
+        raise BrokenPipeError
+
+    with pytest.raises(BrokenPipeError):
+        await serve(broken_pipe)
+
+    assert delivered == []
+
+    await serve(lambda data: asyncio.sleep(0))
+
+    assert delivered == [{"a": 1}]
+
+
+def test_main__stdio():
+    """Verify the worker can be run as a module reading from stdin."""
+    request = {
+        "id": "abc",
+        "node": "wkflws_shopify.triggers.subscription_billing_attempt_failed",
+        "message": {"a": 1},
+    }
+    result = subprocess.run(
+        [sys.executable, "-m", "wkflws_shopify.worker"],
+        input=json.dumps(request) + "\n",
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout) == {"id": "abc", "output": {"a": 1}}
+
+
+async def test_serve_socket(tmp_path):
+    """Verify requests can be sent over a unix socket."""
+    path = str(tmp_path / "worker.sock")
+    server = asyncio.create_task(worker.serve_socket(path))
+    try:
+        for _ in range(100):
+            if (tmp_path / "worker.sock").exists():
+                break
+            await asyncio.sleep(0.01)
+
+        reader, writer = await asyncio.open_unix_connection(path)
+        for i in range(2):
+            request = {
+                "id": i,
+                "node": "wkflws_shopify.triggers.subscription_billing_attempt_failed",
+                "message": {"a": i},
+            }
+            writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await writer.drain()
+
+        responses = [json.loads(await reader.readline()) for _ in range(2)]
+        writer.close()
+    finally:
+        server.cancel()
+
+    assert sorted(r["output"]["a"] for r in responses) == [0, 1]
@@ -0,0 +1,469 @@
+"""Export large data sets with the GraphQL Admin API's bulk operations.
+
+A bulk operation runs a query asynchronously on Shopify's side without being subject
+to the API's rate limits. Once it completes the result is a JSONL file (one object
+per line) at a temporary URL. Objects from nested connections are written on their
+own lines after their parent, referencing it with ``__parentId``:
+
+.. code::json
+   {"id": "gid://shopify/Order/1", "name": "#1001"}
+   {"id": "gid://shopify/LineItem/2", "__parentId": "gid://shopify/Order/1"}
+
+:func:`run_bulk_query` submits the query, polls until it completes and streams the
+file, stitching each object's children back onto it. Only one top level object is
+held in memory at a time.
+
+Usage:
+
+.. code:: python
+
+   async for order in export_orders(
+       logger, myshopify_domain="shop.myshopify.com", api_token="..."
+   ):
+       ...
+"""
+
+import asyncio
+from dataclasses import dataclass
+from logging import Logger
+import time
+from typing import Any, AsyncIterator, Callable, Mapping, Optional
+
+from . import serialization
+from .graphql import get_graphql_client, GraphQLClient
+from .http import AsyncHttpClient, get_client
+from .schemas.bulk import BulkOrder
+from .schemas.compact import CompactOrder
+
+RUN_QUERY_MUTATION = """
+mutation ($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+OPERATION_QUERY = """
+query ($id: ID!) {
+  node(id: $id) {
+    ... on BulkOperation {
+      id status errorCode objectCount url partialDataUrl
+    }
+  }
+}
+"""
+
+#: Bulk operation statuses which won't change.
+FINISHED_STATUSES = frozenset(("CANCELED", "COMPLETED", "EXPIRED", "FAILED"))
+
+_MONEY = "{ shopMoney { amount } }"
+_ADDRESS = """{
+  address1 address2 city province province_code: provinceCode zip country
+  country_code: countryCodeV2 latitude longitude name first_name: firstName
+  last_name: lastName phone company
+}"""
+
+#: Exports every order. Fields are aliased to the names used by the REST Admin API so
+#: the results can be parsed with :class:`~wkflws_shopify.schemas.bulk.BulkOrder`.
+ORDERS_QUERY = f"""
+{{
+  orders {{
+    edges {{
+      node {{
+        id name email phone note tags test
+        created_at: createdAt
+        updated_at: updatedAt
+        processed_at: processedAt
+        cancelled_at: cancelledAt
+        closed_at: closedAt
+        cancel_reason: cancelReason
+        currency: currencyCode
+        presentment_currency: presentmentCurrencyCode
+        buyer_accepts_marketing: customerAcceptsMarketing
+        current_total_discounts: currentTotalDiscountsSet {_MONEY}
+        current_total_price: currentTotalPriceSet {_MONEY}
+        current_subtotal_price: currentSubtotalPriceSet {_MONEY}
+        current_total_tax: currentTotalTaxSet {_MONEY}
+        subtotal_price: subtotalPriceSet {_MONEY}
+        total_discounts: totalDiscountsSet {_MONEY}
+        total_outstanding: totalOutstandingSet {_MONEY}
+        total_price: totalPriceSet {_MONEY}
+        total_tax: totalTaxSet {_MONEY}
+        total_tip_received: totalTipReceivedSet {_MONEY}
+        total_weight: totalWeight
+        billing_address: billingAddress {_ADDRESS}
+        shipping_address: shippingAddress {_ADDRESS}
+        lineItems {{
+          edges {{
+            node {{
+              id sku title quantity vendor
+              variant_title: variantTitle
+              requires_shipping: requiresShipping
+              gift_card: isGiftCard
+              price: originalUnitPriceSet {_MONEY}
+              total_discount: totalDiscountSet {_MONEY}
+              product {{ id }}
+              variant {{ id }}
+            }}
+          }}
+        }}
+      }}
+    }}
+  }}
+}}
+"""
+
+#: Keys children of an order are attached to mapped by the child's type.
+ORDER_CHILDREN = {"LineItem": "line_items"}
+
+#: References to other objects which are null when the object doesn't exist (e.g.
+#: custom line items and deleted products or variants).
+NULLABLE_REFERENCES = frozenset(("product", "variant"))
+
+
+class BulkOperationError(Exception):
+    """A bulk operation couldn't be started or didn't complete."""
+
+    def __init__(
+        self,
+        msg: str,
+        *,
+        operation: Optional["BulkOperation"] = None,
+        errors: Optional[list[dict[str, Any]]] = None,
+    ):
+        super().__init__(msg)
+
+        self.operation = operation
+        self.errors = errors or []
+
+
+@dataclass
+class BulkOperation:
+    """The state of a bulk operation."""
+
+    #: the operation's GraphQL id
+    id: str
+    #: e.g. CREATED, RUNNING, COMPLETED, FAILED
+    status: str
+    #: the reason the operation failed
+    error_code: Optional[str] = None
+    #: number of objects processed so far
+    object_count: int = 0
+    #: URL of the result file. ``None`` if the operation produced no results.
+    url: Optional[str] = None
+    #: URL of the results produced before the operation failed
+    partial_data_url: Optional[str] = None
+
+    @classmethod
+    def from_graphql(cls, data: dict[str, Any]) -> "BulkOperation":
+        """Create a new object from the GraphQL ``BulkOperation`` object."""
+        return cls(
+            id=data["id"],
+            status=data["status"],
+            error_code=data.get("errorCode", None),
+            object_count=int(data.get("objectCount", None) or 0),
+            url=data.get("url", None),
+            partial_data_url=data.get("partialDataUrl", None),
+        )
+
+    @property
+    def finished(self) -> bool:
+        """Whether the operation's status will no longer change."""
+        return self.status in FINISHED_STATUSES
+
+
+async def start_bulk_query(
+    logger: Logger,
+    *,
+    myshopify_domain: str,
+    api_token: str,
+    query: str,
+    api_version: str = "2022-04",
+    client: Optional[GraphQLClient] = None,
+) -> BulkOperation:
+    """Submit ``query`` as a bulk operation.
+
+    Raises:
+        BulkOperationError: Shopify rejected the query (e.g. another bulk operation is
+            already running for the shop).
+    """
+    data = await (client or get_graphql_client()).execute(
+        logger,
+        myshopify_domain=myshopify_domain,
+        api_token=api_token,
+        query=RUN_QUERY_MUTATION,
+        variables={"query": query},
+        api_version=api_version,
+    )
+    result = data["bulkOperationRunQuery"]
+    if result.get("userErrors"):
+        raise BulkOperationError(
+            "; ".join(e["message"] for e in result["userErrors"]),
+            errors=result["userErrors"],
+        )
+    return BulkOperation.from_graphql(result["bulkOperation"])
+
+
+async def wait_for_bulk_operation(
+    logger: Logger,
+    *,
+    myshopify_domain: str,
+    api_token: str,
+    operation_id: str,
+    api_version: str = "2022-04",
+    client: Optional[GraphQLClient] = None,
+    poll_interval: float = 1.0,
+    max_poll_interval: float = 30.0,
+    timeout: Optional[float] = None,
+) -> BulkOperation:
+    """Poll the bulk operation until it is finished.
+
+    The interval between polls doubles after each poll up to ``max_poll_interval``.
+
+    Args:
+        operation_id: The operation's GraphQL id.
+        poll_interval: Number of seconds before the first poll.
+        max_poll_interval: Maximum number of seconds between polls.
+        timeout: Maximum number of seconds to wait. ``None`` waits indefinitely.
+
+    Raises:
+        BulkOperationError: The operation didn't complete successfully or the
+            timeout was reached.
+    """
+    client = client or get_graphql_client()
+    started_at = time.monotonic()
+    delay = poll_interval
+    while True:
+        data = await client.execute(
+            logger,
+            myshopify_domain=myshopify_domain,
+            api_token=api_token,
+            query=OPERATION_QUERY,
+            variables={"id": operation_id},
+            api_version=api_version,
+        )
+        operation = BulkOperation.from_graphql(data["node"])
+        if operation.finished:
+            break
+
+        if timeout is not None and time.monotonic() - started_at + delay > timeout:
+            raise BulkOperationError(
+                f"Bulk operation {operation_id} didn't finish within {timeout}s",
+                operation=operation,
+            )
+        logger.debug(
+            "Bulk operation %s is %s (%s objects). Polling again in %.1fs.",
+            operation_id,
+            operation.status,
+            operation.object_count,
+            delay,
+        )
+        await asyncio.sleep(delay)
+        delay = min(max_poll_interval, delay * 2)
+
+    if operation.status != "COMPLETED":
+        raise BulkOperationError(
+            f"Bulk operation {operation_id} {operation.status.lower()} "
+            f"({operation.error_code})",
+            operation=operation,
+        )
+    return operation
+
+
+async def iter_jsonl(
+    url: str, *, http_client: Optional[AsyncHttpClient] = None
+) -> AsyncIterator[dict[str, Any]]:
+    """Download the JSONL file at ``url`` yielding one object per line."""
+    # Parts of the line being received. Only each new chunk is searched for the end
+    # of the line so a long line (e.g. a large order) isn't copied and scanned again
+    # for every chunk.
+    parts: list[bytes] = []
+    async for chunk in (http_client or get_client()).stream(url):
+        start = 0
+        end = chunk.find(b"\n")
+        while end != -1:
+            parts.append(chunk[start:end])
+            line = b"".join(parts)
+            parts.clear()
+            if line.strip():
+                yield serialization.loads(line)
+            start = end + 1
+            end = chunk.find(b"\n", start)
+        parts.append(chunk[start:])
+    line = b"".join(parts)
+    if line.strip():
+        yield serialization.loads(line)
+
+
+def object_type(gid: str) -> str:
+    """Return the type of a GraphQL id (e.g. ``gid://shopify/Order/1`` => Order)."""
+    return gid.rsplit("/", 2)[-2]
+
+
+async def stitch(
+    records: AsyncIterator[dict[str, Any]], *, children: Mapping[str, str]
+) -> AsyncIterator[dict[str, Any]]:
+    """Attach child objects to their parent yielding each completed top level object.
+
+    Args:
+        records: Objects read from a bulk operation's result file.
+        children: The key each type of child is appended to on its parent (e.g.
+            ``{"LineItem": "line_items"}``). Children of other types are appended to
+            a key of the type's name.
+    """
+    current: Optional[dict[str, Any]] = None
+    #: the current top level object and its descendants by id
+    tree: dict[str, dict[str, Any]] = {}
+
+    async for record in records:
+        parent_id = record.pop("__parentId", None)
+        if parent_id is None:
+            if current is not None:
+                yield current
+            current = record
+            tree = {}
+        else:
+            parent = tree.get(parent_id, None)
+            if parent is None:
+                raise BulkOperationError(
+                    f"Parent {parent_id} of {record.get('id')} not found"
+                )
+            key = object_type(record["id"])
+            parent.setdefault(children.get(key, key), []).append(record)
+
+        if "id" in record:
+            tree[record["id"]] = record
+
+    if current is not None:
+        yield current
+
+
+def normalize(record: Any) -> Any:
+    """Convert a bulk query's object to the format used by the REST Admin API.
+
+    - GraphQL ids are converted to integers. The original id is kept in
+      ``admin_graphql_api_id``.
+    - References to other objects (e.g. ``product: {"id": ...}``) are replaced with
+      the object's integer id (e.g. ``product_id``). See :data:`NULLABLE_REFERENCES`
+      for references which may be null.
+    - Money (e.g. ``{"shopMoney": {"amount": "1.00"}}``) is replaced with the amount
+      in the shop's currency.
+    - Tags are joined into a comma separated string.
+    - Enum values are lower cased.
+    """
+    if isinstance(record, list):
+        return [normalize(v) for v in record]
+    if not isinstance(record, dict):
+        return record
+
+    result: dict[str, Any] = {}
+    for key, value in record.items():
+        if key == "id" and isinstance(value, str) and value.startswith("gid://"):
+            result["id"] = int(value.rsplit("/", 1)[-1])
+            result["admin_graphql_api_id"] = value
+        elif isinstance(value, dict) and set(value) == {"id"}:
+            result[f"{key}_id"] = normalize(value)["id"]
+        elif value is None and key in NULLABLE_REFERENCES:
+            result[f"{key}_id"] = None
+        elif isinstance(value, dict) and set(value) == {"shopMoney"}:
+            result[key] = value["shopMoney"]["amount"]
+        elif key == "tags" and isinstance(value, list):
+            result[key] = ", ".join(value)
+        elif key == "cancel_reason" and isinstance(value, str):
+            result[key] = value.lower()
+        else:
+            result[key] = normalize(value)
+    return result
+
+
+def parse_order(record: dict[str, Any]) -> BulkOrder:
+    """Create a :class:`~wkflws_shopify.schemas.bulk.BulkOrder` from a query's order."""
+    return BulkOrder(**normalize(record))
+
+
+def parse_compact_order(record: dict[str, Any]) -> CompactOrder:
+    """Create a :class:`~wkflws_shopify.schemas.compact.CompactOrder` from an order.
+
+    ``record`` is an order of a bulk query. This uses far less memory than
+    :func:`parse_order` for orders with many line items.
+    """
+    return CompactOrder.from_dict(normalize(record), model=BulkOrder)
+
+
+async def run_bulk_query(
+    logger: Logger,
+    *,
+    myshopify_domain: str,
+    api_token: str,
+    query: str,
+    children: Mapping[str, str],
+    api_version: str = "2022-04",
+    client: Optional[GraphQLClient] = None,
+    http_client: Optional[AsyncHttpClient] = None,
+    poll_interval: float = 1.0,
+    max_poll_interval: float = 30.0,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Run ``query`` as a bulk operation yielding each top level object.
+
+    See :func:`wait_for_bulk_operation` and :func:`stitch`.
+    """
+    operation = await start_bulk_query(
+        logger,
+        myshopify_domain=myshopify_domain,
+        api_token=api_token,
+        query=query,
+        api_version=api_version,
+        client=client,
+    )
+    operation = await wait_for_bulk_operation(
+        logger,
+        myshopify_domain=myshopify_domain,
+        api_token=api_token,
+        operation_id=operation.id,
+        api_version=api_version,
+        client=client,
+        poll_interval=poll_interval,
+        max_poll_interval=max_poll_interval,
+        timeout=timeout,
+    )
+    logger.info(
+        "Bulk operation %s completed with %s objects",
+        operation.id,
+        operation.object_count,
+    )
+    if operation.url is None:
+        return
+
+    records = iter_jsonl(operation.url, http_client=http_client)
+    async for record in stitch(records, children=children):
+        yield record
+
+
+async def export_orders(
+    logger: Logger,
+    *,
+    myshopify_domain: str,
+    api_token: str,
+    api_version: str = "2022-04",
+    parse: Callable[[dict[str, Any]], Any] = parse_order,
+    **kwargs: Any,
+) -> AsyncIterator[Any]:
+    """Export every order of the shop with a bulk operation.
+
+    Args:
+        parse: Converts each stitched order (e.g. :func:`parse_compact_order`).
+            *Default is :func:`parse_order`.*
+        kwargs: See :func:`run_bulk_query`.
+    """
+    async for record in run_bulk_query(
+        logger,
+        myshopify_domain=myshopify_domain,
+        api_token=api_token,
+        query=ORDERS_QUERY,
+        children=ORDER_CHILDREN,
+        api_version=api_version,
+        **kwargs,
+    ):
+        yield parse(record)
@@ -0,0 +1,277 @@
+"""Cache for orders retrieved from Shopify.
+
+Orders are cached as the payload returned by the Admin API, keyed by shop and order
+id. Entries expire after a fixed time and the least recently used entries are evicted
+when the cache is full. The webhook listener invalidates entries when Shopify notifies
+us an order has changed.
+
+Two backends are available: :class:`MemoryCacheBackend` which is private to the
+process and :class:`SQLiteCacheBackend` which can be shared by every process on the
+host.
+"""
+
+import abc
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+import threading
+import time
+from typing import Any, Optional
+
+from . import serialization
+from .conf import settings
+
+
+@dataclass
+class CacheStats:
+    """Counters describing the effectiveness of a cache."""
+
+    #: number of lookups which found an entry
+    hits: int = 0
+    #: number of lookups which found no entry (or an expired entry)
+    misses: int = 0
+    #: number of entries removed to make room for new entries
+    evictions: int = 0
+    #: number of entries removed because they expired
+    expirations: int = 0
+    #: number of entries removed because they were invalidated
+    invalidations: int = 0
+
+    def asdict(self) -> dict[str, int]:
+        """Create a dictionary representation of this object."""
+        return asdict(self)
+
+
+class CacheBackend(abc.ABC):
+    """Storage for cached values."""
+
+    def __init__(self, *, ttl: float, max_size: int):
+        """Initialize a new CacheBackend.
+
+        Args:
+            ttl: Number of seconds an entry is kept.
+            max_size: Maximum number of entries. The least recently used entries are
+                evicted first.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stats = CacheStats()
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value for ``key`` or ``None`` if it is missing or expired."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any):
+        """Store ``value`` for ``key``."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> bool:
+        """Remove ``key`` from the cache returning whether it existed."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def clear(self):
+        """Remove all entries."""
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Cache entries in this process's memory."""
+
+    def __init__(self, *, ttl: float, max_size: int):
+        super().__init__(ttl=ttl, max_size=max_size)
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:  # noqa: D102
+        with self._lock:
+            try:
+                expires_at, value = self._entries[key]
+            except KeyError:
+                self.stats.misses += 1
+                return None
+
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: Any):  # noqa: D102
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, key: str) -> bool:  # noqa: D102
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):  # noqa: D102
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache entries in a SQLite database shared by processes on the same host.
+
+    Values must be JSON serializable.
+    """
+
+    def __init__(self, path: str, *, ttl: float, max_size: int):
+        """Initialize a new SQLiteCacheBackend.
+
+        Args:
+            path: Path to the database file. It is created if it doesn't exist.
+            ttl: Number of seconds an entry is kept.
+            max_size: Maximum number of entries. The least recently used entries are
+                evicted first.
+        """
+        super().__init__(ttl=ttl, max_size=max_size)
+        import sqlite3  # only imported when the backend is used.
+
+        self.path = path
+        self._conn = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)"
+            )
+
+    def get(self, key: str) -> Optional[Any]:  # noqa: D102
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.stats.hits += 1
+        return serialization.loads(row[0])
+
+    def set(self, key: str, value: Any):  # noqa: D102
+        now = time.time()
+        encoded = serialization.dumps(value).decode("utf-8")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, encoded, now + self.ttl, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+            if count > self.max_size:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_size,),
+                )
+                self.stats.evictions += count - self.max_size
+
+    def delete(self, key: str) -> bool:  # noqa: D102
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return cursor.rowcount > 0
+
+    def clear(self):  # noqa: D102
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+
+class OrderCache:
+    """Cache Shopify order payloads by shop and order id."""
+
+    def __init__(self, backend: CacheBackend):
+        """Initialize a new OrderCache.
+
+        Args:
+            backend: Where the cached orders are stored.
+        """
+        self.backend = backend
+
+    @property
+    def stats(self) -> CacheStats:
+        """Hit, miss and eviction counters for this process."""
+        return self.backend.stats
+
+    @staticmethod
+    def key(myshopify_domain: str, order_id: int) -> str:
+        """Return the cache key for an order."""
+        return f"order:{myshopify_domain}:{order_id}"
+
+    def get(self, myshopify_domain: str, order_id: int) -> Optional[dict[str, Any]]:
+        """Return the cached order payload or ``None``."""
+        return self.backend.get(self.key(myshopify_domain, order_id))
+
+    def set(self, myshopify_domain: str, order_id: int, order: dict[str, Any]):
+        """Cache an order payload."""
+        self.backend.set(self.key(myshopify_domain, order_id), order)
+
+    def invalidate(self, myshopify_domain: str, order_id: int):
+        """Remove an order from the cache."""
+        if self.backend.delete(self.key(myshopify_domain, order_id)):
+            self.stats.invalidations += 1
+
+
+_order_cache: Optional[OrderCache] = None
+
+
+def get_order_cache() -> Optional[OrderCache]:
+    """Return the order cache configured in settings or ``None`` if it's disabled."""
+    global _order_cache
+    if _order_cache is None and settings.ORDER_CACHE_ENABLED:
+        backend: CacheBackend
+        if settings.ORDER_CACHE_PATH:
+            backend = SQLiteCacheBackend(
+                settings.ORDER_CACHE_PATH,
+                ttl=settings.ORDER_CACHE_TTL,
+                max_size=settings.ORDER_CACHE_MAX_SIZE,
+            )
+        else:
+            backend = MemoryCacheBackend(
+                ttl=settings.ORDER_CACHE_TTL,
+                max_size=settings.ORDER_CACHE_MAX_SIZE,
+            )
+        _order_cache = OrderCache(backend)
+    return _order_cache
+
+
+def set_order_cache(cache: Optional[OrderCache]):
+    """Replace the order cache.
+
+    Args:
+        cache: The new cache. ``None`` resets the cache to the one configured in
+            settings.
+    """
+    global _order_cache
+    _order_cache = cache
@@ -0,0 +1,247 @@
+"""Persist the progress of incremental order syncs.
+
+A :class:`Checkpoint` records the ``updated_at`` of the last order output by a sync
+(see :mod:`wkflws_shopify.sync_orders`). The next sync only requests orders updated
+since then. Shopify's ``updated_at_min`` filter is inclusive, so the ids of the orders
+updated at exactly that time are kept too and skipped by the next sync.
+
+Checkpoints are kept per shop and name in a SQLite database. A sync saves its new
+checkpoint as *pending* and it's only committed (see :meth:`CheckpointStore.commit`)
+once the sync's output was delivered. If the sync or its delivery fails the previous
+checkpoint stays in place and the next sync outputs the same orders again. A pending
+checkpoint is only committed if the checkpoint the sync started from is still in
+place, so a sync running concurrently with another one never moves the checkpoint
+past orders it didn't output.
+"""
+
+from dataclasses import dataclass, field
+import datetime
+import threading
+from typing import Optional
+import uuid
+
+from . import serialization
+from .conf import settings
+
+
+@dataclass
+class Checkpoint:
+    """Progress of a sync."""
+
+    #: ``updated_at`` of the last synced order
+    updated_at: datetime.datetime
+    #: ids of the synced orders updated at ``updated_at``
+    order_ids: list[int] = field(default_factory=list)
+
+
+class CheckpointStore:
+    """Store checkpoints in a SQLite database."""
+
+    def __init__(self, path: str):
+        """Initialize a new CheckpointStore.
+
+        Args:
+            path: Path to the database file. It is created if it doesn't exist.
+        """
+        import sqlite3  # only imported when syncing.
+
+        self.path = path
+        self._conn = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "shop TEXT NOT NULL, name TEXT NOT NULL, updated_at TEXT NOT NULL, "
+                "order_ids TEXT NOT NULL, saved_at TEXT NOT NULL, "
+                "PRIMARY KEY (shop, name))"
+            )
+            # base_* is the checkpoint the sync started from (NULL if there was none).
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending_checkpoints ("
+                "token TEXT PRIMARY KEY, shop TEXT NOT NULL, name TEXT NOT NULL, "
+                "updated_at TEXT NOT NULL, order_ids TEXT NOT NULL, "
+                "saved_at TEXT NOT NULL, base_updated_at TEXT, base_order_ids TEXT)"
+            )
+
+    def get(self, myshopify_domain: str, name: str) -> Optional[Checkpoint]:
+        """Return the shop's checkpoint ``name`` or ``None`` if it was never saved."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at, order_ids FROM checkpoints "
+                "WHERE shop = ? AND name = ?",
+                (myshopify_domain, name),
+            ).fetchone()
+        if row is None:
+            return None
+        return Checkpoint(
+            updated_at=datetime.datetime.fromisoformat(row[0]),
+            order_ids=serialization.loads(row[1]),
+        )
+
+    def set(self, myshopify_domain: str, name: str, checkpoint: Checkpoint):
+        """Save the shop's checkpoint ``name``."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(shop, name, updated_at, order_ids, saved_at) VALUES (?, ?, ?, ?, ?)",
+                (myshopify_domain, name, *_encode(checkpoint), _now()),
+            )
+
+    def set_pending(
+        self,
+        myshopify_domain: str,
+        name: str,
+        checkpoint: Checkpoint,
+        *,
+        base: Optional[Checkpoint],
+    ) -> str:
+        """Save a checkpoint replacing the shop's checkpoint ``name`` once committed.
+
+        Args:
+            base: The checkpoint the sync started from. The pending checkpoint is only
+                committed if it's still in place.
+
+        Returns:
+            The token identifying the pending checkpoint. See :meth:`commit`.
+        """
+        token = uuid.uuid4().hex
+        base_updated_at, base_order_ids = (
+            (None, None) if base is None else _encode(base)
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO pending_checkpoints (token, shop, name, updated_at, "
+                "order_ids, saved_at, base_updated_at, base_order_ids) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    token,
+                    myshopify_domain,
+                    name,
+                    *_encode(checkpoint),
+                    _now(),
+                    base_updated_at,
+                    base_order_ids,
+                ),
+            )
+        return token
+
+    def commit(self, token: str) -> bool:
+        """Replace a checkpoint with the pending checkpoint identified by ``token``.
+
+        The checkpoint is only replaced if it's still the one the pending checkpoint
+        was based on (i.e. no other sync committed in the meantime). Either way the
+        pending checkpoint is removed.
+
+        Returns:
+            Whether the checkpoint was replaced.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                replaced = self._commit(token)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return replaced
+
+    def _commit(self, token: str) -> bool:
+        """Implement :meth:`commit` inside its transaction."""
+        pending = self._conn.execute(
+            "SELECT shop, name, updated_at, order_ids, saved_at, base_updated_at, "
+            "base_order_ids FROM pending_checkpoints WHERE token = ?",
+            (token,),
+        ).fetchone()
+        if pending is None:
+            return False
+        shop, name = pending[:2]
+
+        current = self._conn.execute(
+            "SELECT updated_at, order_ids FROM checkpoints WHERE shop = ? AND name = ?",
+            (shop, name),
+        ).fetchone()
+        if (current or (None, None)) != pending[5:]:
+            self._conn.execute(
+                "DELETE FROM pending_checkpoints WHERE token = ?", (token,)
+            )
+            return False
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO checkpoints "
+            "(shop, name, updated_at, order_ids, saved_at) VALUES (?, ?, ?, ?, ?)",
+            pending[:5],
+        )
+        # The other pending checkpoints were based on the replaced checkpoint.
+        self._conn.execute(
+            "DELETE FROM pending_checkpoints WHERE shop = ? AND name = ?", (shop, name)
+        )
+        return True
+
+    def delete(self, myshopify_domain: str, name: str) -> bool:
+        """Remove the shop's checkpoint ``name`` returning whether it existed.
+
+        The next sync starts over.
+        """
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM pending_checkpoints WHERE shop = ? AND name = ?",
+                (myshopify_domain, name),
+            )
+            cursor = self._conn.execute(
+                "DELETE FROM checkpoints WHERE shop = ? AND name = ?",
+                (myshopify_domain, name),
+            )
+            return cursor.rowcount > 0
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+
+def _encode(checkpoint: Checkpoint) -> tuple[str, str]:
+    """Return the ``updated_at`` and ``order_ids`` columns of ``checkpoint``."""
+    return (
+        checkpoint.updated_at.isoformat(),
+        serialization.dumps(checkpoint.order_ids).decode("utf-8"),
+    )
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+_checkpoint_store: Optional[CheckpointStore] = None
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Return the checkpoint store configured in settings.
+
+    Raises:
+        RuntimeError: ``SYNC_CHECKPOINT_PATH`` isn't configured.
+    """
+    global _checkpoint_store
+    if _checkpoint_store is None:
+        path = settings.SYNC_CHECKPOINT_PATH
+        if path is None:
+            # A default path (e.g. in the temporary directory) could be lost, silently
+            # starting every sync over.
+            raise RuntimeError(
+                "WKFLWS_SHOPIFY_SYNC_CHECKPOINT_PATH must be set to a path on "
+                "persistent storage to sync orders."
+            )
+        _checkpoint_store = CheckpointStore(path)
+    return _checkpoint_store
+
+
+def set_checkpoint_store(store: Optional[CheckpointStore]):
+    """Replace the checkpoint store.
+
+    Args:
+        store: The new store. ``None`` resets the store to the one configured in
+            settings.
+    """
+    global _checkpoint_store
+    _checkpoint_store = store
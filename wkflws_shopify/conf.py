@@ -0,0 +1,94 @@
+from typing import Optional
+
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Settings for the Shopify node.
+
+    Each setting is read from an environment variable prefixed with
+    ``WKFLWS_SHOPIFY_`` (e.g. ``WKFLWS_SHOPIFY_ORDER_CACHE_ENABLED``).
+    """
+
+    #: Cache orders retrieved by ``get_order``.
+    ORDER_CACHE_ENABLED: bool = False
+    #: Number of seconds an order is cached.
+    ORDER_CACHE_TTL: float = 300.0
+    #: Maximum number of orders to cache. The least recently used orders are evicted
+    #: first.
+    ORDER_CACHE_MAX_SIZE: int = 1024
+    #: Path to a SQLite database used to share the cache between processes on the same
+    #: host (e.g. the node executions and the webhook listener). If this is not defined
+    #: orders are only cached in memory.
+    ORDER_CACHE_PATH: Optional[str] = None
+
+    #: Drop webhooks which have already been received (i.e. Shopify redelivered it).
+    WEBHOOK_DEDUP_ENABLED: bool = True
+    #: Number of seconds a webhook id is remembered.
+    WEBHOOK_DEDUP_WINDOW: float = 3600.0
+    #: Maximum number of webhook ids remembered in memory.
+    WEBHOOK_DEDUP_MAX_SIZE: int = 100_000
+    #: Path to a SQLite database used to share received webhook ids between listener
+    #: replicas on the same host. If this is not defined ids are only kept in memory.
+    WEBHOOK_DEDUP_PATH: Optional[str] = None
+
+    #: Secret used to verify the ``x-shopify-hmac-sha256`` header of webhooks from any
+    #: shop. Webhooks aren't verified if neither this nor ``WEBHOOK_SECRETS`` is set.
+    WEBHOOK_SECRET: Optional[str] = None
+    #: Secrets used to verify webhooks mapped to the shop's myshopify domain. This
+    #: takes precedence over ``WEBHOOK_SECRET``. (The environment variable is JSON.)
+    WEBHOOK_SECRETS: dict[str, str] = {}
+
+    #: Acknowledge webhooks immediately and publish their events in batches.
+    WEBHOOK_BATCH_ENABLED: bool = False
+    #: Publish a batch as soon as this many events are waiting.
+    WEBHOOK_BATCH_MAX_SIZE: int = 500
+    #: Maximum number of seconds an event waits for its batch to be published.
+    WEBHOOK_BATCH_LINGER: float = 0.05
+
+    #: Hold update webhooks briefly and only start a workflow for the newest version of
+    #: the resource. Stale (out of order) webhooks are dropped.
+    WEBHOOK_COALESCE_ENABLED: bool = False
+    #: Number of seconds the first update webhook for a resource is held.
+    WEBHOOK_COALESCE_WINDOW: float = 2.0
+    #: Maximum number of resources whose last version is remembered to detect stale
+    #: webhooks.
+    WEBHOOK_COALESCE_MAX_SIZE: int = 100_000
+
+    #: Path to the SQLite database storing the checkpoints of ``sync_orders``. It must
+    #: be on persistent storage, otherwise the next sync starts over. Required by
+    #: ``sync_orders``.
+    SYNC_CHECKPOINT_PATH: Optional[str] = None
+
+    #: Keep a local copy of orders and customers received by the webhook listener,
+    #: which can be queried with ``query_orders`` (see :mod:`wkflws_shopify.mirror`).
+    MIRROR_ENABLED: bool = False
+    #: Path to the SQLite database of the mirror, shared by the listener and the nodes.
+    #: It must be on persistent storage. Required when ``MIRROR_ENABLED`` is set.
+    MIRROR_PATH: Optional[str] = None
+
+    #: Library used to serialize JSON (``orjson`` or ``json``). *Default is orjson if it
+    #: is installed.*
+    JSON_BACKEND: Optional[str] = None
+
+    #: Record metrics about HTTP requests and webhooks (see
+    #: :mod:`wkflws_shopify.metrics`).
+    METRICS_ENABLED: bool = False
+
+    #: Profile every node execution and webhook (see :mod:`wkflws_shopify.profiling`).
+    #: A single node execution can be profiled with the ``profile`` context property.
+    PROFILE_ENABLED: bool = False
+    #: Directory profiles are written to. *Default is ``wkflws_shopify_profiles`` in
+    #: the system's temporary directory.*
+    PROFILE_DIR: Optional[str] = None
+    #: Also capture a detailed profile: ``cprofile`` or ``sampling``.
+    PROFILE_CAPTURE: Optional[str] = None
+    #: Number of seconds between samples when ``PROFILE_CAPTURE`` is ``sampling``.
+    PROFILE_SAMPLE_INTERVAL: float = 0.005
+
+    class Config:
+        env_prefix = "WKFLWS_SHOPIFY_"
+        case_sensitive = True
+
+
+settings = Settings()
@@ -2,7 +2,27 @@ import datetime
 import decimal
 import json
 from typing import Any
-import uuid
+
+
+def encode_default(obj) -> Any:
+    """Encode objects the JSON encoder doesn't support to JSON serializable values.
+
+    This is shared by :class:`ShopifyJSONEncoder` and the serialization backends in
+    :mod:`wkflws_shopify.serialization` so every backend produces the same output.
+
+    Args:
+        obj: The object to encode.
+
+    Return:
+        A valid type suitable for JSON encoding.
+    """
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    elif isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    else:
+        # e.g. UUIDs
+        return str(obj)
 
 
 class ShopifyJSONEncoder(json.JSONEncoder):
@@ -23,14 +43,4 @@ class ShopifyJSONEncoder(json.JSONEncoder):
         Return:
             A valid type suitable for JSON encoding.
         """
-        if isinstance(obj, decimal.Decimal):
-            return str(obj)
-        elif isinstance(obj, datetime.datetime):
-            return obj.isoformat()
-        elif isinstance(obj, uuid.UUID):
-            return str(obj)
-        else:
-            try:
-                return super().default(obj)
-            except TypeError:
-                return str(obj)
+        return encode_default(obj)
@@ -1,21 +1,20 @@
 import asyncio
-import json
 from logging import getLogger
 import sys
 
 from .node import get_order
-from .. import __identifier__
+from .. import __identifier__, serialization
 
 
 logger = getLogger(f"{__identifier__}.get_order")
 
 try:
-    message = json.loads(sys.argv[1])
+    message = serialization.loads(sys.argv[1])
 except IndexError:
     raise ValueError("missing required `message` argument") from None
 
 try:
-    context = json.loads(sys.argv[2])
+    context = serialization.loads(sys.argv[2])
 except IndexError:
     raise ValueError("missing `context` argument") from None
 
@@ -25,4 +24,4 @@ if output is None:
     logger.error("Received null output.")
     sys.exit(1)
 
-print(json.dumps(output))
+print(serialization.dumps(output).decode("utf-8"))
@@ -1,17 +1,34 @@
 from logging import getLogger
-from typing import Any
+from typing import Any, Optional
 
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, ValidationError, validator
 
-from .. import __identifier__
-from ..http import make_http_request, HttpError
+from .. import __identifier__, profiling
+from ..cache import get_order_cache
+from ..http import HttpError, make_async_http_request
 from ..schemas.orders import Order
+from ..schemas.projection import field_names, project
+from ..schemas.trusted import trusted_dict
 
 
 class ParameterSchema(BaseModel):
     """Represent the possible Parameters that can be passed to the node."""
 
     order_id: int
+    #: only retrieve and output these fields of the order. *Default is all fields.*
+    fields: Optional[list[str]] = None
+    #: skip validating the order received from Shopify. Shopify's values are output
+    #: unchanged.
+    trusted: bool = False
+
+    @validator("fields")
+    def check_fields(cls, v: Optional[list[str]]) -> Optional[list[str]]:
+        """Verify each field is a field of an order."""
+        if v is not None:
+            unknown = set(v) - field_names(Order)
+            if unknown:
+                raise ValueError(f"unknown order fields: {', '.join(sorted(unknown))}")
+        return v
 
 
 class ContextSchema(BaseModel):
@@ -23,6 +40,7 @@ class ContextSchema(BaseModel):
     shopify_token: str
 
 
+@profiling.profile_node("get_order")
 async def get_order(
     message: dict[str, Any],
     _context: dict[str, Any],
@@ -40,20 +58,41 @@ async def get_order(
     except ValidationError:
         raise
 
-    # Query shopify for the order
-    try:
-        ret_val = make_http_request(
-            logger,
-            myshopify_domain=context.myshopify_domain,
-            api_path=f"/orders/{parameters.order_id}.json",
-            api_token=context.shopify_token,
-            method="GET",
-        )
-    except HttpError:
-        raise
+    cache = get_order_cache()
+    data = cache.get(context.myshopify_domain, parameters.order_id) if cache else None
+
+    if data is None:
+        api_path = f"/orders/{parameters.order_id}.json"
+        if parameters.fields:
+            # Only the requested fields are sent by Shopify.
+            api_path = f"{api_path}?fields={','.join(parameters.fields)}"
+
+        # Query shopify for the order
+        try:
+            ret_val = await make_async_http_request(
+                logger,
+                myshopify_domain=context.myshopify_domain,
+                api_path=api_path,
+                api_token=context.shopify_token,
+                method="GET",
+            )
+        except HttpError:
+            raise
+
+        data = ret_val.json()["order"]
+        # A partial order can't be used by later requests for other fields.
+        if cache and not parameters.fields:
+            cache.set(context.myshopify_domain, parameters.order_id, data)
+
+    model = project(Order, parameters.fields) if parameters.fields else Order
+    if parameters.trusted:
+        with profiling.phase(profiling.VALIDATION):
+            return trusted_dict(model, data)
 
-    order = Order(**ret_val.json()["order"])
+    with profiling.phase(profiling.VALIDATION):
+        order = model(**data)
 
     # Construct a standard reply
 
-    return order.dict(by_alias=True)
+    with profiling.phase(profiling.SERIALIZATION):
+        return order.dict(by_alias=True)
@@ -0,0 +1,26 @@
+import asyncio
+from logging import getLogger
+import sys
+
+from .node import get_orders
+from .. import __identifier__, serialization
+
+logger = getLogger(f"{__identifier__}.get_orders")
+
+try:
+    message = serialization.loads(sys.argv[1])
+except IndexError:
+    raise ValueError("missing required `message` argument") from None
+
+try:
+    context = serialization.loads(sys.argv[2])
+except IndexError:
+    raise ValueError("missing `context` argument") from None
+
+output = asyncio.run(get_orders(message, context))
+
+if output is None:
+    logger.error("Received null output.")
+    sys.exit(1)
+
+print(serialization.dumps(output).decode("utf-8"))
@@ -0,0 +1,110 @@
+import asyncio
+from logging import getLogger
+from typing import Any
+import urllib.parse
+
+from pydantic import BaseModel, conlist, ValidationError
+
+from .. import __identifier__, profiling
+from ..http import HttpError, make_async_http_request
+from ..schemas.orders import Order
+from ..schemas.trusted import trusted_dict
+
+#: Maximum number of orders Shopify returns for a single request.
+MAX_ORDERS_PER_REQUEST = 250
+
+
+class ParameterSchema(BaseModel):
+    """Represent the possible Parameters that can be passed to the node."""
+
+    order_ids: conlist(int, min_items=1)  # type: ignore # constrained type
+    #: skip validating the orders received from Shopify. Shopify's values are output
+    #: unchanged.
+    trusted: bool = False
+
+
+class ContextSchema(BaseModel):
+    """Represent the required context variables."""
+
+    #: the FQDN of the store front. e.g. heyhorse.myshopify.com
+    myshopify_domain: str
+    #: the authentication token to access the order api via REST
+    shopify_token: str
+
+
+def _orders_path(order_ids: list[int]) -> str:
+    """Return the API path listing the orders ``order_ids``."""
+    query = urllib.parse.urlencode(
+        {
+            "ids": ",".join(str(i) for i in order_ids),
+            # without this only open orders are returned.
+            "status": "any",
+            "limit": len(order_ids),
+        }
+    )
+    return f"/orders.json?{query}"
+
+
+@profiling.profile_node("get_orders")
+async def get_orders(
+    message: dict[str, Any],
+    _context: dict[str, Any],
+) -> dict[str, Any]:
+    """Retrieve many orders from Shopify.
+
+    Orders are requested in chunks of up to :data:`MAX_ORDERS_PER_REQUEST` ids.
+    """
+    logger = getLogger(f"{__identifier__}.get_orders")
+    try:
+        parameters = ParameterSchema(**message)
+    except ValidationError:
+        raise
+
+    try:
+        context = ContextSchema(**_context)
+    except ValidationError:
+        raise
+
+    # Remove duplicates, preserving the requested order.
+    order_ids = list(dict.fromkeys(parameters.order_ids))
+    chunks = [
+        order_ids[i : i + MAX_ORDERS_PER_REQUEST]  # noqa: E203 # black formatting
+        for i in range(0, len(order_ids), MAX_ORDERS_PER_REQUEST)
+    ]
+
+    # Query shopify for the orders
+    try:
+        responses = await asyncio.gather(
+            *(
+                make_async_http_request(
+                    logger,
+                    myshopify_domain=context.myshopify_domain,
+                    api_path=_orders_path(chunk),
+                    api_token=context.shopify_token,
+                    method="GET",
+                )
+                for chunk in chunks
+            )
+        )
+    except HttpError:
+        raise
+
+    found: dict[int, dict[str, Any]] = {}
+    for response in responses:
+        for data in response.json()["orders"]:
+            if parameters.trusted:
+                with profiling.phase(profiling.VALIDATION):
+                    found[data["id"]] = trusted_dict(Order, data)
+            else:
+                with profiling.phase(profiling.VALIDATION):
+                    order = Order(**data)
+                with profiling.phase(profiling.SERIALIZATION):
+                    found[order.api_id] = order.dict(by_alias=True)
+
+    # Construct a standard reply
+    return {
+        "orders": [found[order_id] for order_id in order_ids if order_id in found],
+        "missing_order_ids": [
+            order_id for order_id in order_ids if order_id not in found
+        ],
+    }
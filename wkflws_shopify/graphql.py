@@ -0,0 +1,225 @@
+"""Client for the Shopify GraphQL Admin API.
+
+Queries are rate limited by their calculated cost rather than the number of requests.
+Each response reports the query's cost and the shop's remaining budget in
+``extensions.cost``:
+
+.. code::json
+   {
+     "data": {},
+     "extensions": {
+       "cost": {
+         "requestedQueryCost": 12,
+         "actualQueryCost": 12,
+         "throttleStatus": {
+           "maximumAvailable": 1000.0,
+           "currentlyAvailable": 988,
+           "restoreRate": 50.0
+         }
+       }
+     }
+   }
+
+:class:`GraphQLClient` reserves each query's cost in the shop's
+:class:`~wkflws_shopify.ratelimit.CostBucket` before sending it so concurrent queries
+run as close to the shop's budget as possible without being throttled. The cost of a
+query is estimated from the ``requestedQueryCost`` of its previous execution.
+"""
+
+import asyncio
+from logging import Logger
+from typing import Any, Optional
+
+from . import http, ratelimit
+
+#: Estimated cost of a query which hasn't been executed before.
+DEFAULT_QUERY_COST = 50
+#: Error code of a query rejected because the shop's budget is exhausted.
+THROTTLED = "THROTTLED"
+
+
+class GraphQLError(Exception):
+    """The GraphQL API returned errors."""
+
+    def __init__(
+        self,
+        msg: str,
+        errors: list[dict[str, Any]],
+        data: Optional[dict[str, Any]] = None,
+    ):
+        super().__init__(msg)
+
+        self.errors = errors
+        self.data = data
+
+
+class GraphQLClient:
+    """Execute queries against the GraphQL Admin API."""
+
+    def __init__(
+        self,
+        *,
+        http_client: Optional[http.AsyncHttpClient] = None,
+        rate_limiter: Optional[ratelimit.CostRateLimiter] = None,
+        default_cost: float = DEFAULT_QUERY_COST,
+        max_throttled_retries: int = 5,
+    ):
+        """Initialize a new GraphQLClient.
+
+        Args:
+            http_client: The client used to send queries. *Default is the shared
+                client (see :func:`wkflws_shopify.http.get_client`).*
+            rate_limiter: Keeps each shop's query cost budget. *Default is shared by
+                the process.*
+            default_cost: The estimated cost of a query which hasn't been executed
+                before.
+            max_throttled_retries: Maximum number of times a throttled query is
+                retried.
+        """
+        self._http_client = http_client
+        self.rate_limiter = rate_limiter or ratelimit.cost_rate_limiter
+        self.default_cost = default_cost
+        self.max_throttled_retries = max_throttled_retries
+
+        #: number of queries Shopify throttled
+        self.throttled_queries = 0
+        self._costs: dict[str, float] = {}
+
+    @property
+    def http_client(self) -> http.AsyncHttpClient:
+        """The client used to send queries."""
+        return self._http_client or http.get_client()
+
+    def estimate_cost(self, query: str) -> float:
+        """Return the estimated cost of ``query``."""
+        return self._costs.get(query, self.default_cost)
+
+    async def execute(
+        self,
+        logger: Logger,
+        *,
+        myshopify_domain: str,
+        api_token: str,
+        query: str,
+        variables: Optional[dict[str, Any]] = None,
+        api_version: str = "2022-04",
+        cost: Optional[float] = None,
+    ) -> dict[str, Any]:
+        """Execute a query (or mutation) returning its ``data``.
+
+        Args:
+            myshopify_domain: The store's full myshopify domain (shop.myshopif.com)
+            api_token: The API token for the shopify shop.
+            query: The GraphQL document.
+            variables: Values of the variables used in ``query``.
+            api_version: The version of the Admin API.
+            cost: The query's expected cost. *Default is estimated from previous
+                executions of ``query``.*
+
+        Raises:
+            GraphQLError: The response contained errors.
+            HttpError: The error response from the HTTP request.
+        """
+        bucket = self.rate_limiter.get_bucket(myshopify_domain)
+        json_data: dict[str, Any] = {"query": query}
+        if variables:
+            json_data["variables"] = variables
+
+        throttled_count = 0
+        while True:
+            reserved = cost if cost is not None else self.estimate_cost(query)
+            await bucket.acquire(reserved)
+            try:
+                response = await self.http_client.request(
+                    logger,
+                    myshopify_domain=myshopify_domain,
+                    api_path=http.GRAPHQL_API_PATH,
+                    api_token=api_token,
+                    json_data=json_data,
+                    method="POST",
+                    api_version=api_version,
+                )
+            except BaseException:
+                bucket.release(reserved)
+                raise
+
+            body = response.json()
+            query_cost = (body.get("extensions") or {}).get("cost") or {}
+            bucket.record_throttle_status(reserved, query_cost.get("throttleStatus"))
+            if "requestedQueryCost" in query_cost:
+                self._costs[query] = float(query_cost["requestedQueryCost"])
+
+            errors = body.get("errors") or []
+            if not errors:
+                return body.get("data") or {}
+
+            if not _is_throttled(errors) or (
+                throttled_count >= self.max_throttled_retries
+            ):
+                raise GraphQLError(
+                    "; ".join(str(e.get("message", e)) for e in errors),
+                    errors=errors,
+                    data=body.get("data"),
+                )
+
+            # The next reservation waits for the restored points unless Shopify
+            # didn't report the budget.
+            throttled_count += 1
+            self.throttled_queries += 1
+            logger.debug(
+                "Query throttled. Retrying. (%s of %s)",
+                throttled_count,
+                self.max_throttled_retries,
+            )
+            if "throttleStatus" not in query_cost:
+                await asyncio.sleep(2**throttled_count / 10)
+
+
+def _is_throttled(errors: list[dict[str, Any]]) -> bool:
+    return any(
+        (e.get("extensions") or {}).get("code", None) == THROTTLED for e in errors
+    )
+
+
+_default_client: Optional[GraphQLClient] = None
+
+
+def get_graphql_client() -> GraphQLClient:
+    """Return the shared :class:`GraphQLClient`."""
+    global _default_client
+    if _default_client is None:
+        _default_client = GraphQLClient()
+    return _default_client
+
+
+def set_graphql_client(client: Optional[GraphQLClient]):
+    """Replace the shared :class:`GraphQLClient`.
+
+    Args:
+        client: The new client. ``None`` resets the shared client to the default.
+    """
+    global _default_client
+    _default_client = client
+
+
+async def execute_graphql(
+    logger: Logger,
+    *,
+    myshopify_domain: str,
+    api_token: str,
+    query: str,
+    variables: Optional[dict[str, Any]] = None,
+    api_version: str = "2022-04",
+) -> dict[str, Any]:
+    """Execute a GraphQL query using the shared client.
+
+    See :meth:`GraphQLClient.execute`.
+    """
+    return await get_graphql_client().execute(
+        logger,
+        myshopify_domain=myshopify_domain,
+        api_token=api_token,
+        query=query,
+        variables=variables,
+        api_version=api_version,
+    )
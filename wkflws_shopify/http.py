@@ -1,12 +1,25 @@
-from dataclasses import dataclass
-import json
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
 from logging import Logger
 import time
-from typing import Any, Optional
-import urllib.error
-import urllib.request
+from typing import Any, AsyncIterator, Optional, TYPE_CHECKING
+import urllib.parse
 
-from .encoders import ShopifyJSONEncoder
+from . import metrics, profiling, ratelimit, serialization
+from .retry import default_retry_policy, RetryPolicy, RetryState
+
+# ssl, gzip and urllib.request are imported when they are first used to keep the
+# startup time of the node entry points low.
+if TYPE_CHECKING:  # pragma: no cover
+    import ssl  # noqa: I300
+
+#: Maximum number of redirects followed by the async client.
+MAX_REDIRECTS = 5
+#: Path of the GraphQL Admin API.
+GRAPHQL_API_PATH = "/graphql.json"
+
+_NOT_PARSED = object()
 
 
 class HttpError(Exception):
@@ -25,10 +38,26 @@ class HttpResponse:
     status_code: int
     headers: dict[str, str]
     body: bytes
+    _parsed: Any = field(default=_NOT_PARSED, init=False, repr=False, compare=False)
 
     def json(self):
-        """Attempt to deserialize and return a JSON response body."""
-        return json.loads(self.body)
+        """Attempt to deserialize and return a JSON response body.
+
+        The body is only parsed once. Every call returns the same object, which may be
+        shared with other callers of a coalesced request, so it must not be modified.
+        """
+        if self._parsed is _NOT_PARSED:
+            with profiling.phase(profiling.JSON_DECODE):
+                self._parsed = serialization.loads(self.body)
+        return self._parsed
+
+    def get_header(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Return the value of the header ``name`` ignoring case."""
+        name = name.lower()
+        for k, v in self.headers.items():
+            if k.lower() == name:
+                return v
+        return default
 
 
 def make_http_request(
@@ -42,9 +71,13 @@ def make_http_request(
     method: Optional[str] = None,
     num_retries: int = 5,
     api_version: str = "2022-04",
+    retry_policy: Optional[RetryPolicy] = None,
 ) -> HttpResponse:
     """Make an HTTP request.
 
+    Requests are delayed as necessary to stay within the shop's API rate limit (see
+    :mod:`wkflws_shopify.ratelimit`).
+
     Args:
         myshopify_domain: The store's full myshopify domain (shop.myshopif.com)
         api_path: The path of the api to use.
@@ -54,6 +87,8 @@ def make_http_request(
         method: The HTTP method (e.g. GET, POST, etc)
         num_retries: Number of retries (exponentially backed off) when receiving a
             server error before failing.
+        retry_policy: Decides when and how long to wait before retrying. *Default is
+            :data:`wkflws_shopify.retry.default_retry_policy`.*
 
 
     Raises
@@ -62,6 +97,9 @@ def make_http_request(
     Returns:
         The response from the HTTP request.
     """
+    import urllib.error
+    import urllib.request
+
     url = f"https://{myshopify_domain}/admin/api/{api_version}{api_path}"
     if headers is None:
         headers = {}
@@ -74,11 +112,7 @@ def make_http_request(
     if "Content-Type" not in headers:
         headers["Content-Type"] = "application/json; charset=utf-8"
 
-    payload = (
-        json.dumps(json_data, cls=ShopifyJSONEncoder).encode("utf-8")
-        if json_data
-        else None
-    )
+    payload = serialization.dumps(json_data) if json_data else None
     request = urllib.request.Request(
         url,
         data=payload,
@@ -86,18 +120,49 @@ def make_http_request(
         method=method,
     )
 
-    retry_count = 0
+    bucket = ratelimit.rate_limiter.get_bucket(myshopify_domain)
+    retry_state = (retry_policy or default_retry_policy).start(num_retries)
+    sink = metrics.get_metrics()
+
     while True:
-        logger.info(f"Making HTTP request to {url}...")
-        try:
-            _r = urllib.request.urlopen(request)
-            response = HttpResponse(
-                status_code=_r.status,
-                headers={k: v for k, v in _r.headers.items()},
-                body=_r.read(),
+        waited = bucket.acquire_sync()
+        profiling.add(profiling.RATE_LIMIT, waited)
+        if sink is not None and waited:
+            sink.increment(
+                metrics.RATE_LIMIT_WAIT_SECONDS, waited, shop=myshopify_domain
             )
+        logger.info("Making HTTP request to %s...", url)
+        started_at = time.perf_counter()
+        try:
+            with profiling.phase(profiling.NETWORK):
+                _r = urllib.request.urlopen(request)
+                response = HttpResponse(
+                    status_code=_r.status,
+                    headers={k: v for k, v in _r.headers.items()},
+                    body=_r.read(),
+                )
+            bucket.record_response(response.get_header(ratelimit.CALL_LIMIT_HEADER))
+            if sink is not None:
+                metrics.record_response(
+                    sink,
+                    shop=myshopify_domain,
+                    api_path=api_path,
+                    method=request.get_method(),
+                    status=response.status_code,
+                    seconds=time.perf_counter() - started_at,
+                )
         except urllib.error.HTTPError as e:
+            bucket.record_response(e.headers.get(ratelimit.CALL_LIMIT_HEADER))
             body = e.read().decode("utf-8")
+            if sink is not None:
+                metrics.record_response(
+                    sink,
+                    shop=myshopify_domain,
+                    api_path=api_path,
+                    method=request.get_method(),
+                    status=e.status,
+                    seconds=time.perf_counter() - started_at,
+                )
 
             if e.status is None:
                 raise HttpError(
@@ -106,21 +171,30 @@ def make_http_request(
                     body=body,
                 ) from None
 
-            if e.status == 429 or (e.status >= 500 and e.status < 600):
+            if retry_state.policy.should_retry(e.status):
                 # Server error. Wait and retry
-                retry_count += 1
-                if retry_count > num_retries:
+                wait_for = retry_state.next_delay(e.headers.get("Retry-After"))
+                if wait_for is None:
                     # Retries exceeded. Log message so we know about it
                     raise HttpError(
-                        "Retries Exceed",
+                        _retries_exceeded_message(retry_state),
                         status_code=e.status,
                         body=body,
                     ) from None
-                wait_for = 2**retry_count
                 logger.debug(
-                    f"Request failed. Waiting {wait_for}s before retrying. "
-                    f"({retry_count} of {num_retries})"
+                    "Request failed. Waiting %.2fs before retrying. (%s of %s)",
+                    wait_for,
+                    retry_state.retry_count,
+                    retry_state.max_retries,
                 )
+                if sink is not None:
+                    metrics.record_retry(
+                        sink,
+                        shop=myshopify_domain,
+                        api_path=api_path,
+                        delay=wait_for,
+                    )
+                profiling.add(profiling.BACKOFF, wait_for)
                 time.sleep(wait_for)
                 continue
             elif e.status >= 400 and e.status < 500:
@@ -138,6 +212,19 @@ def make_http_request(
                     body=body,
                 ) from None
 
+        except Exception:
+            bucket.release()
+            if sink is not None:
+                metrics.record_response(
+                    sink,
+                    shop=myshopify_domain,
+                    api_path=api_path,
+                    method=request.get_method(),
+                    status=None,
+                    seconds=time.perf_counter() - started_at,
+                )
+            raise
+
         if response.status_code >= 200 and response.status_code < 300:
             # Successful request
             return response
@@ -153,3 +240,816 @@ def make_http_request(
             )
         else:
             return response
+
+
+def _retries_exceeded_message(retry_state: RetryState) -> str:
+    """Describe why a request is no longer being retried."""
+    if retry_state.retry_count > retry_state.max_retries:
+        return "Retries Exceed"
+    return "Retry deadline exceeded"
+
+
+class ConnectionPool:
+    """Keep-alive connections to a single ``scheme://host:port``.
+
+    At most ``max_connections`` connections are open at once. Callers waiting for a
+    connection are queued until one is released back to the pool.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        ssl_context: Optional["ssl.SSLContext"],
+        max_connections: int,
+        max_idle_connections: int,
+        idle_timeout: float,
+        connect_timeout: float,
+    ):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.max_idle_connections = max_idle_connections
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+
+        self._idle: deque[_Connection] = deque()
+        self._semaphore = asyncio.Semaphore(max_connections)
+        # Number of callers holding or waiting for a connection.
+        self._users = 0
+        #: Number of TCP (+TLS) connections opened by this pool. Useful for verifying
+        #: connections are being reused.
+        self.connections_opened = 0
+
+    async def acquire(self) -> "_Connection":
+        """Return an idle connection or open a new one."""
+        self._users += 1
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            self._users -= 1
+            raise
+        try:
+            now = time.monotonic()
+            while self._idle:
+                conn = self._idle.pop()
+                if now - conn.last_used < self.idle_timeout and not conn.is_closing():
+                    return conn
+                conn.close()
+
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    self.host,
+                    self.port,
+                    ssl=self.ssl_context,
+                    server_hostname=self.host if self.ssl_context else None,
+                ),
+                timeout=self.connect_timeout,
+            )
+            self.connections_opened += 1
+            return _Connection(reader, writer, reused=False)
+        except BaseException:
+            self._semaphore.release()
+            self._users -= 1
+            raise
+
+    def release(self, conn: "_Connection", *, reusable: bool):
+        """Return ``conn`` to the pool, closing it if it can't be reused."""
+        if reusable and len(self._idle) < self.max_idle_connections:
+            conn.last_used = time.monotonic()
+            conn.reused = True
+            self._idle.append(conn)
+        else:
+            conn.close()
+        self._semaphore.release()
+        self._users -= 1
+
+    def close_expired(self, now: float):
+        """Close the connections idle for longer than ``idle_timeout``."""
+        # Connections are appended when released so the oldest is first.
+        while self._idle and now - self._idle[0].last_used >= self.idle_timeout:
+            self._idle.popleft().close()
+
+    @property
+    def unused(self) -> bool:
+        """Whether the pool has no idle connections and nobody is using it."""
+        return not self._idle and self._users == 0
+
+    def close(self):
+        """Close all idle connections."""
+        while self._idle:
+            self._idle.pop().close()
+
+
+class _Connection:
+    """A single HTTP/1.1 connection."""
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        *,
+        reused: bool,
+    ):
+        self.reader = reader
+        self.writer = writer
+        #: Whether this connection has already served a request. A reused connection
+        #: may have been closed by the server while idle.
+        self.reused = reused
+        self.last_used = time.monotonic()
+
+    def is_closing(self) -> bool:
+        return self.writer.is_closing() or self.reader.at_eof()
+
+    def close(self):
+        try:
+            self.writer.close()
+        except RuntimeError:  # pragma: no cover - the loop is already closed
+            pass
+
+
+class _StaleConnection(Exception):
+    """A pooled connection was closed by the server before responding."""
+
+
+class AsyncHttpClient:
+    """Non-blocking HTTP client with keep-alive connections pooled per shop.
+
+    One client should be shared by everything running on an event loop (see
+    :func:`get_client`) so concurrent node executions reuse the same connections.
+
+    Usage:
+
+    .. code::python
+       client = AsyncHttpClient(max_connections_per_shop=10)
+       response = await client.request(
+           logger,
+           myshopify_domain="heyhorse.myshopify.com",
+           api_path="/orders/1.json",
+           api_token=token,
+       )
+    """
+
+    def __init__(
+        self,
+        *,
+        max_connections_per_shop: int = 10,
+        max_idle_connections_per_shop: int = 10,
+        idle_timeout: float = 30.0,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        scheme: str = "https",
+        ssl_context: Optional["ssl.SSLContext"] = None,
+        rate_limiter: Optional[ratelimit.RateLimiter] = None,
+        coalesce_requests: bool = True,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        """Initialize a new AsyncHttpClient.
+
+        Args:
+            max_connections_per_shop: Maximum number of concurrent connections to a
+                single host. Additional requests wait for a free connection.
+            max_idle_connections_per_shop: Maximum number of idle keep-alive
+                connections kept open per host.
+            idle_timeout: Seconds an idle connection is kept before it is discarded.
+            connect_timeout: Seconds to wait for a connection (including the TLS
+                handshake) to be established.
+            read_timeout: Seconds to wait for a complete response once the request
+                has been sent.
+            scheme: The scheme used for Shopify API requests. This should only be
+                changed for testing against a local server.
+            ssl_context: The SSL context used for ``https`` connections. *Default is
+                the system's default context.*
+            rate_limiter: Limits the rate of requests made to each shop. *Default is
+                the limiter shared by the process.*
+            coalesce_requests: Share a single request between concurrent callers
+                making identical GET requests. Every caller receives the same
+                response.
+            retry_policy: Decides when and how long to wait before retrying a failed
+                request. *Default is
+                :data:`wkflws_shopify.retry.default_retry_policy`.*
+        """
+        self.max_connections_per_shop = max_connections_per_shop
+        self.max_idle_connections_per_shop = max_idle_connections_per_shop
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.scheme = scheme
+        self._ssl_context = ssl_context
+        self.rate_limiter = rate_limiter or ratelimit.rate_limiter
+        self.coalesce_requests = coalesce_requests
+        self.retry_policy = retry_policy or default_retry_policy
+        #: Number of requests which were served by an identical in-flight request.
+        self.coalesced_requests = 0
+
+        self._pools: dict[tuple[str, str, int], ConnectionPool] = {}
+        # When the pools are next pruned. See _prune_pools().
+        self._prune_at = 0.0
+        self._in_flight: dict[tuple, asyncio.Task[HttpResponse]] = {}
+        # Connections and tasks are bound to the loop which created them.
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def ssl_context(self) -> "ssl.SSLContext":
+        """The SSL context used for ``https`` connections."""
+        if self._ssl_context is None:
+            import ssl
+
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    def _check_loop(self):
+        """Discard state belonging to a previous event loop."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Connections (and their waiters) from a previous loop can't be used. If
+            # that loop is closed their sockets are closed once they're collected.
+            for pool in self._pools.values():
+                pool.close()
+            self._pools = {}
+            self._in_flight = {}
+            self._loop = loop
+
+    def get_pool(self, scheme: str, host: str, port: int) -> ConnectionPool:
+        """Return the connection pool for ``scheme://host:port``."""
+        self._check_loop()
+        now = time.monotonic()
+        if now >= self._prune_at:
+            self._prune_pools(now)
+
+        key = (scheme, host, port)
+        try:
+            return self._pools[key]
+        except KeyError:
+            pool = self._pools[key] = ConnectionPool(
+                host,
+                port,
+                ssl_context=self.ssl_context if scheme == "https" else None,
+                max_connections=self.max_connections_per_shop,
+                max_idle_connections=self.max_idle_connections_per_shop,
+                idle_timeout=self.idle_timeout,
+                connect_timeout=self.connect_timeout,
+            )
+            return pool
+
+    def _prune_pools(self, now: float):
+        """Close expired idle connections and remove the pools nobody uses.
+
+        Idle connections are otherwise only closed when their host is requested
+        again, so a long running process would keep the connections of every shop it
+        ever requested open.
+        """
+        for key, pool in list(self._pools.items()):
+            pool.close_expired(now)
+            if pool.unused:
+                del self._pools[key]
+        self._prune_at = now + self.idle_timeout
+
+    async def fetch(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[dict[str, str]] = None,
+        body: Optional[bytes] = None,
+    ) -> HttpResponse:
+        """Make a single HTTP request and return the response.
+
+        No retries, redirects or error handling are performed. See :meth:`request`
+        for Shopify API requests.
+
+        Args:
+            method: The HTTP method (e.g. GET, POST, etc)
+            url: The absolute URL to request.
+            headers: Headers to include in the request.
+            body: The request body.
+
+        Returns:
+            The response from the HTTP request.
+        """
+        pool, raw_request = self._prepare(method, url, headers=headers, body=body)
+
+        # A pooled connection may have been closed by the server while it was idle.
+        # In that case retry once on a fresh connection.
+        for _ in range(2):
+            conn = await pool.acquire()
+            reusable = False
+            try:
+                response, reusable = await asyncio.wait_for(
+                    self._send(conn, method, raw_request),
+                    timeout=self.read_timeout,
+                )
+                return response
+            except _StaleConnection:
+                continue
+            finally:
+                pool.release(conn, reusable=reusable)
+
+        raise HttpError(
+            f"Connection to {pool.host} closed unexpectedly", status_code=None, body=""
+        )
+
+    def _prepare(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[dict[str, str]],
+        body: Optional[bytes],
+    ) -> tuple[ConnectionPool, bytes]:
+        """Return the pool for ``url`` and the encoded request."""
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or "https"
+        host = parts.hostname or ""
+        port = parts.port or (443 if scheme == "https" else 80)
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+
+        pool = self.get_pool(scheme, host, port)
+
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}"]
+        sent_headers = {k.lower() for k in (headers or {})}
+        for k, v in (headers or {}).items():
+            lines.append(f"{k}: {v}")
+        if "accept-encoding" not in sent_headers:
+            lines.append("Accept-Encoding: gzip")
+        if body is not None or method in ("POST", "PUT", "PATCH"):
+            lines.append(f"Content-Length: {len(body or b'')}")
+        raw_request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (
+            body or b""
+        )
+        return pool, raw_request
+
+    async def stream(
+        self,
+        url: str,
+        *,
+        headers: Optional[dict[str, str]] = None,
+        chunk_size: int = 2**16,
+    ) -> AsyncIterator[bytes]:
+        """Make a GET request yielding the response body as it's received.
+
+        Unlike :meth:`fetch` the body is never held in memory which makes this
+        suitable for large downloads. No retries or redirects are performed.
+
+        Args:
+            url: The absolute URL to request.
+            headers: Headers to include in the request.
+            chunk_size: The maximum size of each chunk read from the connection.
+
+        Raises:
+            HttpError: The response's status code wasn't 2xx.
+        """
+        pool, raw_request = self._prepare("GET", url, headers=headers, body=None)
+
+        for _ in range(2):
+            conn = await pool.acquire()
+            try:
+                status_code, response_headers, reusable = await asyncio.wait_for(
+                    self._send_head(conn, raw_request), timeout=self.read_timeout
+                )
+                break
+            except _StaleConnection:
+                pool.release(conn, reusable=False)
+            except BaseException:
+                pool.release(conn, reusable=False)
+                raise
+        else:
+            raise HttpError(
+                f"Connection to {pool.host} closed unexpectedly",
+                status_code=None,
+                body="",
+            )
+
+        completed = False
+        try:
+            lower_headers = {k.lower(): v.lower() for k, v in response_headers.items()}
+            if "content-length" not in lower_headers and (
+                lower_headers.get("transfer-encoding") != "chunked"
+            ):
+                reusable = False
+            chunks = _iter_body(
+                conn.reader,
+                lower_headers,
+                chunk_size=chunk_size,
+                timeout=self.read_timeout,
+            )
+
+            if status_code < 200 or status_code >= 300:
+                body = b"".join([chunk async for chunk in chunks])
+                raise HttpError(
+                    f"HTTP Error {status_code}",
+                    status_code=status_code,
+                    body=body.decode("utf-8", "replace"),
+                )
+
+            decompressor = None
+            if lower_headers.get("content-encoding") == "gzip":
+                import zlib
+
+                decompressor = zlib.decompressobj(wbits=31)
+
+            async for chunk in chunks:
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                if chunk:
+                    yield chunk
+            if decompressor is not None and (tail := decompressor.flush()):
+                yield tail
+            completed = True
+        finally:
+            # A partially read response can't be followed by another request.
+            pool.release(conn, reusable=reusable and completed)
+
+    async def _send_head(
+        self, conn: _Connection, raw_request: bytes
+    ) -> tuple[int, dict[str, str], bool]:
+        """Write ``raw_request`` to ``conn`` and read the response's status and headers.
+
+        Returns:
+            The status code, headers and whether the connection can be reused.
+        """
+        try:
+            conn.writer.write(raw_request)
+            await conn.writer.drain()
+            status_line = await conn.reader.readline()
+        except (ConnectionError, OSError):
+            if conn.reused:
+                raise _StaleConnection() from None
+            raise
+
+        if not status_line:
+            if conn.reused:
+                raise _StaleConnection()
+            raise HttpError("Empty response", status_code=None, body="")
+
+        try:
+            version, status, *_ = status_line.decode("latin-1").split(" ", 2)
+            status_code = int(status)
+        except ValueError:
+            raise HttpError(
+                f"Malformed status line {status_line!r}", status_code=None, body=""
+            ) from None
+
+        headers: dict[str, str] = {}
+        while True:
+            line = await conn.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            k, v = k.strip(), v.strip()
+            headers[k] = f"{headers[k]}, {v}" if k in headers else v
+
+        lower_headers = {k.lower(): v.lower() for k, v in headers.items()}
+        reusable = version == "HTTP/1.1" and lower_headers.get("connection") != "close"
+        return status_code, headers, reusable
+
+    async def _send(
+        self, conn: _Connection, method: str, raw_request: bytes
+    ) -> tuple[HttpResponse, bool]:
+        """Write ``raw_request`` to ``conn`` and read the response.
+
+        Returns:
+            The response and whether the connection can be reused.
+        """
+        status_code, headers, reusable = await self._send_head(conn, raw_request)
+        lower_headers = {k.lower(): v.lower() for k, v in headers.items()}
+
+        if method == "HEAD" or status_code in (204, 304) or status_code < 200:
+            body = b""
+        elif lower_headers.get("transfer-encoding") == "chunked":
+            body = await _read_chunked(conn.reader)
+        elif "content-length" in lower_headers:
+            body = await conn.reader.readexactly(int(lower_headers["content-length"]))
+        else:
+            body = await conn.reader.read()
+            reusable = False
+
+        if lower_headers.get("content-encoding") == "gzip":
+            import gzip
+
+            body = gzip.decompress(body)
+
+        return HttpResponse(status_code=status_code, headers=headers, body=body), (
+            reusable
+        )
+
+    async def request(
+        self,
+        logger: Logger,
+        *,
+        myshopify_domain: str,
+        api_path: str,
+        api_token: str,
+        json_data: Optional[dict[str, Any]] = None,
+        headers: Optional[dict[str, Any]] = None,
+        method: Optional[str] = None,
+        num_retries: int = 5,
+        api_version: str = "2022-04",
+    ) -> HttpResponse:
+        """Make an HTTP request to the Shopify Admin API.
+
+        This is the awaitable equivalent of :func:`make_http_request`. Concurrent
+        identical GET requests share a single request to Shopify unless
+        ``coalesce_requests`` is disabled.
+
+        Args:
+            myshopify_domain: The store's full myshopify domain (shop.myshopif.com)
+            api_path: The path of the api to use.
+            api_token: The API token for the shopify shop.
+            json_data: A JSON serializable payload to send to the API.
+            headers: Headers to include in the request.
+            method: The HTTP method (e.g. GET, POST, etc)
+            num_retries: Number of retries (exponentially backed off) when receiving a
+                server error before failing. The client's retry policy may give up
+                sooner if its deadline is reached.
+            api_version: The version of the Admin API.
+
+        Raises
+            HttpError: The error response from the HTTP request.
+
+        Returns:
+            The response from the HTTP request.
+        """
+        kwargs: dict[str, Any] = dict(
+            myshopify_domain=myshopify_domain,
+            api_path=api_path,
+            api_token=api_token,
+            json_data=json_data,
+            headers=headers,
+            method=method,
+            num_retries=num_retries,
+            api_version=api_version,
+        )
+        if not self.coalesce_requests or json_data or (method or "GET") != "GET":
+            return await self._request(logger, **kwargs)
+
+        self._check_loop()
+        key = (
+            myshopify_domain,
+            api_path,
+            api_version,
+            api_token,
+            tuple(sorted((headers or {}).items())),
+        )
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request(logger, **kwargs))
+            self._in_flight[key] = task
+
+            def forget(t: asyncio.Task[HttpResponse]):
+                if self._in_flight.get(key) is t:
+                    del self._in_flight[key]
+
+            task.add_done_callback(forget)
+        else:
+            logger.debug("Sharing in-flight request for %s", api_path)
+            self.coalesced_requests += 1
+
+        # Shield the shared request so one caller being cancelled doesn't cancel it
+        # for everyone else.
+        return await asyncio.shield(task)
+
+    async def _request(
+        self,
+        logger: Logger,
+        *,
+        myshopify_domain: str,
+        api_path: str,
+        api_token: str,
+        json_data: Optional[dict[str, Any]],
+        headers: Optional[dict[str, Any]],
+        method: Optional[str],
+        num_retries: int,
+        api_version: str,
+    ) -> HttpResponse:
+        """Make an HTTP request to the Shopify Admin API. See :meth:`request`."""
+        url = f"{self.scheme}://{myshopify_domain}/admin/api/{api_version}{api_path}"
+        headers = dict(headers or {})
+        headers["X-Shopify-Access-Token"] = api_token
+        if "Content-Type" not in headers:
+            headers["Content-Type"] = "application/json; charset=utf-8"
+
+        payload = serialization.dumps(json_data) if json_data else None
+        method = method or ("POST" if payload is not None else "GET")
+
+        # The GraphQL API isn't limited by request count. Its query cost is limited
+        # by :class:`wkflws_shopify.graphql.GraphQLClient`.
+        bucket = (
+            None
+            if api_path == GRAPHQL_API_PATH
+            else self.rate_limiter.get_bucket(myshopify_domain)
+        )
+        retry_state = self.retry_policy.start(num_retries)
+        sink = metrics.get_metrics()
+
+        redirect_count = 0
+        while True:
+            if bucket is not None:
+                waited = await bucket.acquire()
+                profiling.add(profiling.RATE_LIMIT, waited)
+                if sink is not None and waited:
+                    sink.increment(
+                        metrics.RATE_LIMIT_WAIT_SECONDS, waited, shop=myshopify_domain
+                    )
+            logger.info("Making HTTP request to %s...", url)
+            started_at = time.perf_counter()
+            try:
+                with profiling.phase(profiling.NETWORK):
+                    response = await self.fetch(
+                        method, url, headers=headers, body=payload
+                    )
+            except BaseException:
+                if bucket is not None:
+                    bucket.release()
+                if sink is not None:
+                    metrics.record_response(
+                        sink,
+                        shop=myshopify_domain,
+                        api_path=api_path,
+                        method=method,
+                        status=None,
+                        seconds=time.perf_counter() - started_at,
+                    )
+                raise
+            if bucket is not None:
+                bucket.record_response(response.get_header(ratelimit.CALL_LIMIT_HEADER))
+            if sink is not None:
+                metrics.record_response(
+                    sink,
+                    shop=myshopify_domain,
+                    api_path=api_path,
+                    method=method,
+                    status=response.status_code,
+                    seconds=time.perf_counter() - started_at,
+                )
+
+            if response.status_code >= 200 and response.status_code < 300:
+                # Successful request
+                return response
+            elif response.status_code >= 300 and response.status_code < 400:
+                # Location moved
+                redirect_count += 1
+                location = response.get_header("Location")
+                if redirect_count > MAX_REDIRECTS or location is None:
+                    raise HttpError(
+                        f"HTTP Error {response.status_code}",
+                        status_code=response.status_code,
+                        body=response.body.decode("utf-8"),
+                    )
+                url = urllib.parse.urljoin(url, location)
+                continue
+
+            body = response.body.decode("utf-8")
+            if self.retry_policy.should_retry(response.status_code):
+                # Server error. Wait and retry
+                wait_for = retry_state.next_delay(response.get_header("Retry-After"))
+                if wait_for is None:
+                    raise HttpError(
+                        _retries_exceeded_message(retry_state),
+                        status_code=response.status_code,
+                        body=body,
+                    )
+                logger.debug(
+                    "Request failed. Waiting %.2fs before retrying. (%s of %s)",
+                    wait_for,
+                    retry_state.retry_count,
+                    retry_state.max_retries,
+                )
+                if sink is not None:
+                    metrics.record_retry(
+                        sink,
+                        shop=myshopify_domain,
+                        api_path=api_path,
+                        delay=wait_for,
+                    )
+                profiling.add(profiling.BACKOFF, wait_for)
+                await asyncio.sleep(wait_for)
+                continue
+            elif response.status_code >= 400 and response.status_code < 500:
+                # Client error. Log the message so it can be fixed.
+                raise HttpError(
+                    f"HTTP Error {response.status_code}",
+                    status_code=response.status_code,
+                    body=body,
+                )
+            else:
+                # Unknown error. Log so it can be looked into.
+                raise HttpError(
+                    f"Unknown HTTP Error {response.status_code}",
+                    status_code=response.status_code,
+                    body=body,
+                )
+
+    def close(self):
+        """Close all idle pooled connections."""
+        for pool in self._pools.values():
+            pool.close()
+        self._pools = {}
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    """Read a ``Transfer-Encoding: chunked`` body."""
+    chunks: list[bytes] = []
+    while True:
+        size_line = await reader.readline()
+        size = int(size_line.split(b";", 1)[0].strip(), 16)
+        if size == 0:
+            # Discard any trailers
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)  # \r\n
+
+
+async def _iter_body(
+    reader: asyncio.StreamReader,
+    lower_headers: dict[str, str],
+    *,
+    chunk_size: int,
+    timeout: float,
+) -> AsyncIterator[bytes]:
+    """Yield a response body in chunks of at most ``chunk_size`` bytes."""
+
+    async def read(n: int) -> bytes:
+        return await asyncio.wait_for(reader.read(n), timeout=timeout)
+
+    async def read_exactly(n: int) -> AsyncIterator[bytes]:
+        while n > 0:
+            chunk = await read(min(n, chunk_size))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"", n)
+            n -= len(chunk)
+            yield chunk
+
+    if lower_headers.get("transfer-encoding") == "chunked":
+        while True:
+            size_line = await asyncio.wait_for(reader.readline(), timeout=timeout)
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                # Discard any trailers
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            async for chunk in read_exactly(size):
+                yield chunk
+            await reader.readexactly(2)  # \r\n
+    elif "content-length" in lower_headers:
+        async for chunk in read_exactly(int(lower_headers["content-length"])):
+            yield chunk
+    else:
+        while chunk := await read(chunk_size):
+            yield chunk
+
+
+_default_client: Optional[AsyncHttpClient] = None
+
+
+def get_client() -> AsyncHttpClient:
+    """Return the shared :class:`AsyncHttpClient`."""
+    global _default_client
+    if _default_client is None:
+        _default_client = AsyncHttpClient()
+    return _default_client
+
+
+def set_client(client: Optional[AsyncHttpClient]):
+    """Replace the shared :class:`AsyncHttpClient`.
+
+    Args:
+        client: The new client. ``None`` resets the shared client to the default.
+    """
+    global _default_client
+    _default_client = client
+
+
+async def make_async_http_request(
+    logger: Logger,
+    *,
+    myshopify_domain: str,
+    api_path: str,
+    api_token: str,
+    json_data: Optional[dict[str, Any]] = None,
+    headers: Optional[dict[str, Any]] = None,
+    method: Optional[str] = None,
+    num_retries: int = 5,
+    api_version: str = "2022-04",
+) -> HttpResponse:
+    """Make a non-blocking HTTP request using the shared client.
+
+    See :func:`make_http_request` and :meth:`AsyncHttpClient.request`.
+    """
+    return await get_client().request(
+        logger,
+        myshopify_domain=myshopify_domain,
+        api_path=api_path,
+        api_token=api_token,
+        json_data=json_data,
+        headers=headers,
+        method=method,
+        num_retries=num_retries,
+        api_version=api_version,
+    )
@@ -0,0 +1,272 @@
+"""Record the latency and outcome of HTTP requests and webhooks.
+
+Metrics are disabled by default. When they are disabled :func:`get_metrics` returns
+``None`` and the instrumented code skips measuring entirely, so the only cost is a
+function call and a ``None`` check.
+
+When enabled (``WKFLWS_SHOPIFY_METRICS_ENABLED``) measurements are aggregated in this
+process's memory by a :class:`MetricsRegistry` which can be exported in the
+Prometheus text format. Any other :class:`MetricsSink` (e.g. one forwarding to StatsD)
+can be installed with :func:`set_metrics`.
+
+Recorded metrics:
+
+- :data:`HTTP_REQUEST_DURATION`: seconds taken by each Admin API request (each
+  attempt, not including waits) by shop, endpoint, method and status
+- :data:`HTTP_RESPONSES`: responses by shop, endpoint and status (``error`` when no
+  response was received)
+- :data:`HTTP_RETRIES` and :data:`HTTP_BACKOFF_SECONDS`: retries by shop and endpoint
+  and the seconds spent waiting before them
+- :data:`RATE_LIMIT_WAIT_SECONDS`: seconds spent waiting for the shop's rate limit
+- :data:`WEBHOOK_PROCESS_DURATION`: seconds taken by
+  :func:`~wkflws_shopify.triggers.listener.process_webhook_request` by topic and
+  response status
+- :data:`WEBHOOK_ACCEPT_DURATION`: seconds taken by
+  :func:`~wkflws_shopify.triggers.listener.accept_event` by topic
+- :data:`WEBHOOK_EVENTS`: events accepted by topic. The events per second are the rate
+  of this counter (e.g. ``rate(shopify_webhook_events_total[1m])``).
+- :data:`WEBHOOK_VERIFICATION_DURATION`: seconds taken to verify the signature of each
+  webhook
+- :data:`WEBHOOK_VERIFICATION_FAILURES`: webhooks rejected by
+  :mod:`~wkflws_shopify.triggers.verify` by reason (``missing_signature``,
+  ``unknown_shop`` or ``invalid_signature``)
+"""
+
+import abc
+import bisect
+from dataclasses import dataclass, field
+import re
+import threading
+from typing import Iterator, Optional
+
+HTTP_REQUEST_DURATION = "shopify_http_request_duration_seconds"
+HTTP_RESPONSES = "shopify_http_responses_total"
+HTTP_RETRIES = "shopify_http_retries_total"
+HTTP_BACKOFF_SECONDS = "shopify_http_backoff_seconds_total"
+RATE_LIMIT_WAIT_SECONDS = "shopify_http_rate_limit_wait_seconds_total"
+WEBHOOK_PROCESS_DURATION = "shopify_webhook_process_duration_seconds"
+WEBHOOK_ACCEPT_DURATION = "shopify_webhook_accept_duration_seconds"
+WEBHOOK_EVENTS = "shopify_webhook_events_total"
+WEBHOOK_VERIFICATION_DURATION = "shopify_webhook_verification_duration_seconds"
+WEBHOOK_VERIFICATION_FAILURES = "shopify_webhook_verification_failures_total"
+
+#: Upper bounds (in seconds) of the histogram buckets.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#: Content type of :meth:`MetricsRegistry.render`.
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_ID_SEGMENT = re.compile(r"/\d+(?=[/.]|$)")
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class MetricsSink(abc.ABC):
+    """Receive measurements."""
+
+    @abc.abstractmethod
+    def increment(self, name: str, value: float = 1.0, **labels: str):
+        """Add ``value`` to the counter ``name``."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def observe(self, name: str, value: float, **labels: str):
+        """Record ``value`` (e.g. a duration in seconds) in the histogram ``name``."""
+        raise NotImplementedError
+
+
+@dataclass
+class Histogram:
+    """Distribution of the values observed for a histogram."""
+
+    #: upper bounds of the buckets
+    buckets: tuple[float, ...]
+    #: number of values in each bucket (not cumulative). The last element counts the
+    #: values larger than every bound.
+    counts: list[int] = field(default_factory=list)
+    #: sum of the observed values
+    sum: float = 0.0
+    #: number of observed values
+    count: int = 0
+
+    def __post_init__(self):
+        if not self.counts:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float):
+        """Add ``value`` to the distribution."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry(MetricsSink):
+    """Aggregate measurements in memory."""
+
+    def __init__(self, *, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """Initialize a new MetricsRegistry.
+
+        Args:
+            buckets: Upper bounds of the histogram buckets.
+        """
+        self.buckets = buckets
+        self._counters: dict[tuple[str, Labels], float] = {}
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1.0, **labels: str):
+        """Add ``value`` to the counter ``name``."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: str):
+        """Record ``value`` in the histogram ``name``."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def get_counter(self, name: str, **labels: str) -> float:
+        """Return the value of a counter (``0`` if it was never incremented)."""
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def get_histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        """Return a histogram or ``None`` if no value was observed."""
+        return self._histograms.get((name, tuple(sorted(labels.items()))), None)
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, Histogram(h.buckets, list(h.counts), h.sum, h.count))
+                for key, h in self._histograms.items()
+            )
+        return "".join(_render(counters, histograms))
+
+    def reset(self):
+        """Forget every measurement."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _render(
+    counters: list[tuple[tuple[str, Labels], float]],
+    histograms: list[tuple[tuple[str, Labels], Histogram]],
+) -> Iterator[str]:
+    last_name = None
+    for (name, labels), value in counters:
+        if name != last_name:
+            yield f"# TYPE {name} counter\n"
+            last_name = name
+        yield f"{name}{_format_labels(labels)} {_format_value(value)}\n"
+
+    for (name, labels), histogram in histograms:
+        if name != last_name:
+            yield f"# TYPE {name} histogram\n"
+            last_name = name
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            le = (("le", _format_value(bound)),)
+            yield f"{name}_bucket{_format_labels(labels + le)} {cumulative}\n"
+        le = (("le", "+Inf"),)
+        yield f"{name}_bucket{_format_labels(labels + le)} {histogram.count}\n"
+        yield f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}\n"
+        yield f"{name}_count{_format_labels(labels)} {histogram.count}\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def endpoint_label(api_path: str) -> str:
+    """Return ``api_path`` without the query string and with ids replaced by ``{id}``.
+
+    This keeps the number of distinct endpoints (and so time series) small, e.g.
+    ``/orders/450789469.json?fields=id`` is ``/orders/{id}.json``.
+    """
+    return _ID_SEGMENT.sub("/{id}", api_path.split("?", 1)[0])
+
+
+def record_response(
+    sink: MetricsSink,
+    *,
+    shop: str,
+    api_path: str,
+    method: str,
+    status: Optional[int],
+    seconds: float,
+):
+    """Record an Admin API request.
+
+    Args:
+        sink: Where the measurements are sent.
+        shop: The shop's myshopify domain.
+        api_path: The requested path.
+        method: The HTTP method.
+        status: The response's status code. ``None`` if no response was received.
+        seconds: The time taken by the request.
+    """
+    endpoint = endpoint_label(api_path)
+    status_label = "error" if status is None else str(status)
+    sink.observe(
+        HTTP_REQUEST_DURATION,
+        seconds,
+        shop=shop,
+        endpoint=endpoint,
+        method=method,
+        status=status_label,
+    )
+    sink.increment(HTTP_RESPONSES, shop=shop, endpoint=endpoint, status=status_label)
+
+
+def record_retry(sink: MetricsSink, *, shop: str, api_path: str, delay: float):
+    """Record a retry made after waiting ``delay`` seconds."""
+    sink.increment(HTTP_RETRIES, shop=shop, endpoint=endpoint_label(api_path))
+    sink.increment(HTTP_BACKOFF_SECONDS, delay, shop=shop)
+
+
+_metrics: Optional[MetricsSink] = None
+_configured = False
+
+
+def get_metrics() -> Optional[MetricsSink]:
+    """Return the metrics sink or ``None`` if metrics are disabled."""
+    global _metrics, _configured
+    if not _configured:
+        # Settings are loaded on first use so the worker can import this module
+        # without importing pydantic.
+        from .conf import settings
+
+        if _metrics is None and settings.METRICS_ENABLED:
+            _metrics = MetricsRegistry()
+        _configured = True
+    return _metrics
+
+
+def set_metrics(sink: Optional[MetricsSink]):
+    """Replace the metrics sink.
+
+    Args:
+        sink: The new sink. ``None`` resets the sink to the one configured in
+            settings.
+    """
+    global _metrics, _configured
+    _metrics = sink
+    _configured = sink is not None
@@ -0,0 +1,411 @@
+"""Local copy of a shop's orders and customers which can be queried without the API.
+
+The mirror is a SQLite database shared by every process on the host. The webhook
+listener keeps it current (see
+:func:`~wkflws_shopify.triggers.listener.mirror_event`) and :func:`backfill_orders`
+copies the orders which existed before webhooks were received. Orders are indexed by
+customer id, email, tag (the ``tags`` CSV split into one row per tag), ``created_at``
+and ``updated_at``. Their line items are stored in their own table indexed by SKU.
+
+Payloads are stored as received from Shopify. An order or customer is only replaced
+by a payload with the same or a more recent ``updated_at``, so webhooks delivered out
+of order and backfills overlapping webhooks never revert a newer version.
+
+Usage:
+
+.. code::python
+   mirror = get_order_mirror()
+   await backfill_orders(
+       logger,
+       myshopify_domain="heyhorse.myshopify.com",
+       api_token=token,
+       mirror=mirror,
+   )
+   orders = mirror.query_orders("heyhorse.myshopify.com", tag="wholesale")
+"""
+
+from datetime import datetime, timezone
+from logging import Logger
+import threading
+from typing import Any, Iterable, Optional
+import urllib.parse
+
+from . import serialization
+from .conf import settings
+from .pagination import paginate_pages
+
+#: Maximum number of orders Shopify returns for a single request.
+MAX_ORDERS_PER_REQUEST = 250
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS orders ("
+    "shop TEXT NOT NULL, id INTEGER NOT NULL, customer_id INTEGER, email TEXT, "
+    "created_at TEXT, updated_at TEXT, payload TEXT NOT NULL, "
+    "PRIMARY KEY (shop, id))",
+    "CREATE INDEX IF NOT EXISTS orders_customer_id ON orders (shop, customer_id)",
+    "CREATE INDEX IF NOT EXISTS orders_email ON orders (shop, email)",
+    "CREATE INDEX IF NOT EXISTS orders_created_at ON orders (shop, created_at)",
+    "CREATE INDEX IF NOT EXISTS orders_updated_at ON orders (shop, updated_at)",
+    "CREATE TABLE IF NOT EXISTS order_tags ("
+    "shop TEXT NOT NULL, order_id INTEGER NOT NULL, tag TEXT NOT NULL, "
+    "PRIMARY KEY (shop, order_id, tag))",
+    "CREATE INDEX IF NOT EXISTS order_tags_tag ON order_tags (shop, tag)",
+    "CREATE TABLE IF NOT EXISTS line_items ("
+    "shop TEXT NOT NULL, order_id INTEGER NOT NULL, id INTEGER NOT NULL, "
+    "product_id INTEGER, variant_id INTEGER, sku TEXT, quantity INTEGER, "
+    "PRIMARY KEY (shop, order_id, id))",
+    "CREATE INDEX IF NOT EXISTS line_items_sku ON line_items (shop, sku)",
+    "CREATE TABLE IF NOT EXISTS customers ("
+    "shop TEXT NOT NULL, id INTEGER NOT NULL, email TEXT, updated_at TEXT, "
+    "payload TEXT NOT NULL, PRIMARY KEY (shop, id))",
+    "CREATE INDEX IF NOT EXISTS customers_email ON customers (shop, email)",
+)
+
+
+class OrderMirror:
+    """Store orders and customers in a SQLite database."""
+
+    def __init__(self, path: str):
+        """Initialize a new OrderMirror.
+
+        Args:
+            path: Path to the database file. It is created if it doesn't exist.
+        """
+        import sqlite3  # only imported when the mirror is used.
+
+        self.path = path
+        self._conn = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    def add_orders(self, myshopify_domain: str, orders: Iterable[dict[str, Any]]):
+        """Store (or replace) order payloads received from Shopify.
+
+        Every order is written in a single transaction. An order's customer is stored
+        too.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for order in orders:
+                    self._add_order(myshopify_domain, order)
+                    customer = order.get("customer", None)
+                    if isinstance(customer, dict) and "id" in customer:
+                        self._add_customer(myshopify_domain, customer)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def add_order(self, myshopify_domain: str, order: dict[str, Any]):
+        """Store (or replace) an order payload received from Shopify."""
+        self.add_orders(myshopify_domain, [order])
+
+    def _add_order(self, shop: str, order: dict[str, Any]):
+        customer = order.get("customer", None)
+        cursor = self._conn.execute(
+            "INSERT INTO orders "
+            "(shop, id, customer_id, email, created_at, updated_at, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (shop, id) DO UPDATE SET customer_id = excluded.customer_id, "
+            "email = excluded.email, created_at = excluded.created_at, "
+            "updated_at = excluded.updated_at, payload = excluded.payload "
+            "WHERE excluded.updated_at >= orders.updated_at "
+            "OR orders.updated_at IS NULL",
+            (
+                shop,
+                order["id"],
+                customer.get("id", None) if isinstance(customer, dict) else None,
+                _email(order.get("email", None)),
+                _utc(order.get("created_at", None)),
+                _utc(order.get("updated_at", None)),
+                serialization.dumps(order).decode("utf-8"),
+            ),
+        )
+        if cursor.rowcount == 0:
+            # A more recent version is already stored.
+            return
+
+        self._conn.execute(
+            "DELETE FROM order_tags WHERE shop = ? AND order_id = ?",
+            (shop, order["id"]),
+        )
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO order_tags (shop, order_id, tag) VALUES (?, ?, ?)",
+            [(shop, order["id"], tag) for tag in split_tags(order.get("tags", None))],
+        )
+        self._conn.execute(
+            "DELETE FROM line_items WHERE shop = ? AND order_id = ?",
+            (shop, order["id"]),
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO line_items "
+            "(shop, order_id, id, product_id, variant_id, sku, quantity) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    shop,
+                    order["id"],
+                    line_item["id"],
+                    line_item.get("product_id", None),
+                    line_item.get("variant_id", None),
+                    line_item.get("sku", None) or None,
+                    line_item.get("quantity", None),
+                )
+                for line_item in order.get("line_items", None) or ()
+            ],
+        )
+
+    def add_customer(self, myshopify_domain: str, customer: dict[str, Any]):
+        """Store (or replace) a customer payload received from Shopify."""
+        with self._lock:
+            self._add_customer(myshopify_domain, customer)
+
+    def _add_customer(self, shop: str, customer: dict[str, Any]):
+        self._conn.execute(
+            "INSERT INTO customers (shop, id, email, updated_at, payload) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (shop, id) DO UPDATE SET email = excluded.email, "
+            "updated_at = excluded.updated_at, payload = excluded.payload "
+            "WHERE excluded.updated_at >= customers.updated_at "
+            "OR customers.updated_at IS NULL",
+            (
+                shop,
+                customer["id"],
+                _email(customer.get("email", None)),
+                _utc(customer.get("updated_at", None)),
+                serialization.dumps(customer).decode("utf-8"),
+            ),
+        )
+
+    def delete_order(self, myshopify_domain: str, order_id: int) -> bool:
+        """Remove an order returning whether it existed."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for table in ("order_tags", "line_items"):
+                    self._conn.execute(
+                        f"DELETE FROM {table} WHERE shop = ? AND order_id = ?",
+                        (myshopify_domain, order_id),
+                    )
+                cursor = self._conn.execute(
+                    "DELETE FROM orders WHERE shop = ? AND id = ?",
+                    (myshopify_domain, order_id),
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return cursor.rowcount > 0
+
+    def get_order(
+        self, myshopify_domain: str, order_id: int
+    ) -> Optional[dict[str, Any]]:
+        """Return an order payload or ``None`` if it isn't mirrored."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM orders WHERE shop = ? AND id = ?",
+                (myshopify_domain, order_id),
+            ).fetchone()
+        return None if row is None else serialization.loads(row[0])
+
+    def get_customer(
+        self, myshopify_domain: str, customer_id: int
+    ) -> Optional[dict[str, Any]]:
+        """Return a customer payload or ``None`` if it isn't mirrored."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM customers WHERE shop = ? AND id = ?",
+                (myshopify_domain, customer_id),
+            ).fetchone()
+        return None if row is None else serialization.loads(row[0])
+
+    def find_customers(self, myshopify_domain: str, email: str) -> list[dict[str, Any]]:
+        """Return the payloads of the customers with ``email`` (case insensitive)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM customers WHERE shop = ? AND email = ? "
+                "ORDER BY id",
+                (myshopify_domain, _email(email)),
+            ).fetchall()
+        return [serialization.loads(row[0]) for row in rows]
+
+    def query_orders(
+        self,
+        myshopify_domain: str,
+        *,
+        customer_id: Optional[int] = None,
+        email: Optional[str] = None,
+        tag: Optional[str] = None,
+        sku: Optional[str] = None,
+        created_at_min: Optional[datetime] = None,
+        created_at_max: Optional[datetime] = None,
+        updated_at_min: Optional[datetime] = None,
+        updated_at_max: Optional[datetime] = None,
+        limit: int = MAX_ORDERS_PER_REQUEST,
+    ) -> list[dict[str, Any]]:
+        """Return the payloads of the orders matching every given filter.
+
+        Orders are sorted from the most recently created.
+
+        Args:
+            myshopify_domain: The shop's myshopify domain.
+            customer_id: Only orders of this customer.
+            email: Only orders with this email (case insensitive).
+            tag: Only orders with this tag (case insensitive).
+            sku: Only orders with a line item of this SKU.
+            created_at_min: Only orders created at or after this time.
+            created_at_max: Only orders created at or before this time.
+            updated_at_min: Only orders updated at or after this time.
+            updated_at_max: Only orders updated at or before this time.
+            limit: The maximum number of orders returned.
+        """
+        conditions = ["shop = ?"]
+        values: list[Any] = [myshopify_domain]
+        if customer_id is not None:
+            conditions.append("customer_id = ?")
+            values.append(customer_id)
+        if email is not None:
+            conditions.append("email = ?")
+            values.append(_email(email))
+        if tag is not None:
+            conditions.append(
+                "id IN (SELECT order_id FROM order_tags WHERE shop = ? AND tag = ?)"
+            )
+            values += [myshopify_domain, tag.strip().lower()]
+        if sku is not None:
+            conditions.append(
+                "id IN (SELECT order_id FROM line_items WHERE shop = ? AND sku = ?)"
+            )
+            values += [myshopify_domain, sku]
+        for column, operator, value in (
+            ("created_at", ">=", created_at_min),
+            ("created_at", "<=", created_at_max),
+            ("updated_at", ">=", updated_at_min),
+            ("updated_at", "<=", updated_at_max),
+        ):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                values.append(_utc(value))
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT payload FROM orders WHERE {' AND '.join(conditions)} "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (*values, limit),
+            ).fetchall()
+        return [serialization.loads(row[0]) for row in rows]
+
+    def clear(self):
+        """Remove every order and customer."""
+        with self._lock:
+            for table in ("orders", "order_tags", "line_items", "customers"):
+                self._conn.execute(f"DELETE FROM {table}")
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+
+def split_tags(tags: Optional[str]) -> list[str]:
+    """Split Shopify's comma separated ``tags`` into lower cased tags."""
+    if not tags:
+        return []
+    return [t for t in (tag.strip().lower() for tag in tags.split(",")) if t]
+
+
+def _email(email: Optional[str]) -> Optional[str]:
+    return email.strip().lower() if email else None
+
+
+def _utc(value: Any) -> Optional[str]:
+    """Return a date time in UTC with a fixed width so it can be compared as text."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+async def backfill_orders(
+    logger: Logger,
+    *,
+    myshopify_domain: str,
+    api_token: str,
+    mirror: OrderMirror,
+    updated_at_min: Optional[datetime] = None,
+    api_version: str = "2022-04",
+) -> int:
+    """Copy the shop's orders to the mirror.
+
+    Each page of orders is stored as it is received.
+
+    Args:
+        myshopify_domain: The store's full myshopify domain (shop.myshopif.com)
+        api_token: The API token for the shopify shop.
+        mirror: Where the orders are stored.
+        updated_at_min: Only copy orders updated since this time. *Default is every
+            order.*
+        api_version: The version of the Admin API.
+
+    Returns:
+        The number of orders copied.
+    """
+    query: dict[str, Any] = {"status": "any", "limit": MAX_ORDERS_PER_REQUEST}
+    if updated_at_min is not None:
+        query["updated_at_min"] = updated_at_min.isoformat()
+
+    count = 0
+    async for page in paginate_pages(
+        logger,
+        myshopify_domain=myshopify_domain,
+        api_path=f"/orders.json?{urllib.parse.urlencode(query)}",
+        api_token=api_token,
+        key="orders",
+        api_version=api_version,
+    ):
+        mirror.add_orders(myshopify_domain, page)
+        count += len(page)
+    logger.info("Copied %s orders of %s to the mirror", count, myshopify_domain)
+    return count
+
+
+_order_mirror: Optional[OrderMirror] = None
+
+
+def get_order_mirror() -> Optional[OrderMirror]:
+    """Return the order mirror configured in settings or ``None`` if it's disabled.
+
+    Raises:
+        RuntimeError: The mirror is enabled but ``MIRROR_PATH`` isn't configured.
+    """
+    global _order_mirror
+    if _order_mirror is None and settings.MIRROR_ENABLED:
+        path = settings.MIRROR_PATH
+        if path is None:
+            # A default path (e.g. in the temporary directory) could be lost or not
+            # shared by the listener and the nodes, silently returning partial results.
+            raise RuntimeError(
+                "WKFLWS_SHOPIFY_MIRROR_PATH must be set to a path on persistent "
+                "storage shared by the listener and the nodes to enable the mirror."
+            )
+        _order_mirror = OrderMirror(path)
+    return _order_mirror
+
+
+def set_order_mirror(mirror: Optional[OrderMirror]):
+    """Replace the order mirror.
+
+    Args:
+        mirror: The new mirror. ``None`` resets the mirror to the one configured in
+            settings.
+    """
+    global _order_mirror
+    _order_mirror = mirror
@@ -0,0 +1,172 @@
+"""Iterate over paginated REST Admin API list endpoints.
+
+Shopify paginates list endpoints with cursors. Each page's response includes a
+``Link`` header containing the URL of the next page (``rel="next"``).
+"""
+
+import asyncio
+from logging import Logger
+import re
+from typing import Any, AsyncGenerator, Callable, Optional, Type, TypeVar, Union
+import urllib.parse
+
+from pydantic import BaseModel
+
+from .http import AsyncHttpClient, get_client, HttpResponse
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+T = TypeVar("T")
+
+#: Matches a single link in a ``Link`` header. e.g. ``<https://...>; rel="next"``
+RE_LINK = re.compile(r'<(?P<url>[^>]+)>\s*;\s*rel="?(?P<rel>[^",;]+)"?')
+
+
+def parse_link_header(value: Optional[str]) -> dict[str, str]:
+    """Parse a ``Link`` header.
+
+    Args:
+        value: The value of the header.
+
+    Returns:
+        A dictionary mapping the ``rel`` of each link to its URL.
+    """
+    if not value:
+        return {}
+    return {m.group("rel"): m.group("url") for m in RE_LINK.finditer(value)}
+
+
+def _next_api_path(response: HttpResponse, api_version: str) -> Optional[str]:
+    """Return the API path of the page following ``response``, if any."""
+    next_url = parse_link_header(response.get_header("Link")).get("next")
+    if next_url is None:
+        return None
+
+    parts = urllib.parse.urlsplit(next_url)
+    path = parts.path.removeprefix(f"/admin/api/{api_version}")
+    return f"{path}?{parts.query}" if parts.query else path
+
+
+async def paginate_pages(
+    logger: Logger,
+    *,
+    myshopify_domain: str,
+    api_path: str,
+    api_token: str,
+    key: str,
+    model: Optional[Type[ModelT]] = None,
+    parse: Optional[Callable[[dict[str, Any]], T]] = None,
+    prefetch: bool = False,
+    api_version: str = "2022-04",
+    client: Optional[AsyncHttpClient] = None,
+) -> AsyncGenerator[list[Union[ModelT, T, dict[str, Any]]], None]:
+    """Yield each page of records from a paginated list endpoint.
+
+    Only one request is in flight at a time. When ``prefetch`` is enabled the next
+    page is requested while the current page is being consumed, otherwise it is
+    requested once the consumer asks for it.
+
+    Usage:
+
+    .. code::python
+       async for page in paginate_pages(
+           logger,
+           myshopify_domain="heyhorse.myshopify.com",
+           api_path="/orders.json?status=any&limit=250",
+           api_token=token,
+           key="orders",
+           model=Order,
+       ):
+           ...
+
+    Args:
+        myshopify_domain: The store's full myshopify domain (shop.myshopif.com)
+        api_path: The path of the first page. Set ``limit`` in the query string to
+            control the page size.
+        api_token: The API token for the shopify shop.
+        key: The key of the list of records in the response (e.g. ``orders``)
+        model: The model used to parse each record. If ``None`` the record's
+            dictionary is returned.
+        parse: Converts each record instead of ``model`` (e.g.
+            :meth:`~wkflws_shopify.schemas.compact.CompactOrder.from_dict`).
+        prefetch: Request the next page while the current one is being consumed.
+        api_version: The version of the Admin API.
+        client: The HTTP client to use. *Default is the shared client.*
+    """
+    http_client = client or get_client()
+
+    def fetch(path: str) -> asyncio.Task[HttpResponse]:
+        return asyncio.ensure_future(
+            http_client.request(
+                logger,
+                myshopify_domain=myshopify_domain,
+                api_path=path,
+                api_token=api_token,
+                method="GET",
+                api_version=api_version,
+            )
+        )
+
+    pending: Optional[asyncio.Task[HttpResponse]] = fetch(api_path)
+    try:
+        while pending is not None:
+            response = await pending
+            pending = None
+
+            next_path = _next_api_path(response, api_version)
+            if next_path is not None and prefetch:
+                pending = fetch(next_path)
+
+            records = response.json()[key]
+            # Release the raw body as early as possible.
+            del response
+
+            if parse is not None:
+                yield [parse(record) for record in records]
+            elif model is None:
+                yield records
+            else:
+                yield [model(**record) for record in records]
+
+            if next_path is not None and pending is None:
+                pending = fetch(next_path)
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def paginate(
+    logger: Logger,
+    *,
+    myshopify_domain: str,
+    api_path: str,
+    api_token: str,
+    key: str,
+    model: Optional[Type[ModelT]] = None,
+    parse: Optional[Callable[[dict[str, Any]], T]] = None,
+    prefetch: bool = False,
+    api_version: str = "2022-04",
+    client: Optional[AsyncHttpClient] = None,
+) -> AsyncGenerator[Union[ModelT, T, dict[str, Any]], None]:
+    """Yield each record from a paginated list endpoint.
+
+    Records are fetched one page at a time. See :func:`paginate_pages` for a
+    description of the arguments.
+    """
+    pages = paginate_pages(
+        logger,
+        myshopify_domain=myshopify_domain,
+        api_path=api_path,
+        api_token=api_token,
+        key=key,
+        model=model,
+        parse=parse,
+        prefetch=prefetch,
+        api_version=api_version,
+        client=client,
+    )
+    try:
+        async for page in pages:
+            for record in page:
+                yield record
+    finally:
+        await pages.aclose()
@@ -0,0 +1,313 @@
+"""Profile node executions and webhooks.
+
+Profiling is enabled for every node execution and webhook with
+``WKFLWS_SHOPIFY_PROFILE_ENABLED``, or for a single node execution by setting the
+``profile`` context property to ``true``. Each profiled invocation writes a JSON file
+to ``WKFLWS_SHOPIFY_PROFILE_DIR`` with the time spent in each phase:
+
+- :data:`NETWORK`: waiting for Shopify to respond
+- :data:`RATE_LIMIT` and :data:`BACKOFF`: waiting for the rate limit and before
+  retrying
+- :data:`JSON_DECODE`: parsing response and webhook bodies
+- :data:`VALIDATION`: building models (e.g. ``Order(**data)``)
+- :data:`SERIALIZATION`: dumping models (e.g. ``.dict(by_alias=True)``)
+- ``other``: the rest of the invocation
+
+Phases are summed, so concurrent requests (e.g. ``get_orders``) can add up to more than
+the invocation's total time.
+
+``WKFLWS_SHOPIFY_PROFILE_CAPTURE`` also captures where the time went in detail:
+
+- ``cprofile``: a :mod:`cProfile` ``.prof`` file (open with ``pstats`` or snakeviz)
+- ``sampling``: the stack of the invocation's thread sampled every
+  ``WKFLWS_SHOPIFY_PROFILE_SAMPLE_INTERVAL`` seconds, written as folded stacks
+  (``.folded``) for flamegraph.pl or speedscope. This has a lower overhead than
+  cProfile.
+
+Only one invocation is captured at a time. Both capture the whole thread, which
+includes other invocations running concurrently in the worker or listener.
+
+When profiling is disabled :func:`phase` returns a shared no-op context manager so the
+instrumented code pays for a single context variable lookup.
+"""
+
+import contextlib
+import contextvars
+import datetime
+import functools
+import itertools
+from logging import getLogger
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, ContextManager, Iterator, Optional, TypeVar
+
+from . import __identifier__
+
+NETWORK = "network"
+RATE_LIMIT = "rate_limit"
+BACKOFF = "backoff"
+JSON_DECODE = "json_decode"
+VALIDATION = "validation"
+SERIALIZATION = "serialization"
+
+#: Supported values of the ``PROFILE_CAPTURE`` setting.
+CAPTURE_MODES = ("cprofile", "sampling")
+
+logger = getLogger(f"{__identifier__}.profiling")
+
+T = TypeVar("T")
+
+_current: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar(
+    "wkflws_shopify_profile", default=None
+)
+_not_profiling: ContextManager[None] = contextlib.nullcontext()
+_sequence = itertools.count()
+# Held by the invocation being captured.
+_capture_lock = threading.Lock()
+
+
+class Profile:
+    """Time spent in each phase of an invocation."""
+
+    def __init__(self, name: str, *, metadata: Optional[dict[str, Any]] = None):
+        """Initialize a new Profile.
+
+        Args:
+            name: The name of the profiled function (e.g. ``get_order``).
+            metadata: Information written with the timings (e.g. the shop).
+        """
+        self.name = name
+        self.metadata = dict(metadata or {})
+        #: seconds spent in each phase
+        self.phases: dict[str, float] = {}
+        #: seconds taken by the whole invocation
+        self.total = 0.0
+        #: name of the file containing the captured profile
+        self.capture_file: Optional[str] = None
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Add the time spent in the ``with`` block to the phase ``name``."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started_at)
+
+    def add(self, name: str, seconds: float):
+        """Add ``seconds`` to the phase ``name``."""
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def asdict(self) -> dict[str, Any]:
+        """Create a dictionary representation of this object."""
+        phases = dict(self.phases)
+        phases["other"] = max(0.0, self.total - sum(self.phases.values()))
+        return {
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "total_seconds": self.total,
+            "phases": phases,
+            "metadata": self.metadata,
+            "capture_file": self.capture_file,
+        }
+
+
+def phase(name: str) -> ContextManager[None]:
+    """Record the time spent in the ``with`` block as the phase ``name``.
+
+    Nothing is recorded unless called during a profiled invocation.
+    """
+    profile = _current.get()
+    if profile is None:
+        return _not_profiling
+    return profile.phase(name)
+
+
+def add(name: str, seconds: float):
+    """Add ``seconds`` (e.g. time spent sleeping) to the phase ``name``."""
+    profile = _current.get()
+    if profile is not None:
+        profile.add(name, seconds)
+
+
+@contextlib.contextmanager
+def profile(
+    name: str,
+    *,
+    enabled: Optional[bool] = None,
+    metadata: Optional[dict[str, Any]] = None,
+) -> Iterator[Optional[Profile]]:
+    """Profile the ``with`` block and write the result to the profile directory.
+
+    Invocations within a profiled invocation are part of the outer profile.
+
+    Args:
+        name: The name of the profiled function (e.g. ``get_order``).
+        enabled: Profile this invocation even if profiling isn't enabled in
+            settings.
+        metadata: Information written with the timings (e.g. the shop).
+
+    Yields:
+        The profile or ``None`` when not profiling.
+
+    Raises:
+        ValueError: The configured capture mode is unknown.
+    """
+    from .conf import settings
+
+    if not (enabled or settings.PROFILE_ENABLED) or _current.get() is not None:
+        yield None
+        return
+
+    capture = settings.PROFILE_CAPTURE
+    if capture is not None and capture not in CAPTURE_MODES:
+        raise ValueError(f"Unknown profile capture mode {capture!r}")
+
+    current = Profile(name, metadata=metadata)
+    token = _current.set(current)
+    capturing = capture is not None and _capture_lock.acquire(blocking=False)
+
+    profiler: Any = None
+    if capturing and capture == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif capturing:
+        profiler = _Sampler(
+            threading.get_ident(), interval=settings.PROFILE_SAMPLE_INTERVAL
+        )
+        profiler.start()
+
+    started_at = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.total = time.perf_counter() - started_at
+        _current.reset(token)
+        if isinstance(profiler, _Sampler):
+            profiler.stop()
+        elif profiler is not None:
+            profiler.disable()
+
+        try:
+            write(current, settings.PROFILE_DIR, profiler=profiler)
+        except Exception:
+            logger.exception("Unable to write profile")
+        finally:
+            if capturing:
+                _capture_lock.release()
+
+
+def write(profile: Profile, directory: Optional[str], *, profiler: Any = None) -> str:
+    """Write ``profile`` (and the captured profile) to ``directory``.
+
+    Args:
+        profile: The profile to write.
+        directory: The directory the files are written to. *Default is
+            ``wkflws_shopify_profiles`` in the system's temporary directory.*
+        profiler: The :class:`cProfile.Profile` or sampler which captured the
+            invocation.
+
+    Returns:
+        The path of the JSON file.
+    """
+    from . import serialization
+
+    if directory is None:
+        import tempfile
+
+        directory = os.path.join(tempfile.gettempdir(), "wkflws_shopify_profiles")
+    os.makedirs(directory, exist_ok=True)
+
+    base_name = "{}-{}-{}-{}".format(
+        profile.name,
+        profile.started_at.strftime("%Y%m%dT%H%M%S"),
+        os.getpid(),
+        next(_sequence),
+    )
+    if profiler is not None:
+        extension = ".folded" if isinstance(profiler, _Sampler) else ".prof"
+        profile.capture_file = base_name + extension
+        profiler.dump_stats(os.path.join(directory, profile.capture_file))
+
+    path = os.path.join(directory, f"{base_name}.json")
+    with open(path, "wb") as f:
+        f.write(serialization.dumps(profile.asdict()))
+    return path
+
+
+def profile_node(
+    name: str,
+) -> Callable[
+    [Callable[[dict[str, Any], dict[str, Any]], Awaitable[T]]],
+    Callable[[dict[str, Any], dict[str, Any]], Awaitable[T]],
+]:
+    """Profile a node's executions.
+
+    The execution is profiled when the ``profile`` context property is true or
+    profiling is enabled in settings.
+
+    Args:
+        name: The name of the node (e.g. ``get_order``).
+    """
+
+    def decorator(
+        func: Callable[[dict[str, Any], dict[str, Any]], Awaitable[T]],
+    ) -> Callable[[dict[str, Any], dict[str, Any]], Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(message: dict[str, Any], context: dict[str, Any]) -> T:
+            with profile(
+                name,
+                enabled=context.get("profile", None) is True,
+                metadata={"shop": context.get("myshopify_domain", None)},
+            ):
+                return await func(message, context)
+
+        return wrapper
+
+    return decorator
+
+
+class _Sampler:
+    """Sample the stack of a thread at a fixed interval."""
+
+    def __init__(self, thread_id: int, *, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        #: number of times each stack (outermost frame first) was sampled
+        self.stacks: dict[tuple[str, ...], int] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        import sys
+
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:"
+                    f"{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                key = tuple(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def dump_stats(self, path: str):
+        """Write the samples in the folded stack format."""
+        with open(path, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{';'.join(stack)} {count}\n")
@@ -0,0 +1,87 @@
+from datetime import datetime
+from logging import getLogger
+from typing import Any, Optional
+
+from pydantic import BaseModel, conint, ValidationError
+
+from .. import __identifier__, profiling
+from ..mirror import get_order_mirror
+from ..schemas.orders import Order
+from ..schemas.trusted import trusted_dict
+
+
+class ParameterSchema(BaseModel):
+    """Represent the possible Parameters that can be passed to the node."""
+
+    #: only orders of this customer
+    customer_id: Optional[int] = None
+    #: only orders with this email (case insensitive)
+    email: Optional[str] = None
+    #: only orders with this tag (case insensitive)
+    tag: Optional[str] = None
+    #: only orders with a line item of this SKU
+    sku: Optional[str] = None
+    created_at_min: Optional[datetime] = None
+    created_at_max: Optional[datetime] = None
+    updated_at_min: Optional[datetime] = None
+    updated_at_max: Optional[datetime] = None
+    #: maximum number of orders output, from the most recently created.
+    limit: conint(ge=1, le=1000) = 250  # type: ignore # constrained type
+    #: skip validating the mirrored orders. Shopify's values are output unchanged.
+    trusted: bool = False
+
+
+class ContextSchema(BaseModel):
+    """Represent the required context variables."""
+
+    #: the FQDN of the store front. e.g. heyhorse.myshopify.com
+    myshopify_domain: str
+
+
+@profiling.profile_node("query_orders")
+async def query_orders(
+    message: dict[str, Any],
+    _context: dict[str, Any],
+) -> dict[str, Any]:
+    """Find orders in the local order mirror.
+
+    No request is made to Shopify, so the orders are as recent as the last webhook or
+    backfill which stored them.
+
+    Raises:
+        RuntimeError: The order mirror is disabled.
+    """
+    logger = getLogger(f"{__identifier__}.query_orders")
+    try:
+        parameters = ParameterSchema(**message)
+    except ValidationError:
+        raise
+
+    try:
+        context = ContextSchema(**_context)
+    except ValidationError:
+        raise
+
+    mirror = get_order_mirror()
+    if mirror is None:
+        raise RuntimeError(
+            "The order mirror is disabled (set WKFLWS_SHOPIFY_MIRROR_ENABLED)"
+        )
+
+    filters = parameters.dict(exclude={"trusted"})
+    found = mirror.query_orders(context.myshopify_domain, **filters)
+    logger.debug("Found %s mirrored orders matching %s", len(found), filters)
+
+    orders = []
+    for data in found:
+        if parameters.trusted:
+            with profiling.phase(profiling.VALIDATION):
+                orders.append(trusted_dict(Order, data))
+        else:
+            with profiling.phase(profiling.VALIDATION):
+                order = Order(**data)
+            with profiling.phase(profiling.SERIALIZATION):
+                orders.append(order.dict(by_alias=True))
+
+    # Construct a standard reply
+    return {"orders": orders}
@@ -0,0 +1,344 @@
+"""Client side rate limiting for the Shopify Admin API.
+
+Shopify rate limits the REST Admin API with a leaky bucket per shop. Every request
+adds one to the bucket and the bucket drains at a fixed rate. The current fill and
+the bucket size are reported on each response in the
+``X-Shopify-Shop-Api-Call-Limit`` header (e.g. ``32/40``). Requests made while the
+bucket is full are rejected with a 429.
+
+:class:`LeakyBucket` models the bucket locally so requests can be delayed just long
+enough to stay under the limit rather than being rejected.
+
+The GraphQL Admin API is limited separately by the calculated cost of each query
+rather than the number of requests. :class:`CostBucket` models those points using the
+``throttleStatus`` Shopify reports in each response's ``extensions.cost``.
+"""
+
+import asyncio
+from logging import getLogger
+import threading
+import time
+from typing import Callable, Optional
+
+from . import __identifier__
+
+#: The response header Shopify uses to report the bucket's fill and size.
+CALL_LIMIT_HEADER = "X-Shopify-Shop-Api-Call-Limit"
+
+#: Default bucket size for a standard shop.
+DEFAULT_CAPACITY = 40
+#: Shopify drains the bucket at 1/20th of its size every second (e.g. 40 => 2/s,
+#: 80 => 4/s for Shopify Plus).
+LEAK_RATE_DIVISOR = 20
+
+logger = getLogger(f"{__identifier__}.ratelimit")
+
+
+def parse_call_limit(value: Optional[str]) -> Optional[tuple[int, int]]:
+    """Parse the value of the ``X-Shopify-Shop-Api-Call-Limit`` header.
+
+    Args:
+        value: The header value (e.g. ``32/40``)
+
+    Returns:
+        A tuple of the number of used and total calls, or ``None`` if ``value`` is
+        missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        used, capacity = value.split("/", 1)
+        return int(used), int(capacity)
+    except ValueError:
+        return None
+
+
+class LeakyBucket:
+    """Local estimate of Shopify's leaky bucket for a single shop.
+
+    Every request reserves a slot in the bucket before it is sent. When the bucket is
+    (estimated to be) full the reservation returns how long the caller must wait for
+    enough of the bucket to drain. Because reservations are made in order, waiting
+    callers are released in the order they arrived.
+
+    The estimate is corrected with the fill reported by Shopify on every response.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int = DEFAULT_CAPACITY,
+        leak_rate: Optional[float] = None,
+        headroom: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize a new LeakyBucket.
+
+        Args:
+            capacity: The size of the bucket. This is updated from Shopify's
+                responses.
+            leak_rate: Requests drained per second. *Default is derived from the
+                bucket's capacity.*
+            headroom: Number of slots to leave free for requests made by other
+                clients of the shop.
+            clock: A monotonic clock returning seconds.
+        """
+        self.capacity = capacity
+        self._leak_rate = leak_rate
+        self.headroom = headroom
+        self._clock = clock
+
+        #: estimated fill of the bucket, including reserved requests
+        self._level = 0.0
+        #: requests which have reserved a slot but not yet received a response
+        self._in_flight = 0
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def leak_rate(self) -> float:
+        """Number of requests drained from the bucket per second."""
+        if self._leak_rate is not None:
+            return self._leak_rate
+        return self.capacity / LEAK_RATE_DIVISOR
+
+    @property
+    def level(self) -> float:
+        """The current estimated fill of the bucket."""
+        with self._lock:
+            self._leak()
+            return self._level
+
+    def _leak(self):
+        now = self._clock()
+        self._level = max(0.0, self._level - (now - self._updated_at) * self.leak_rate)
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """Reserve a slot in the bucket for a request.
+
+        Every reservation must be followed by a call to :meth:`record_response` or
+        :meth:`release`.
+
+        Returns:
+            The number of seconds to wait before sending the request.
+        """
+        with self._lock:
+            self._leak()
+            self._level += 1
+            self._in_flight += 1
+            limit = max(1, self.capacity - self.headroom)
+            return max(0.0, (self._level - limit) / self.leak_rate)
+
+    async def acquire(self) -> float:
+        """Wait until a request may be sent without exceeding the limit.
+
+        Returns:
+            The number of seconds waited.
+        """
+        delay = self.reserve()
+        if delay > 0:
+            logger.debug("Rate limit reached. Waiting %.2fs.", delay)
+            await asyncio.sleep(delay)
+        return delay
+
+    def acquire_sync(self) -> float:
+        """Block until a request may be sent without exceeding the limit.
+
+        Returns:
+            The number of seconds waited.
+        """
+        delay = self.reserve()
+        if delay > 0:
+            logger.debug("Rate limit reached. Waiting %.2fs.", delay)
+            time.sleep(delay)
+        return delay
+
+    def record_response(self, call_limit: Optional[str]):
+        """Update the bucket from the ``X-Shopify-Shop-Api-Call-Limit`` header.
+
+        Args:
+            call_limit: The header's value. ``None`` if the response didn't include
+                it.
+        """
+        parsed = parse_call_limit(call_limit)
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if parsed is None:
+                return
+            used, self.capacity = parsed
+            self._leak()
+            # Shopify's count is authoritative but doesn't yet include requests still
+            # in flight.
+            self._level = float(used + self._in_flight)
+
+    def release(self):
+        """Release a reservation for a request which received no response."""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+
+
+class RateLimiter:
+    """Keeps a :class:`LeakyBucket` per shop."""
+
+    def __init__(self, *, headroom: int = 1):
+        """Initialize a new RateLimiter.
+
+        Args:
+            headroom: Number of slots to leave free in each shop's bucket.
+        """
+        self.headroom = headroom
+        self._buckets: dict[str, LeakyBucket] = {}
+        self._lock = threading.Lock()
+
+    def get_bucket(self, myshopify_domain: str) -> LeakyBucket:
+        """Return the bucket for ``myshopify_domain``."""
+        try:
+            return self._buckets[myshopify_domain]
+        except KeyError:
+            with self._lock:
+                return self._buckets.setdefault(
+                    myshopify_domain, LeakyBucket(headroom=self.headroom)
+                )
+
+
+#: Rate limiter shared by all requests made in this process.
+rate_limiter = RateLimiter()
+
+#: Default GraphQL bucket size (points) for a standard shop.
+DEFAULT_COST_CAPACITY = 1000
+#: Default number of GraphQL points restored every second for a standard shop.
+DEFAULT_RESTORE_RATE = 50.0
+
+
+class CostBucket:
+    """Local estimate of the GraphQL Admin API's query cost budget for a single shop.
+
+    Each query reserves its estimated cost before it is sent. When the budget is
+    (estimated to be) exhausted the reservation returns how long the caller must wait
+    for enough points to be restored. Waiting callers are released in the order they
+    arrived.
+
+    The estimate is corrected with the ``throttleStatus`` reported by Shopify on every
+    response.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: float = DEFAULT_COST_CAPACITY,
+        restore_rate: float = DEFAULT_RESTORE_RATE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize a new CostBucket.
+
+        Args:
+            capacity: The maximum number of available points. This is updated from
+                Shopify's responses.
+            restore_rate: Points restored per second. This is updated from Shopify's
+                responses.
+            clock: A monotonic clock returning seconds.
+        """
+        self.capacity = capacity
+        self.restore_rate = restore_rate
+        self._clock = clock
+
+        #: estimated available points, less the cost of reserved queries
+        self._available = float(capacity)
+        #: total estimated cost of queries which haven't received a response
+        self._in_flight_cost = 0.0
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> float:
+        """The current estimated number of available points."""
+        with self._lock:
+            self._restore()
+            return self._available
+
+    def _restore(self):
+        now = self._clock()
+        self._available = min(
+            self.capacity,
+            self._available + (now - self._updated_at) * self.restore_rate,
+        )
+        self._updated_at = now
+
+    def reserve(self, cost: float) -> float:
+        """Reserve ``cost`` points for a query.
+
+        Every reservation must be followed by a call to
+        :meth:`record_throttle_status` or :meth:`release` with the same cost.
+
+        Returns:
+            The number of seconds to wait before sending the query.
+        """
+        cost = min(cost, self.capacity)
+        with self._lock:
+            self._restore()
+            self._available -= cost
+            self._in_flight_cost += cost
+            return max(0.0, -self._available / self.restore_rate)
+
+    async def acquire(self, cost: float):
+        """Wait until a query costing ``cost`` may be sent without being throttled."""
+        delay = self.reserve(cost)
+        if delay > 0:
+            logger.debug("Query cost limit reached. Waiting %.2fs.", delay)
+            await asyncio.sleep(delay)
+
+    def record_throttle_status(
+        self, cost: float, throttle_status: Optional[dict[str, float]]
+    ):
+        """Update the bucket from a response's ``extensions.cost.throttleStatus``.
+
+        Args:
+            cost: The cost reserved for the query.
+            throttle_status: The reported status. ``None`` if the response didn't
+                include it.
+        """
+        cost = min(cost, self.capacity)
+        with self._lock:
+            self._in_flight_cost = max(0.0, self._in_flight_cost - cost)
+            if not throttle_status:
+                return
+            try:
+                capacity = float(throttle_status["maximumAvailable"])
+                available = float(throttle_status["currentlyAvailable"])
+                restore_rate = float(throttle_status["restoreRate"])
+            except (KeyError, TypeError, ValueError):
+                return
+
+            self.capacity, self.restore_rate = capacity, restore_rate
+            self._updated_at = self._clock()
+            # Shopify's count is authoritative but doesn't yet include queries still
+            # in flight.
+            self._available = available - self._in_flight_cost
+
+    def release(self, cost: float):
+        """Release a reservation for a query which received no response."""
+        cost = min(cost, self.capacity)
+        with self._lock:
+            self._in_flight_cost = max(0.0, self._in_flight_cost - cost)
+            self._available = min(self.capacity, self._available + cost)
+
+
+class CostRateLimiter:
+    """Keeps a :class:`CostBucket` per shop."""
+
+    def __init__(self) -> None:
+        self._buckets: dict[str, CostBucket] = {}
+        self._lock = threading.Lock()
+
+    def get_bucket(self, myshopify_domain: str) -> CostBucket:
+        """Return the bucket for ``myshopify_domain``."""
+        try:
+            return self._buckets[myshopify_domain]
+        except KeyError:
+            with self._lock:
+                return self._buckets.setdefault(myshopify_domain, CostBucket())
+
+
+#: GraphQL rate limiter shared by all queries made in this process.
+cost_rate_limiter = CostRateLimiter()
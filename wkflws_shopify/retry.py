@@ -0,0 +1,178 @@
+"""Retry policies for requests to the Shopify Admin API.
+
+A :class:`RetryPolicy` decides whether a failed request is retried and how long to
+wait before retrying. Delays use exponential backoff with full jitter so concurrent
+workers don't retry in lockstep, Shopify's ``Retry-After`` header is honored, and the
+total time spent on a single call is bounded by a deadline.
+"""
+
+from dataclasses import asdict, dataclass
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+
+@dataclass
+class RetryStats:
+    """Counters describing the retries made under a policy."""
+
+    #: number of calls made under the policy
+    calls: int = 0
+    #: number of retries made
+    retries: int = 0
+    #: number of retries which waited for the time in the ``Retry-After`` header
+    retry_after_honored: int = 0
+    #: number of calls which failed because the maximum retries were exceeded
+    retries_exhausted: int = 0
+    #: number of calls which failed because retrying would exceed the deadline
+    deadlines_exceeded: int = 0
+    #: total number of seconds spent waiting before retrying
+    backoff_seconds: float = 0.0
+
+    def asdict(self) -> dict[str, float]:
+        """Create a dictionary representation of this object."""
+        return asdict(self)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse the value of a ``Retry-After`` header.
+
+    Args:
+        value: Either a number of seconds (Shopify sends e.g. ``2.0``) or an HTTP
+            date.
+
+    Returns:
+        The number of seconds to wait or ``None`` if ``value`` is missing or
+        malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    import email.utils
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Decide when and how long to wait before retrying a failed request."""
+
+    def __init__(
+        self,
+        *,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        deadline: Optional[float] = 30.0,
+        jitter: bool = True,
+        retry_statuses: frozenset[int] = frozenset((429, 500, 502, 503, 504)),
+        rng: Callable[[], float] = random.random,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize a new RetryPolicy.
+
+        Args:
+            max_retries: Maximum number of retries for a single call.
+            base_delay: The delay (in seconds) before the first retry. This is doubled
+                for each following retry.
+            max_delay: The maximum delay (in seconds) between retries when no
+                ``Retry-After`` header was provided.
+            deadline: The maximum number of seconds a single call may take including
+                retries. ``None`` disables the deadline.
+            jitter: Wait a random time between 0 and the backoff delay ("full
+                jitter") instead of the full delay.
+            retry_statuses: HTTP status codes which are retried.
+            rng: Returns a random number in [0, 1).
+            clock: A monotonic clock returning seconds.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.jitter = jitter
+        self.retry_statuses = retry_statuses
+        self._rng = rng
+        self._clock = clock
+
+        self.stats = RetryStats()
+        self._lock = threading.Lock()
+
+    def should_retry(self, status_code: Optional[int]) -> bool:
+        """Return whether a response with ``status_code`` may be retried."""
+        return status_code in self.retry_statuses or (
+            status_code is not None and 500 <= status_code < 600
+        )
+
+    def backoff(self, retry_count: int) -> float:
+        """Return the delay before retry number ``retry_count`` (starting at 1)."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (retry_count - 1))
+        return delay * self._rng() if self.jitter else delay
+
+    def start(self, max_retries: Optional[int] = None) -> "RetryState":
+        """Start tracking the retries of a new call.
+
+        Args:
+            max_retries: Override the policy's maximum number of retries for this
+                call.
+        """
+        with self._lock:
+            self.stats.calls += 1
+        return RetryState(
+            self,
+            max_retries=self.max_retries if max_retries is None else max_retries,
+        )
+
+    def _record(self, **increments: float):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self.stats, name, getattr(self.stats, name) + value)
+
+
+class RetryState:
+    """Track the retries of a single call. Create with :meth:`RetryPolicy.start`."""
+
+    def __init__(self, policy: RetryPolicy, *, max_retries: int):
+        self.policy = policy
+        self.max_retries = max_retries
+        self.retry_count = 0
+        self.started_at = policy._clock()
+
+    def next_delay(self, retry_after: Optional[str] = None) -> Optional[float]:
+        """Return how long to wait before retrying or ``None`` to give up.
+
+        Args:
+            retry_after: The value of the failed response's ``Retry-After`` header.
+        """
+        policy = self.policy
+        self.retry_count += 1
+        if self.retry_count > self.max_retries:
+            policy._record(retries_exhausted=1)
+            return None
+
+        delay = parse_retry_after(retry_after)
+        honored = delay is not None
+        if delay is None:
+            delay = policy.backoff(self.retry_count)
+
+        if policy.deadline is not None:
+            elapsed = policy._clock() - self.started_at
+            if elapsed + delay > policy.deadline:
+                policy._record(deadlines_exceeded=1)
+                return None
+
+        policy._record(
+            retries=1, backoff_seconds=delay, retry_after_honored=int(honored)
+        )
+        return delay
+
+
+#: Retry policy used when one isn't provided.
+default_retry_policy = RetryPolicy()
@@ -0,0 +1,55 @@
+"""Orders exported by the GraphQL Admin API's bulk operations.
+
+The GraphQL API returns ``null`` for fields the REST Admin API always includes (e.g.
+the SKU and variant of custom line items and deleted variants, or the email and
+addresses of point of sale orders) and doesn't have some REST fields at all (e.g.
+``token``). These models relax the REST models accordingly so they are only used for
+bulk exports. See :mod:`wkflws_shopify.bulk`.
+"""
+
+from decimal import Decimal
+from typing import Optional
+
+from .customer import Address
+from .orders import LineItem, Order
+
+
+class BulkAddress(Address):
+    """Represent a mailing address of a bulk exported order."""
+
+    address1: Optional[str] = None  # type: ignore[assignment]
+    address2: Optional[str] = None  # type: ignore[assignment]
+    city: Optional[str] = None  # type: ignore[assignment]
+    province: Optional[str] = None  # type: ignore[assignment]
+    province_code: Optional[str] = None  # type: ignore[assignment]
+    zip: Optional[str] = None  # type: ignore[assignment]
+    country: Optional[str] = None  # type: ignore[assignment]
+    country_code: Optional[str] = None  # type: ignore[assignment]
+
+
+class BulkLineItem(LineItem):
+    """Represent a line item of a bulk exported order."""
+
+    #: None for custom line items and items without a SKU.
+    sku: Optional[str] = None  # type: ignore[assignment]
+    #: None for custom line items and deleted variants.
+    variant_id: Optional[int] = None  # type: ignore[assignment]
+    variant_title: Optional[str] = None  # type: ignore[assignment]
+    vendor: Optional[str] = None  # type: ignore[assignment]
+
+
+class BulkOrder(Order):
+    """Represent an order exported by a bulk operation."""
+
+    billing_address: Optional[BulkAddress] = None  # type: ignore[assignment]
+    email: Optional[str] = None  # type: ignore[assignment]
+    line_items: list[BulkLineItem] = []  # type: ignore[assignment]
+    shipping_address: Optional[BulkAddress] = None  # type: ignore[assignment]
+    total_weight: Optional[int] = None  # type: ignore[assignment]
+    # Not available from the GraphQL Admin API.
+    cart_token: Optional[str] = None  # type: ignore[assignment]
+    checkout_token: Optional[str] = None  # type: ignore[assignment]
+    number: Optional[int] = None  # type: ignore[assignment]
+    order_number: Optional[int] = None  # type: ignore[assignment]
+    token: Optional[str] = None  # type: ignore[assignment]
+    total_line_items_price: Optional[Decimal] = None  # type: ignore[assignment]
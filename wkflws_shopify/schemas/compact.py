@@ -0,0 +1,280 @@
+"""Memory-lean representation of orders with many line items.
+
+An :class:`~wkflws_shopify.schemas.orders.Order` allocates a model per line item and
+tax line and a ``Decimal`` per amount. That adds up when a batch job holds thousands
+of wholesale orders with hundreds of line items each. :class:`CompactOrder` keeps the
+order's own fields like :func:`~wkflws_shopify.schemas.trusted.trusted_dict` and stores
+its line items in a :class:`Table`: one column per field, with integers and booleans
+packed into :mod:`array` s and repeated strings (prices, vendors, titles) shared.
+
+:meth:`CompactOrder.asdict` returns the same fields as
+``Order(**data).dict(by_alias=True)`` and encodes to the same JSON for values in
+Shopify's usual format. Like :func:`~wkflws_shopify.schemas.trusted.trusted_dict`,
+values are only checked against the column they are stored in (e.g. a line item's
+``quantity`` must be an integer), so only use this for payloads received from Shopify.
+
+Usage:
+
+.. code::python
+   async for order in export_orders(
+       logger,
+       myshopify_domain="heyhorse.myshopify.com",
+       api_token=token,
+       parse=parse_compact_order,
+   ):
+       for line_item in order.line_items:
+           ...
+"""
+
+from array import array
+from functools import lru_cache
+from itertools import islice
+import sys
+from typing import Any, Iterable, Iterator, NamedTuple, Optional, Type
+
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON
+
+from .orders import Order
+from .trusted import trusted_dict
+from .. import serialization
+
+
+class _Column(NamedTuple):
+    alias: str
+    default: Any
+    #: ``int`` and ``bool`` columns are packed into arrays, ``table`` columns are a
+    #: nested table of rows and everything else is stored in a list.
+    kind: str
+    submodel: Optional[Type[BaseModel]]
+
+
+class Table:
+    """Rows of a model's fields stored column by column."""
+
+    __slots__ = ("model", "_columns", "_values", "_offsets", "_size")
+
+    def __init__(self, model: Type[BaseModel]):
+        """Initialize a new empty Table.
+
+        Args:
+            model: The model describing each row.
+        """
+        self.model = model
+        self._columns = _layout(model)
+        self._values: list[Any] = []
+        # Rows of a nested table belonging to each row are
+        # ``offsets[i]:offsets[i + 1]``.
+        self._offsets: list[Optional[array]] = []
+        for column in self._columns:
+            if column.kind == "int":
+                self._values.append(array("q"))
+            elif column.kind == "bool":
+                self._values.append(array("b"))
+            elif column.kind == "table":
+                self._values.append(Table(column.submodel))  # type: ignore[arg-type]
+            else:
+                self._values.append([])
+            self._offsets.append(array("q", [0]) if column.kind == "table" else None)
+        self._size = 0
+
+    @classmethod
+    def from_rows(cls, model: Type[BaseModel], rows: list[dict[str, Any]]) -> "Table":
+        """Create a table of ``rows`` described by ``model``."""
+        table = cls(model)
+        table.extend(rows)
+        return table
+
+    def extend(self, rows: list[dict[str, Any]]):
+        """Add ``rows`` to the end of the table.
+
+        Raises:
+            ValueError: A value can't be stored in its column.
+        """
+        # Filling one column at a time is much faster than one row at a time.
+        try:
+            for column, values, offsets in zip(
+                self._columns, self._values, self._offsets
+            ):
+                column_values = [row.get(column.alias, column.default) for row in rows]
+                if offsets is not None:
+                    total = offsets[-1]
+                    for nested_rows in column_values:
+                        total += len(nested_rows or ())
+                        offsets.append(total)
+                    values.extend([r for rows_ in column_values for r in rows_ or ()])
+                elif column.kind in ("int", "bool"):
+                    try:
+                        values.extend(column_values)
+                    except TypeError:
+                        raise ValueError(
+                            f"{self.model.__name__}.{column.alias}: expected "
+                            f"{column.kind} values"
+                        ) from None
+                elif column.submodel is not None:
+                    values.extend(
+                        trusted_dict(column.submodel, v) if isinstance(v, dict) else v
+                        for v in column_values
+                    )
+                else:
+                    values.extend(
+                        sys.intern(v) if type(v) is str else v for v in column_values
+                    )
+        except BaseException:
+            # Leave the table as it was before.
+            self._truncate(self._size)
+            raise
+        self._size += len(rows)
+
+    def _truncate(self, size: int):
+        """Remove the rows after the first ``size`` rows."""
+        for values, offsets in zip(self._values, self._offsets):
+            if offsets is not None:
+                values._truncate(offsets[size])
+                del offsets[size + 1 :]  # noqa: E203 # black formatting
+            else:
+                del values[size:]
+        self._size = min(self._size, size)
+
+    def append(self, row: dict[str, Any]):
+        """Add ``row`` to the end of the table. See :meth:`extend`."""
+        self.extend([row])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int) -> dict[str, Any]:
+        """Return the row at ``index`` keyed by the fields' aliases."""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("table index out of range")
+        return self._rows(index, index + 1)[0]
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        """Yield each row keyed by the fields' aliases."""
+        return iter(self._rows(0, self._size))
+
+    def _rows(self, start: int, stop: int) -> list[dict[str, Any]]:
+        """Return the rows ``start:stop``."""
+        columns: list[Iterable[Any]] = []
+        for column, values, offsets in zip(self._columns, self._values, self._offsets):
+            if offsets is not None:
+                nested = iter(values._rows(offsets[start], offsets[stop]))
+                columns.append(
+                    [
+                        list(islice(nested, offsets[i + 1] - offsets[i]))
+                        for i in range(start, stop)
+                    ]
+                )
+            elif column.kind == "bool":
+                columns.append(map(bool, values[start:stop]))
+            else:
+                columns.append(values[start:stop])
+        aliases = [column.alias for column in self._columns]
+        return [dict(zip(aliases, row)) for row in zip(*columns)]
+
+    def column(self, alias: str) -> Any:
+        """Return every value of the field ``alias`` (e.g. ``quantity``).
+
+        Integers and booleans are returned as an :class:`array.array`. This is useful
+        for aggregating (e.g. ``sum(order.line_items.column("quantity"))``) without
+        creating each row.
+        """
+        for column, values in zip(self._columns, self._values):
+            if column.alias == alias:
+                return values
+        raise KeyError(alias)
+
+
+class CompactOrder:
+    """An order with its line items stored in a :class:`Table`."""
+
+    __slots__ = ("fields", "line_items")
+
+    def __init__(self, fields: dict[str, Any], line_items: Table):
+        """Initialize a new CompactOrder. See :meth:`from_dict`.
+
+        Args:
+            fields: The order's fields (except ``line_items``) keyed by their alias.
+            line_items: The order's line items.
+        """
+        #: the order's fields (except ``line_items``) keyed by their alias
+        self.fields = fields
+        #: the order's line items
+        self.line_items = line_items
+
+    @classmethod
+    def from_dict(
+        cls, data: dict[str, Any], *, model: Type[Order] = Order
+    ) -> "CompactOrder":
+        """Create a compact order from an order received from Shopify.
+
+        Args:
+            data: The order.
+            model: The model describing the order (e.g.
+                :class:`~wkflws_shopify.schemas.bulk.BulkOrder`). *Default is*
+                :class:`~wkflws_shopify.schemas.orders.Order`.
+        """
+        fields = trusted_dict(model, {**data, "line_items": []})
+        del fields["line_items"]
+        return cls(
+            fields,
+            Table.from_rows(
+                model.__fields__["line_items"].type_,
+                data.get("line_items", None) or [],
+            ),
+        )
+
+    @property
+    def api_id(self) -> int:
+        """The id of the order used by the API."""
+        return self.fields["id"]
+
+    def __getitem__(self, alias: str) -> Any:
+        """Return the order's field ``alias`` (e.g. ``total_price``)."""
+        if alias == "line_items":
+            return list(self.line_items)
+        return self.fields[alias]
+
+    def asdict(self) -> dict[str, Any]:
+        """Return the same fields as ``Order(**data).dict(by_alias=True)``."""
+        output = {}
+        for alias, value in self.fields.items():
+            output[alias] = value
+            if alias == _LINE_ITEMS_AFTER:
+                output["line_items"] = list(self.line_items)
+        return output
+
+    def dumps(self) -> bytes:
+        """Serialize the order to JSON. See :mod:`wkflws_shopify.serialization`."""
+        return serialization.dumps(self.asdict())
+
+
+def _field_before_line_items() -> str:
+    aliases = [field.alias for field in Order.__fields__.values()]
+    return aliases[aliases.index("line_items") - 1]
+
+
+#: The order's output places ``line_items`` after this field.
+_LINE_ITEMS_AFTER = _field_before_line_items()
+
+
+@lru_cache(maxsize=32)
+def _layout(model: Type[BaseModel]) -> tuple[_Column, ...]:
+    """Return how each field of ``model`` is stored."""
+    columns = []
+    for field in model.__fields__.values():
+        submodel = (
+            field.type_
+            if isinstance(field.type_, type) and issubclass(field.type_, BaseModel)
+            else None
+        )
+        if submodel is not None and field.shape == SHAPE_LIST:
+            kind = "table"
+        elif field.shape == SHAPE_SINGLETON and not field.allow_none:
+            kind = {int: "int", bool: "bool"}.get(field.type_, "object")
+        else:
+            kind = "object"
+        columns.append(_Column(field.alias, field.get_default(), kind, submodel))
+    return tuple(columns)
@@ -0,0 +1,53 @@
+"""Create models containing a subset of another model's fields.
+
+Validating a full Shopify object is wasted work when only a few of its fields are
+needed. :func:`project` returns a model with only the requested fields. Field types,
+defaults and aliases are copied from the original model.
+"""
+
+from functools import lru_cache
+from typing import Iterable, Type
+
+from pydantic import BaseModel, create_model
+
+
+def field_names(model: Type[BaseModel]) -> set[str]:
+    """Return the names (aliases) of the fields of ``model`` as used by Shopify."""
+    return {f.alias for f in model.__fields__.values()}
+
+
+def project(model: Type[BaseModel], fields: Iterable[str]) -> Type[BaseModel]:
+    """Return a model with only ``fields`` of ``model``.
+
+    Args:
+        model: The model to project.
+        fields: Names of the fields to include as used by Shopify (i.e. the field's
+            alias).
+
+    Raises:
+        ValueError: A field isn't defined by ``model``.
+    """
+    return _project(model, tuple(sorted(set(fields))))
+
+
+@lru_cache(maxsize=128)
+def _project(model: Type[BaseModel], fields: tuple[str, ...]) -> Type[BaseModel]:
+    unknown = set(fields) - field_names(model)
+    if unknown:
+        raise ValueError(
+            f"Unknown {model.__name__} fields: {', '.join(sorted(unknown))}"
+        )
+
+    # Fields are kept in the original model's order so output is consistent.
+    definitions = {
+        field.name: (field.annotation, field.field_info)
+        for field in model.__fields__.values()
+        if field.alias in fields
+    }
+
+    return create_model(  # type: ignore[call-overload]
+        f"{model.__name__}Projection",
+        __config__=model.__config__,
+        __module__=model.__module__,
+        **definitions,
+    )
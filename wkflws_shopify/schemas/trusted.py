@@ -0,0 +1,57 @@
+"""Build a model's output from a trusted payload without validating it.
+
+Validating a payload received straight from Shopify only to dump it again with
+``.dict(by_alias=True)`` is most of the work done by the nodes. :func:`trusted_dict`
+returns the same fields as ``model(**data).dict(by_alias=True)`` (including nested
+models and defaults) but copies Shopify's values as they are. Money and dates remain
+strings, so the JSON output is the same for values in Shopify's usual format.
+
+Types, required fields and constraints aren't checked. Only use this for payloads
+received directly from Shopify.
+"""
+
+from functools import lru_cache
+from typing import Any, Optional, Type
+
+from pydantic import BaseModel
+from pydantic.fields import ModelField
+
+
+def trusted_dict(model: Type[BaseModel], data: dict[str, Any]) -> dict[str, Any]:
+    """Return the fields of ``model`` in ``data`` keyed by their alias.
+
+    Args:
+        model: The model describing ``data``.
+        data: A payload received from Shopify.
+    """
+    output = {}
+    for alias, field, submodel in _plan(model):
+        try:
+            value = data[alias]
+        except KeyError:
+            value = field.get_default()
+        else:
+            if submodel is not None and value is not None:
+                if isinstance(value, list):
+                    value = [trusted_dict(submodel, v) for v in value]
+                elif isinstance(value, dict):
+                    value = trusted_dict(submodel, value)
+        output[alias] = value
+    return output
+
+
+@lru_cache(maxsize=128)
+def _plan(
+    model: Type[BaseModel],
+) -> tuple[tuple[str, ModelField, Optional[Type[BaseModel]]], ...]:
+    """Return the alias, field and nested model (if any) of each field of ``model``."""
+    return tuple(
+        (
+            field.alias,
+            field,
+            field.type_
+            if isinstance(field.type_, type) and issubclass(field.type_, BaseModel)
+            else None,
+        )
+        for field in model.__fields__.values()
+    )
@@ -0,0 +1,63 @@
+"""Orders and customers received by webhook.
+
+Webhooks include resources the REST models expect to be complete without the fields
+only some of them have: point of sale orders have no email, addresses, cart or
+checkout, custom line items have no SKU or variant, and customers created without an
+address have no default address. These models relax the REST models accordingly so
+those webhooks start their trigger instead of failing validation. See
+:mod:`wkflws_shopify.triggers.registry`.
+"""
+
+from typing import Optional
+
+from .customer import Address, Customer
+from .orders import LineItem, Order
+
+
+class WebhookAddress(Address):
+    """Represent a mailing address received by webhook."""
+
+    address1: Optional[str] = None  # type: ignore[assignment]
+    address2: Optional[str] = None  # type: ignore[assignment]
+    city: Optional[str] = None  # type: ignore[assignment]
+    province: Optional[str] = None  # type: ignore[assignment]
+    province_code: Optional[str] = None  # type: ignore[assignment]
+    zip: Optional[str] = None  # type: ignore[assignment]
+    country: Optional[str] = None  # type: ignore[assignment]
+    country_code: Optional[str] = None  # type: ignore[assignment]
+
+
+class WebhookCustomer(Customer):
+    """Represent a customer received by webhook."""
+
+    addresses: list[WebhookAddress] = []  # type: ignore[assignment]
+    #: None for customers without an address.
+    default_address: Optional[WebhookAddress] = None  # type: ignore[assignment]
+    #: None for customers created with only a phone number or a name.
+    email: Optional[str] = None  # type: ignore[assignment]
+    first_name: Optional[str] = None  # type: ignore[assignment]
+    last_name: Optional[str] = None  # type: ignore[assignment]
+
+
+class WebhookLineItem(LineItem):
+    """Represent a line item of an order received by webhook."""
+
+    #: None for custom line items and items without a SKU.
+    sku: Optional[str] = None  # type: ignore[assignment]
+    #: None for custom line items and deleted variants.
+    variant_id: Optional[int] = None  # type: ignore[assignment]
+    variant_title: Optional[str] = None  # type: ignore[assignment]
+    vendor: Optional[str] = None  # type: ignore[assignment]
+
+
+class WebhookOrder(Order):
+    """Represent an order received by webhook."""
+
+    billing_address: Optional[WebhookAddress] = None  # type: ignore[assignment]
+    customer: Optional[WebhookCustomer] = None
+    email: Optional[str] = None  # type: ignore[assignment]
+    line_items: list[WebhookLineItem] = []  # type: ignore[assignment]
+    shipping_address: Optional[WebhookAddress] = None  # type: ignore[assignment]
+    # None for point of sale and draft orders.
+    cart_token: Optional[str] = None  # type: ignore[assignment]
+    checkout_token: Optional[str] = None  # type: ignore[assignment]
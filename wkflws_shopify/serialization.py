@@ -0,0 +1,141 @@
+"""Serialize and deserialize JSON using the fastest available library.
+
+`orjson <https://github.com/ijl/orjson>`_ is used when it is installed, otherwise the
+standard library's :mod:`json` module. Both backends encode values the same way as
+:class:`wkflws_shopify.encoders.ShopifyJSONEncoder` (e.g. ``Decimal`` as a string) and
+produce compact output.
+
+Usage:
+
+.. code::python
+   from wkflws_shopify import serialization
+
+   data = serialization.loads(response.body)
+   body = serialization.dumps(data)  # bytes
+"""
+
+import abc
+import json
+from typing import Any, Optional, Union
+
+from .encoders import encode_default, ShopifyJSONEncoder
+
+
+class JSONBackend(abc.ABC):
+    """Convert between JSON documents and python objects."""
+
+    #: name used to select the backend in settings
+    name: str
+
+    @abc.abstractmethod
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """Deserialize the JSON document ``data``."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def dumps(self, obj: Any) -> bytes:
+        """Serialize ``obj`` to a UTF-8 encoded JSON document."""
+        raise NotImplementedError
+
+
+class StdlibJSONBackend(JSONBackend):
+    """Use the standard library's :mod:`json` module."""
+
+    name = "json"
+
+    def loads(self, data: Union[bytes, str]) -> Any:  # noqa: D102
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:  # noqa: D102
+        return json.dumps(
+            obj, cls=ShopifyJSONEncoder, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+
+
+class OrjsonJSONBackend(JSONBackend):
+    """Use orjson.
+
+    Raises:
+        ImportError: orjson isn't installed.
+    """
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+        # datetimes and dataclasses are passed to ``encode_default`` so the output is
+        # the same as the standard library backend.
+        self._options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        self._options |= orjson.OPT_PASSTHROUGH_DATACLASS
+        self._fallback = StdlibJSONBackend()
+
+    def loads(self, data: Union[bytes, str]) -> Any:  # noqa: D102
+        return self._orjson.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:  # noqa: D102
+        try:
+            return self._orjson.dumps(obj, default=encode_default, option=self._options)
+        except TypeError:
+            # orjson doesn't support some values the standard library does (e.g.
+            # integers larger than 64 bits).
+            return self._fallback.dumps(obj)
+
+
+#: The available backends mapped to their name.
+BACKENDS = {
+    StdlibJSONBackend.name: StdlibJSONBackend,
+    OrjsonJSONBackend.name: OrjsonJSONBackend,
+}
+
+_backend: Optional[JSONBackend] = None
+
+
+def get_backend() -> JSONBackend:
+    """Return the backend configured in settings.
+
+    If no backend is configured orjson is used when it is installed.
+
+    Raises:
+        ValueError: The configured backend is unknown.
+    """
+    global _backend
+    if _backend is None:
+        # Settings are loaded on first use so the worker can import this module
+        # without importing pydantic.
+        from .conf import settings
+
+        name = settings.JSON_BACKEND
+        if name is None:
+            try:
+                _backend = OrjsonJSONBackend()
+            except ImportError:
+                _backend = StdlibJSONBackend()
+        else:
+            try:
+                _backend = BACKENDS[name]()
+            except KeyError:
+                raise ValueError(f"Unknown JSON backend {name!r}") from None
+    return _backend
+
+
+def set_backend(backend: Optional[JSONBackend]):
+    """Replace the backend.
+
+    Args:
+        backend: The new backend. ``None`` resets the backend to the one configured in
+            settings.
+    """
+    global _backend
+    _backend = backend
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Deserialize the JSON document ``data`` using the configured backend."""
+    return get_backend().loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize ``obj`` to UTF-8 encoded JSON using the configured backend."""
+    return get_backend().dumps(obj)
@@ -0,0 +1,191 @@
+from datetime import datetime
+from logging import getLogger
+from typing import Any, Optional
+import urllib.parse
+
+from pydantic import BaseModel, conint, ValidationError
+
+from .. import __identifier__, profiling
+from ..checkpoints import Checkpoint, get_checkpoint_store
+from ..http import HttpError
+from ..mirror import get_order_mirror
+from ..pagination import paginate_pages
+from ..schemas.orders import Order
+from ..schemas.trusted import trusted_dict
+
+#: Maximum number of orders Shopify returns for a single request.
+MAX_ORDERS_PER_REQUEST = 250
+
+
+class ParameterSchema(BaseModel):
+    """Represent the possible Parameters that can be passed to the node."""
+
+    #: name of the checkpoint. Each name syncs the shop's orders independently (e.g.
+    #: one per downstream system).
+    checkpoint: str = "default"
+    #: sync orders updated since this time when there's no checkpoint yet. *Default
+    #: is every order.*
+    since: Optional[datetime] = None
+    #: maximum number of orders output by one execution. The next execution continues
+    #: where this one stopped.
+    max_orders: conint(ge=1) = 1000  # type: ignore # constrained type
+    #: skip validating the orders received from Shopify. Shopify's values are output
+    #: unchanged.
+    trusted: bool = False
+
+
+class ContextSchema(BaseModel):
+    """Represent the required context variables."""
+
+    #: the FQDN of the store front. e.g. heyhorse.myshopify.com
+    myshopify_domain: str
+    #: the authentication token to access the order api via REST
+    shopify_token: str
+
+
+def _orders_path(updated_at_min: Optional[datetime], limit: int) -> str:
+    """Return the API path listing orders updated since ``updated_at_min``."""
+    query = {
+        # without this only open orders are returned.
+        "status": "any",
+        # the checkpoint can only advance if older changes are received first.
+        "order": "updated_at asc",
+        "limit": limit,
+    }
+    if updated_at_min is not None:
+        query["updated_at_min"] = updated_at_min.isoformat()
+    return f"/orders.json?{urllib.parse.urlencode(query)}"
+
+
+@profiling.profile_node("sync_orders")
+async def sync_orders(
+    message: dict[str, Any],
+    _context: dict[str, Any],
+) -> dict[str, Any]:
+    """Retrieve the orders created or updated since the previous execution.
+
+    Orders are requested in ``updated_at`` order starting from the shop's checkpoint.
+    Once every order of the execution was retrieved the new checkpoint is saved as
+    pending. It's only used by the next execution after :func:`commit_checkpoint` is
+    called with this output, once it was delivered, so an execution which fails (or
+    whose output is lost) part way outputs the same orders again the next time. The
+    orders are also stored in the order mirror when it's enabled.
+    """
+    logger = getLogger(f"{__identifier__}.sync_orders")
+    try:
+        parameters = ParameterSchema(**message)
+    except ValidationError:
+        raise
+
+    try:
+        context = ContextSchema(**_context)
+    except ValidationError:
+        raise
+
+    store = get_checkpoint_store()
+    checkpoint = store.get(context.myshopify_domain, parameters.checkpoint)
+    if checkpoint is None:
+        last_updated_at = parameters.since
+        last_order_ids: list[int] = []
+    else:
+        last_updated_at = checkpoint.updated_at
+        last_order_ids = list(checkpoint.order_ids)
+    # Shopify's updated_at_min is inclusive. These were output by the last execution.
+    skip_ids = set(last_order_ids)
+    skip_updated_at = last_updated_at
+
+    orders: list[dict[str, Any]] = []
+    received: list[dict[str, Any]] = []
+    has_more = False
+    pages = paginate_pages(
+        logger,
+        myshopify_domain=context.myshopify_domain,
+        api_path=_orders_path(
+            last_updated_at, min(parameters.max_orders, MAX_ORDERS_PER_REQUEST)
+        ),
+        api_token=context.shopify_token,
+        key="orders",
+    )
+    try:
+        async for page in pages:
+            for data in page:
+                updated_at = datetime.fromisoformat(data["updated_at"])
+                if updated_at == skip_updated_at and data["id"] in skip_ids:
+                    continue
+
+                received.append(data)
+                if parameters.trusted:
+                    with profiling.phase(profiling.VALIDATION):
+                        orders.append(trusted_dict(Order, data))
+                else:
+                    with profiling.phase(profiling.VALIDATION):
+                        order = Order(**data)
+                    with profiling.phase(profiling.SERIALIZATION):
+                        orders.append(order.dict(by_alias=True))
+
+                if updated_at != last_updated_at:
+                    last_updated_at = updated_at
+                    last_order_ids = []
+                last_order_ids.append(data["id"])
+
+                if len(orders) == parameters.max_orders:
+                    # The rest is output by the next execution.
+                    has_more = True
+                    break
+
+            if has_more:
+                break
+    except HttpError:
+        raise
+    finally:
+        await pages.aclose()
+
+    mirror = get_order_mirror()
+    if mirror is not None and received:
+        mirror.add_orders(context.myshopify_domain, received)
+
+    token = None
+    if orders and last_updated_at is not None:
+        token = store.set_pending(
+            context.myshopify_domain,
+            parameters.checkpoint,
+            Checkpoint(updated_at=last_updated_at, order_ids=last_order_ids),
+            base=checkpoint,
+        )
+
+    # Construct a standard reply
+    return {
+        "orders": orders,
+        "checkpoint": last_updated_at.isoformat() if last_updated_at else None,
+        "checkpoint_token": token,
+        "has_more": has_more,
+    }
+
+
+def commit_checkpoint(
+    _message: dict[str, Any],
+    _context: dict[str, Any],
+    output: dict[str, Any],
+) -> bool:
+    """Commit the checkpoint saved by the :func:`sync_orders` execution of ``output``.
+
+    This is called once the output of :func:`sync_orders` was delivered (e.g. written
+    to stdout by ``python -m wkflws_shopify.sync_orders`` or the worker). The
+    checkpoint isn't committed if another execution committed its checkpoint since
+    this execution started. Its orders are output again by the next execution.
+
+    Returns:
+        Whether the checkpoint was committed.
+    """
+    token = output.get("checkpoint_token", None)
+    if token is None:
+        return False
+
+    committed = get_checkpoint_store().commit(token)
+    if not committed:
+        logger = getLogger(f"{__identifier__}.sync_orders")
+        logger.warning(
+            "Checkpoint %r was moved by a concurrent execution.",
+            output["checkpoint"],
+        )
+    return committed
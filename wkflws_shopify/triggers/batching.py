@@ -0,0 +1,280 @@
+"""Collect webhook events and publish them in batches.
+
+Publishing each webhook's event as it's received puts the event bus in the path of
+every HTTP response. An :class:`EventBatcher` instead queues events, letting the
+listener acknowledge Shopify immediately, and publishes them from a background task
+once ``max_size`` events are queued or the oldest event has waited ``linger`` seconds.
+
+Batches are published one at a time in the order events were submitted so events for
+the same resource are never reordered. The webhooks of a queued event have already been
+acknowledged so Shopify won't redeliver them: events which fail to publish are queued
+again ahead of newer events and retried with an exponential backoff. An event which
+still fails after ``max_attempts`` is dropped so it doesn't hold up the events queued
+after it.
+"""
+
+import asyncio
+from dataclasses import asdict, dataclass, field
+from logging import getLogger
+from typing import Awaitable, Callable, Optional
+
+from wkflws.events import Event
+
+from .. import __identifier__
+
+logger = getLogger(f"{__identifier__}.triggers.batching")
+
+
+@dataclass
+class PublishResult:
+    """The events of a batch which weren't published."""
+
+    #: events which failed to publish
+    failed: list[Event] = field(default_factory=list)
+    #: events which weren't attempted to keep them after a failed event (e.g. events
+    #: about the same resource)
+    skipped: list[Event] = field(default_factory=list)
+
+
+#: Publishes a batch of events in the order provided. ``None`` means every event was
+#: published.
+PublishFunc = Callable[[list[Event]], Awaitable[Optional[PublishResult]]]
+
+
+@dataclass
+class BatchStats:
+    """Counters describing the batches published by a batcher."""
+
+    #: number of events submitted
+    events: int = 0
+    #: number of batches published
+    batches: int = 0
+    #: number of attempts to publish a batch in which some events failed. These events
+    #: are retried.
+    failed_batches: int = 0
+    #: number of events dropped after failing to publish ``max_attempts`` times
+    dropped_events: int = 0
+    #: number of events in the largest batch
+    max_batch_size: int = 0
+
+    def asdict(self) -> dict[str, int]:
+        """Create a dictionary representation of this object."""
+        return asdict(self)
+
+
+class EventBatcher:
+    """Queue events and publish them in batches."""
+
+    def __init__(
+        self,
+        publish: PublishFunc,
+        *,
+        max_size: int,
+        linger: float,
+        retry_delay: float = 0.1,
+        max_retry_delay: float = 30.0,
+        max_attempts: int = 5,
+        on_drop: Optional[Callable[[Event], None]] = None,
+    ):
+        """Initialize a new EventBatcher.
+
+        Args:
+            publish: Publishes a batch of events in the order provided. See
+                :data:`PublishFunc`.
+            max_size: Publish a batch as soon as this many events are queued.
+            linger: The maximum number of seconds an event is queued before its batch
+                is published.
+            retry_delay: Number of seconds before retrying a batch which failed to
+                publish. The delay doubles after each consecutive failure.
+            max_retry_delay: Maximum number of seconds between retries.
+            max_attempts: Number of times an event which ``publish`` reports as
+                failed is attempted before it's dropped. Batches for which ``publish``
+                raises are retried until they're published.
+            on_drop: Called with each dropped event.
+        """
+        self.publish = publish
+        self.max_size = max_size
+        self.linger = linger
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.on_drop = on_drop
+        self.stats = BatchStats()
+
+        self._pending: list[Event] = []
+        #: number of failed attempts of the events being retried keyed by ``id()``
+        self._attempts: dict[int, int] = {}
+        #: number of consecutive failures to publish a batch
+        self._failures = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._has_events: asyncio.Event
+        self._full: asyncio.Event
+        self._lock: asyncio.Lock
+
+    def _check_loop(self):
+        # The flushing task and its primitives are bound to the loop they were
+        # created on.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._has_events = asyncio.Event()
+            self._full = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    def submit(self, event: Event):
+        """Queue ``event`` to be published with the next batch.
+
+        This must be called from a running event loop.
+        """
+        self._check_loop()
+        self._pending.append(event)
+        self.stats.events += 1
+        self._has_events.set()
+        if len(self._pending) >= self.max_size:
+            self._full.set()
+
+    async def _run(self):
+        while True:
+            await self._has_events.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.linger)
+            except asyncio.TimeoutError:
+                pass
+            # Shielded so cancelling the task (see :meth:`flush`) doesn't interrupt a
+            # batch that is being published.
+            published = await asyncio.shield(self._publish_next())
+            if not published:
+                await asyncio.sleep(self._backoff())
+
+    def _backoff(self) -> float:
+        """Return the number of seconds to wait before retrying a failed batch."""
+        return min(self.max_retry_delay, self.retry_delay * 2 ** (self._failures - 1))
+
+    async def _publish_next(self) -> bool:
+        """Publish the next batch returning whether every event was published.
+
+        Events which weren't published are queued again ahead of the events submitted
+        since.
+        """
+        async with self._lock:
+            batch = self._pending[: self.max_size]
+            del self._pending[: self.max_size]
+            # Events submitted while this batch is published set these again.
+            if not self._pending:
+                self._has_events.clear()
+            if len(self._pending) < self.max_size:
+                self._full.clear()
+            if not batch:
+                return True
+
+            try:
+                result = await self.publish(batch)
+            except Exception:
+                # Nothing is known to be published. e.g. the event bus is down.
+                self._failures += 1
+                logger.exception(
+                    "Failed to publish a batch of %s events. Retrying in %.1fs.",
+                    len(batch),
+                    self._backoff(),
+                )
+                self._retry(batch)
+                return False
+
+            if result is not None and (result.failed or result.skipped):
+                self._failures += 1
+                failed = {id(event) for event in result.failed}
+                unpublished = failed | {id(event) for event in result.skipped}
+                retry = []
+                for event in batch:
+                    if id(event) not in unpublished:
+                        self._attempts.pop(id(event), None)
+                        continue
+                    if id(event) in failed:
+                        self._attempts[id(event)] = self._attempts.get(id(event), 0) + 1
+                        if self._attempts[id(event)] >= self.max_attempts:
+                            self._drop(event)
+                            continue
+                    retry.append(event)
+                logger.error(
+                    "Failed to publish %s of %s events. Retrying %s in %.1fs.",
+                    len(unpublished),
+                    len(batch),
+                    len(retry),
+                    self._backoff(),
+                )
+                self._retry(retry)
+                return False
+
+            if self._attempts:
+                for event in batch:
+                    self._attempts.pop(id(event), None)
+
+            self._failures = 0
+            self.stats.batches += 1
+            self.stats.max_batch_size = max(self.stats.max_batch_size, len(batch))
+            return True
+
+    def _retry(self, events: list[Event]):
+        """Queue ``events`` again ahead of the events submitted since."""
+        self.stats.failed_batches += 1
+        self._pending[:0] = events
+        if self._pending:
+            self._has_events.set()
+        if len(self._pending) >= self.max_size:
+            self._full.set()
+
+    def _drop(self, event: Event):
+        """Give up publishing ``event``."""
+        del self._attempts[id(event)]
+        self.stats.dropped_events += 1
+        logger.error(
+            "Dropping event %s after %s failed attempts to publish it",
+            event.identifier,
+            self.max_attempts,
+        )
+        if self.on_drop is not None:
+            try:
+                self.on_drop(event)
+            except Exception:
+                logger.exception("Failed to drop event %s", event.identifier)
+
+    async def flush(self, *, max_retries: int = 3):
+        """Publish every queued event now.
+
+        The flushing task is stopped. It's started again by the next :meth:`submit`.
+
+        Args:
+            max_retries: Number of times a failed batch is retried before giving up.
+                Events which couldn't be published remain queued.
+        """
+        if self._loop is None:
+            return
+
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        retries = 0
+        while self._pending:
+            if await self._publish_next():
+                retries = 0
+                continue
+
+            if retries == max_retries:
+                logger.error(
+                    "Giving up publishing %s queued events", len(self._pending)
+                )
+                break
+            retries += 1
+            await asyncio.sleep(self._backoff())
+        # Wait for a batch the task was publishing when it was cancelled.
+        async with self._lock:
+            pass
@@ -0,0 +1,144 @@
+"""Coalesce bursts of webhooks about the same resource.
+
+Shopify often sends several ``orders/updated`` webhooks for one order within a few
+seconds, and not necessarily in order. An :class:`EventCoalescer` holds the first
+event for a resource for ``window`` seconds. Newer events received in the meantime
+(by the payload's ``updated_at``) replace it, and only the newest is forwarded. Events
+older than the last version forwarded for the resource are dropped.
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from logging import getLogger
+from typing import Any, Awaitable, Callable, Optional
+
+from wkflws.events import Event
+
+from .. import __identifier__
+
+logger = getLogger(f"{__identifier__}.triggers.coalesce")
+
+ForwardFunc = Callable[[Event], Awaitable[None]]
+CoalesceKey = tuple[str, str, Any]
+
+
+@dataclass
+class CoalesceStats:
+    """Counters describing the events handled by a coalescer."""
+
+    #: number of events held
+    received: int = 0
+    #: number of events forwarded
+    forwarded: int = 0
+    #: number of held events replaced by a newer event
+    coalesced: int = 0
+    #: number of events dropped because a newer version was already received
+    stale: int = 0
+
+    def asdict(self) -> dict[str, int]:
+        """Create a dictionary representation of this object."""
+        return asdict(self)
+
+
+def parse_updated_at(event: Event) -> Optional[datetime]:
+    """Return the ``updated_at`` of the event's payload or ``None`` if it's missing."""
+    value = event.data.get("updated_at", None) if isinstance(event.data, dict) else None
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+class EventCoalescer:
+    """Forward only the newest event for a resource received within a window."""
+
+    def __init__(self, forward: ForwardFunc, *, window: float, max_size: int):
+        """Initialize a new EventCoalescer.
+
+        Args:
+            forward: Called with each event which is forwarded.
+            window: Number of seconds the first event for a resource is held.
+            max_size: Maximum number of resources whose last forwarded version is
+                remembered to detect stale events. The least recently forwarded
+                resources are forgotten first.
+        """
+        self.forward = forward
+        self.window = window
+        self.max_size = max_size
+        self.stats = CoalesceStats()
+
+        self._pending: dict[CoalesceKey, tuple[datetime, Event]] = {}
+        self._timers: dict[CoalesceKey, asyncio.TimerHandle] = {}
+        self._latest: OrderedDict[CoalesceKey, datetime] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, key: CoalesceKey, event: Event) -> bool:
+        """Hold ``event`` until the window for ``key`` closes.
+
+        This must be called from a running event loop.
+
+        Args:
+            key: Identifies the resource; the shop, topic and resource id.
+            event: The event. Its payload must contain ``updated_at``.
+
+        Returns:
+            ``True`` if the event is held or dropped. ``False`` if the event has no
+            ``updated_at`` and must be forwarded by the caller.
+        """
+        updated_at = parse_updated_at(event)
+        if updated_at is None:
+            return False
+
+        self.stats.received += 1
+        latest = self._latest.get(key, None)
+        if latest is not None and updated_at <= latest:
+            self.stats.stale += 1
+            return True
+
+        pending = self._pending.get(key, None)
+        if pending is not None:
+            if updated_at <= pending[0]:
+                self.stats.stale += 1
+                return True
+            self.stats.coalesced += 1
+            self._pending[key] = (updated_at, event)
+            return True
+
+        self._pending[key] = (updated_at, event)
+        self._timers[key] = asyncio.get_running_loop().call_later(
+            self.window, self._release, key
+        )
+        return True
+
+    def _release(self, key: CoalesceKey):
+        self._timers.pop(key, None)
+        updated_at, event = self._pending.pop(key)
+
+        self._latest[key] = updated_at
+        self._latest.move_to_end(key)
+        if len(self._latest) > self.max_size:
+            self._latest.popitem(last=False)
+
+        self.stats.forwarded += 1
+        task = asyncio.create_task(self._forward(event))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _forward(self, event: Event):
+        try:
+            await self.forward(event)
+        except Exception:
+            logger.exception("Failed to forward event %s", event.identifier)
+
+    async def flush(self):
+        """Forward every held event now."""
+        for key, timer in list(self._timers.items()):
+            timer.cancel()
+            self._release(key)
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
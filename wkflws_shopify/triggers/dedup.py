@@ -0,0 +1,194 @@
+"""Detect webhooks Shopify has already delivered.
+
+Shopify redelivers a webhook when it doesn't receive a timely 2xx response. Each
+delivery of the same webhook has the same ``x-shopify-webhook-id`` header. The
+listener records each id it receives and acknowledges redeliveries without
+publishing them again.
+"""
+
+import abc
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+import threading
+import time
+from typing import Optional
+
+from ..conf import settings
+
+
+@dataclass
+class DedupStats:
+    """Counters describing the effectiveness of a dedup store."""
+
+    #: number of keys checked
+    checked: int = 0
+    #: number of keys which had already been seen
+    duplicates: int = 0
+
+    def asdict(self) -> dict[str, int]:
+        """Create a dictionary representation of this object."""
+        return asdict(self)
+
+
+class DedupStore(abc.ABC):
+    """Remembers keys for a period of time."""
+
+    def __init__(self, *, window: float):
+        """Initialize a new DedupStore.
+
+        Args:
+            window: Number of seconds a key is remembered.
+        """
+        self.window = window
+        self.stats = DedupStats()
+
+    def seen(self, key: str) -> bool:
+        """Record ``key`` returning whether it was already seen within the window.
+
+        Checking and recording is atomic so concurrent deliveries of the same key
+        are only reported as new once.
+        """
+        duplicate = self._check_and_add(key)
+        self.stats.checked += 1
+        if duplicate:
+            self.stats.duplicates += 1
+        return duplicate
+
+    @abc.abstractmethod
+    def _check_and_add(self, key: str) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def forget(self, key: str):
+        """Remove ``key`` so it's no longer considered seen.
+
+        This should be used when a request could not be processed so that Shopify's
+        redelivery is accepted.
+        """
+        raise NotImplementedError
+
+
+class MemoryDedupStore(DedupStore):
+    """Remembers keys in this process's memory."""
+
+    def __init__(self, *, window: float, max_size: int):
+        """Initialize a new MemoryDedupStore.
+
+        Args:
+            window: Number of seconds a key is remembered.
+            max_size: Maximum number of keys remembered. The oldest keys are
+                forgotten first.
+        """
+        super().__init__(window=window)
+        self.max_size = max_size
+        self._keys: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_and_add(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            # Forget expired keys. Keys are ordered by when they were seen.
+            while self._keys:
+                oldest_key, seen_at = next(iter(self._keys.items()))
+                if now - seen_at < self.window:
+                    break
+                del self._keys[oldest_key]
+
+            if key in self._keys:
+                return True
+
+            self._keys[key] = now
+            if len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+            return False
+
+    def forget(self, key: str):  # noqa: D102
+        with self._lock:
+            self._keys.pop(key, None)
+
+
+class SQLiteDedupStore(DedupStore):
+    """Remembers keys in a SQLite database shared by processes on the same host."""
+
+    def __init__(self, path: str, *, window: float):
+        """Initialize a new SQLiteDedupStore.
+
+        Args:
+            path: Path to the database file. It is created if it doesn't exist.
+            window: Number of seconds a key is remembered.
+        """
+        super().__init__(window=window)
+        import sqlite3  # only imported when the store is used.
+
+        self.path = path
+        self._conn = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS webhooks ("
+                "key TEXT PRIMARY KEY, seen_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS webhooks_seen_at ON webhooks (seen_at)"
+            )
+
+    def _check_and_add(self, key: str) -> bool:
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge > self.window / 10:
+                self._conn.execute(
+                    "DELETE FROM webhooks WHERE seen_at <= ?", (now - self.window,)
+                )
+                self._last_purge = now
+
+            # Insert the key unless it was seen within the window. The statement is
+            # atomic so only one replica can record a new key.
+            cursor = self._conn.execute(
+                "INSERT INTO webhooks (key, seen_at) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET seen_at = excluded.seen_at "
+                "WHERE webhooks.seen_at <= ?",
+                (key, now, now - self.window),
+            )
+            return cursor.rowcount == 0
+
+    def forget(self, key: str):  # noqa: D102
+        with self._lock:
+            self._conn.execute("DELETE FROM webhooks WHERE key = ?", (key,))
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+
+_dedup_store: Optional[DedupStore] = None
+
+
+def get_dedup_store() -> Optional[DedupStore]:
+    """Return the dedup store configured in settings or ``None`` if it's disabled."""
+    global _dedup_store
+    if _dedup_store is None and settings.WEBHOOK_DEDUP_ENABLED:
+        if settings.WEBHOOK_DEDUP_PATH:
+            _dedup_store = SQLiteDedupStore(
+                settings.WEBHOOK_DEDUP_PATH, window=settings.WEBHOOK_DEDUP_WINDOW
+            )
+        else:
+            _dedup_store = MemoryDedupStore(
+                window=settings.WEBHOOK_DEDUP_WINDOW,
+                max_size=settings.WEBHOOK_DEDUP_MAX_SIZE,
+            )
+    return _dedup_store
+
+
+def set_dedup_store(store: Optional[DedupStore]):
+    """Replace the dedup store.
+
+    Args:
+        store: The new store. ``None`` resets the store to the one configured in
+            settings.
+    """
+    global _dedup_store
+    _dedup_store = store
@@ -1,6 +1,12 @@
-"""Define trigger listener for Shopify's subscription_billing_attempt/failed webhook."""
-import json
-from typing import Any, Optional
+"""Define trigger listener for Shopify's webhooks.
+
+Supported topics are declared in :mod:`wkflws_shopify.triggers.registry`.
+"""
+
+import asyncio
+import itertools
+import time
+from typing import Any, Optional, TYPE_CHECKING
 from uuid import uuid4
 
 
@@ -8,10 +14,46 @@ from wkflws.events import Event
 from wkflws.exceptions import WkflwExecutionException
 from wkflws.http import http_method, Request, Response
 from wkflws.logging import getLogger
-from wkflws.triggers.webhook import WebhookTrigger
 
-from . import schemas
-from .. import __identifier__, __version__
+from .batching import EventBatcher, PublishResult
+from .coalesce import EventCoalescer
+from .dedup import get_dedup_store
+from .registry import registry
+from .verify import get_verifier, HMAC_HEADER, SHOP_DOMAIN_HEADER
+from .. import __identifier__, __version__, metrics, profiling, serialization
+from ..cache import get_order_cache
+from ..conf import settings
+from ..mirror import get_order_mirror
+
+if TYPE_CHECKING:  # pragma: no cover
+    from wkflws.triggers.webhook import WebhookTrigger
+
+#: Topics notifying an order has changed mapped to the payload's key containing the
+#: order id.
+ORDER_CHANGED_TOPICS = {
+    "orders/cancelled": "id",
+    "orders/delete": "id",
+    "orders/edited": "id",
+    "orders/fulfilled": "id",
+    "orders/paid": "id",
+    "orders/partially_fulfilled": "id",
+    "orders/updated": "id",
+    "refunds/create": "order_id",
+}
+
+#: Topics whose payload is a complete order stored in the mirror.
+MIRRORED_ORDER_TOPICS = frozenset(
+    (
+        "orders/cancelled",
+        "orders/create",
+        "orders/fulfilled",
+        "orders/paid",
+        "orders/partially_fulfilled",
+        "orders/updated",
+    )
+)
+#: Topics whose payload is a complete customer stored in the mirror.
+MIRRORED_CUSTOMER_TOPICS = frozenset(("customers/create", "customers/update"))
 
 
 async def process_webhook_request(
@@ -19,21 +61,133 @@ async def process_webhook_request(
     response: Response,
 ) -> Optional[Event]:
     """Accept and process a Pandadoc webhook request returning an event."""
+    topic = request.headers.get("x-shopify-topic", None) or "unknown"
+    sink = metrics.get_metrics()
+    started_at = time.perf_counter()
+    try:
+        with profiling.profile(
+            "process_webhook_request",
+            metadata={
+                "topic": topic,
+                "shop": request.headers.get(SHOP_DOMAIN_HEADER, None),
+            },
+        ):
+            return await _process_webhook_request(request, response)
+    finally:
+        if sink is not None:
+            sink.observe(
+                metrics.WEBHOOK_PROCESS_DURATION,
+                time.perf_counter() - started_at,
+                # The topic of a forged request can't be trusted.
+                topic=(
+                    "unknown" if response.status_code == 401 else metric_topic(topic)
+                ),
+                status=str(response.status_code),
+            )
+
+
+async def _process_webhook_request(
+    request: Request,
+    response: Response,
+) -> Optional[Event]:
     # logger = getLogger(f"{__identifier__}.triggers.process_webhook_request")
 
+    # Reject forged requests before doing any other work.
+    verifier = get_verifier()
+    if verifier is not None:
+        with profiling.phase("verify"):
+            verified = verifier.verify(
+                request.headers.get(SHOP_DOMAIN_HEADER, None),
+                request.body.encode("utf-8"),
+                request.headers.get(HMAC_HEADER, None),
+            )
+        if not verified:
+            response.status_code = 401
+            return None
+
+    dedup_store = get_dedup_store()
+
+    # Shopify uses the same webhook id for each delivery attempt. Check it before
+    # parsing the body so redeliveries are acknowledged as cheaply as possible.
+    dedup_key = None
+    webhook_id = request.headers.get("x-shopify-webhook-id", None)
+    if dedup_store is not None and webhook_id:
+        dedup_key = f"webhook:{webhook_id}"
+        with profiling.phase("dedup"):
+            duplicate = dedup_store.seen(dedup_key)
+        if duplicate:
+            response.status_code = 200
+            return None
+
     metadata: dict[str, str] = {}
     metadata.update(request.headers)
 
-    data = json.loads(request.body)
+    try:
+        with profiling.phase(profiling.JSON_DECODE):
+            data = serialization.loads(request.body)
+    except Exception:
+        # Accept the redelivery of a request that couldn't be processed.
+        if dedup_key is not None:
+            dedup_store.forget(dedup_key)  # type: ignore[union-attr]
+        raise
 
     # This is in subscription_billing_attempt/*; maybe others.
-    identifier = str(data.get("idempotency_key", uuid4()))
+    idempotency_key = data.get("idempotency_key", None)
+    if dedup_store is not None and dedup_key is None and idempotency_key:
+        dedup_key = f"idempotency_key:{idempotency_key}"
+        if dedup_store.seen(dedup_key):
+            response.status_code = 200
+            return None
+
+    try:
+        identifier = str(idempotency_key or uuid4())
+        event = Event(identifier, metadata, data)
+
+        coalescer = get_event_coalescer()
+        if coalescer is not None:
+            key = coalesce_key(event)
+            if key is not None and coalescer.submit(key, event):
+                return None
+
+        batcher = get_event_batcher()
+        if batcher is not None:
+            batcher.submit(event)
+            return None
+    except Exception:
+        if dedup_key is not None:
+            dedup_store.forget(dedup_key)  # type: ignore[union-attr]
+        raise
 
-    return Event(identifier, metadata, data)
+    # The event is published by the webhook after this returns. The key is forgotten
+    # if that fails. See :func:`forget_event`.
+    return event
 
 
 async def accept_event(event: Event) -> tuple[Optional[str], dict[str, Any]]:
     """Accept and process data from the event bus."""
+    topic = event.metadata.get("x-shopify-topic", None) or "unknown"
+    sink = metrics.get_metrics()
+    started_at = time.perf_counter()
+    try:
+        with profiling.profile(
+            "accept_event",
+            metadata={
+                "topic": topic,
+                "shop": event.metadata.get(SHOP_DOMAIN_HEADER, None),
+            },
+        ):
+            return await _accept_event(event)
+    finally:
+        if sink is not None:
+            sink.observe(
+                metrics.WEBHOOK_ACCEPT_DURATION,
+                time.perf_counter() - started_at,
+                topic=metric_topic(topic),
+            )
+            sink.increment(metrics.WEBHOOK_EVENTS, topic=metric_topic(topic))
+
+
+async def _accept_event(event: Event) -> tuple[Optional[str], dict[str, Any]]:
     logger = getLogger(f"{__identifier__}.triggers.accept_event")
 
     event_type = event.metadata.get("x-shopify-topic", None)
@@ -43,30 +197,320 @@ async def accept_event(event: Event) -> tuple[Optional[str], dict[str, Any]]:
     if not isinstance(event.data, dict):
         raise WkflwExecutionException("Unexpected data type for event")
 
-    if event_type == "subscription_billing_attempt/failed":
-        data = schemas.SubscriptionBillingAttempt(**event.data)
+    # These are best effort. The workflow is started even if they fail.
+    if event_type in ORDER_CHANGED_TOPICS:
+        try:
+            invalidate_cached_order(event, ORDER_CHANGED_TOPICS[event_type])
+        except Exception:
+            logger.exception(
+                f"Unable to invalidate the cached order of event id {event.identifier}"
+            )
+    try:
+        mirror_event(event)
+    except Exception:
+        logger.exception(f"Unable to mirror event id {event.identifier}")
 
-        return (
-            "wkflws_shopify.triggers.subscription_billing_attempt_failed",
-            data.dict(by_alias=True),
-        )
-    else:
+    topic = registry.get(event_type)
+    if topic is None:
         logger.warning(
             f"Event type '{event_type}' not supported in event id "
             f"{event.identifier}"
         )
         return None, {}
 
+    with profiling.phase(profiling.VALIDATION):
+        return topic.trigger, topic.process(event.data)
 
-webhook = WebhookTrigger(
-    client_identifier=__identifier__,
-    client_version=__version__,
-    process_func=accept_event,
-    routes=(
-        (
-            (http_method.POST,),
-            "/shopify/webhook/",
-            process_webhook_request,
-        ),
-    ),
-)
+
+def metric_topic(name: Optional[str]) -> str:
+    """Return the ``topic`` label of metrics about a webhook of the topic ``name``.
+
+    Topics which aren't in the registry are labelled ``unknown`` so the number of
+    series can't be inflated by sending webhooks with arbitrary topics.
+    """
+    topic = registry.get(name)
+    return "unknown" if topic is None else topic.name
+
+
+async def serve_metrics(request: Request, response: Response) -> None:
+    """Respond with the metrics in the Prometheus text format.
+
+    Responds with a 404 unless metrics are recorded by a
+    :class:`~wkflws_shopify.metrics.MetricsRegistry`.
+    """
+    sink = metrics.get_metrics()
+    if not isinstance(sink, metrics.MetricsRegistry):
+        response.status_code = 404
+        return None
+
+    response.status_code = 200
+    response.headers = {"Content-Type": metrics.PROMETHEUS_CONTENT_TYPE}
+    response.body = sink.render()
+    return None
+
+
+def invalidate_cached_order(event: Event, order_id_key: str):
+    """Remove the order referenced by ``event`` from the order cache.
+
+    Args:
+        event: The webhook event.
+        order_id_key: The key of the order id in the event's payload.
+    """
+    cache = get_order_cache()
+    shop = event.metadata.get("x-shopify-shop-domain", None)
+    order_id = event.data.get(order_id_key, None)
+    if cache is None or shop is None or order_id is None:
+        return
+
+    cache.invalidate(shop, order_id)
+
+
+def mirror_event(event: Event):
+    """Store the order or customer in ``event`` in the order mirror, if enabled."""
+    mirror = get_order_mirror()
+    shop = event.metadata.get("x-shopify-shop-domain", None)
+    topic = event.metadata.get("x-shopify-topic", None)
+    if mirror is None or shop is None or "id" not in event.data:
+        return
+
+    if topic in MIRRORED_ORDER_TOPICS:
+        mirror.add_order(shop, event.data)
+    elif topic == "orders/delete":
+        mirror.delete_order(shop, event.data["id"])
+    elif topic in MIRRORED_CUSTOMER_TOPICS:
+        mirror.add_customer(shop, event.data)
+
+
+def event_dedup_key(event: Event) -> Optional[str]:
+    """Return the key recorded in the dedup store when ``event`` was received.
+
+    This is the webhook id or, for webhooks without one, the payload's idempotency
+    key. ``None`` is returned if the event has neither.
+    """
+    webhook_id = event.metadata.get("x-shopify-webhook-id", None)
+    if webhook_id:
+        return f"webhook:{webhook_id}"
+
+    idempotency_key = (
+        event.data.get("idempotency_key", None)
+        if isinstance(event.data, dict)
+        else None
+    )
+    if idempotency_key:
+        return f"idempotency_key:{idempotency_key}"
+    return None
+
+
+def forget_event(event: Event):
+    """Forget ``event`` was received so Shopify's redelivery of it is published."""
+    dedup_store = get_dedup_store()
+    key = event_dedup_key(event)
+    if dedup_store is not None and key is not None:
+        dedup_store.forget(key)
+
+
+def ordering_key(event: Event) -> str:
+    """Return the key of events which must be published in the order received.
+
+    This is the shop and the id of the resource (e.g. the order) the event is about.
+    Events which don't reference a resource are ordered with all of the shop's events.
+    """
+    shop = event.metadata.get("x-shopify-shop-domain", "")
+    id_key = ORDER_CHANGED_TOPICS.get(event.metadata.get("x-shopify-topic", ""), "id")
+    resource_id = event.data.get(id_key, None) if isinstance(event.data, dict) else None
+    if resource_id is None:
+        return shop
+    return f"{shop}:{resource_id}"
+
+
+async def publish_events(events: list[Event]) -> PublishResult:
+    """Publish a batch of events keeping the order of events with the same key.
+
+    See :func:`ordering_key`. Returns the events which weren't published. An event
+    isn't published after an event with the same key which failed (except with Kafka
+    where every event is produced before any delivery is known).
+    """
+    logger = getLogger(f"{__identifier__}.triggers.publish_events")
+    webhook = get_webhook()
+    result = PublishResult()
+
+    if webhook.producer is not None:
+        # Every event is handed to the producer before waiting for any delivery so
+        # they are sent to Kafka together. Events with the same key are written to the
+        # same partition in the order they were produced.
+        produced = []
+        deliveries = []
+        for event in events:
+            try:
+                delivery = await webhook.producer.produce(
+                    event=event, key=ordering_key(event), topic=webhook.kafka_topic
+                )
+            except Exception:
+                logger.exception("Failed to produce event %s", event.identifier)
+                result.failed.append(event)
+            else:
+                produced.append(event)
+                deliveries.append(delivery)
+        delivered = await asyncio.gather(*deliveries, return_exceptions=True)
+        for event, outcome in zip(produced, delivered):
+            if isinstance(outcome, BaseException):
+                logger.error(
+                    "Failed to deliver event %s",
+                    event.identifier,
+                    exc_info=outcome,
+                )
+                result.failed.append(event)
+        return result
+
+    groups: dict[str, list[Event]] = {}
+    for event in events:
+        groups.setdefault(ordering_key(event), []).append(event)
+
+    async def send_in_order(group: list[Event]):
+        for index, event in enumerate(group):
+            try:
+                await webhook.send_event(event)
+            except Exception:
+                logger.exception("Failed to publish event %s", event.identifier)
+                result.failed.append(event)
+                # Later events about the same resource wait for this one.
+                result.skipped.extend(itertools.islice(group, index + 1, None))
+                return
+
+    await asyncio.gather(
+        *(send_in_order(group) for group in groups.values()), return_exceptions=True
+    )
+    return result
+
+
+def coalesce_key(event: Event) -> Optional[tuple[str, str, Any]]:
+    """Return the shop, topic and resource id of an event which may be coalesced.
+
+    ``None`` is returned if the event's topic isn't coalesced.
+    """
+    topic = registry.get(event.metadata.get("x-shopify-topic", None))
+    if topic is None or not topic.coalesce or not isinstance(event.data, dict):
+        return None
+
+    resource_id = event.data.get("id", None)
+    if resource_id is None:
+        return None
+    return (event.metadata.get("x-shopify-shop-domain", ""), topic.name, resource_id)
+
+
+async def forward_event(event: Event):
+    """Publish an event released by the coalescer."""
+    batcher = get_event_batcher()
+    if batcher is not None:
+        batcher.submit(event)
+    else:
+        await get_webhook().send_event(event)
+
+
+_event_coalescer: Optional[EventCoalescer] = None
+
+
+def get_event_coalescer() -> Optional[EventCoalescer]:
+    """Return the event coalescer or ``None`` if coalescing is disabled."""
+    global _event_coalescer
+    if _event_coalescer is None and settings.WEBHOOK_COALESCE_ENABLED:
+        _event_coalescer = EventCoalescer(
+            forward_event,
+            window=settings.WEBHOOK_COALESCE_WINDOW,
+            max_size=settings.WEBHOOK_COALESCE_MAX_SIZE,
+        )
+    return _event_coalescer
+
+
+def set_event_coalescer(coalescer: Optional[EventCoalescer]):
+    """Replace the event coalescer.
+
+    Args:
+        coalescer: The new coalescer. ``None`` resets the coalescer to the one
+            configured in settings.
+    """
+    global _event_coalescer
+    _event_coalescer = coalescer
+
+
+_event_batcher: Optional[EventBatcher] = None
+
+
+def get_event_batcher() -> Optional[EventBatcher]:
+    """Return the event batcher or ``None`` if batching is disabled."""
+    global _event_batcher
+    if _event_batcher is None and settings.WEBHOOK_BATCH_ENABLED:
+        _event_batcher = EventBatcher(
+            publish_events,
+            max_size=settings.WEBHOOK_BATCH_MAX_SIZE,
+            linger=settings.WEBHOOK_BATCH_LINGER,
+            # Accept Shopify's redelivery of the webhook, if any.
+            on_drop=forget_event,
+        )
+    return _event_batcher
+
+
+def set_event_batcher(batcher: Optional[EventBatcher]):
+    """Replace the event batcher.
+
+    Args:
+        batcher: The new batcher. ``None`` resets the batcher to the one configured in
+            settings.
+    """
+    global _event_batcher
+    _event_batcher = batcher
+
+
+_webhook: Optional["WebhookTrigger"] = None
+
+
+def get_webhook() -> "WebhookTrigger":
+    """Return the webhook trigger, creating it the first time it's used.
+
+    The webhook stack (FastAPI, gunicorn, uvicorn) is slow to import and only the
+    listener process needs it. The event consumer only needs :func:`accept_event`.
+    """
+    global _webhook
+    if _webhook is None:
+        from wkflws.triggers.webhook import WebhookTrigger
+
+        class ShopifyWebhookTrigger(WebhookTrigger):
+            async def send_event(self, event: Event):
+                try:
+                    await super().send_event(event)
+                except Exception:
+                    # The request is answered with an error. Shopify's redelivery
+                    # must not be acknowledged as a duplicate.
+                    forget_event(event)
+                    raise
+
+        routes: list[tuple[tuple[http_method, ...], str, Any]] = [
+            ((http_method.POST,), "/shopify/webhook/", process_webhook_request),
+        ]
+        if settings.METRICS_ENABLED:
+            routes.append(((http_method.GET,), "/shopify/metrics/", serve_metrics))
+
+        _webhook = ShopifyWebhookTrigger(
+            client_identifier=__identifier__,
+            client_version=__version__,
+            process_func=accept_event,
+            routes=tuple(routes),
+        )
+        # Publish queued events before the Kafka producer is closed on shutdown.
+        _webhook.app.router.on_shutdown.insert(0, flush_pending_events)
+    return _webhook
+
+
+async def flush_pending_events():
+    """Publish the events held by the event coalescer and batcher."""
+    if _event_coalescer is not None:
+        await _event_coalescer.flush()
+    if _event_batcher is not None:
+        await _event_batcher.flush()
+
+
+def __getattr__(name: str) -> Any:
+    # ``webhook`` is created lazily. See :func:`get_webhook`.
+    if name == "webhook":
+        return get_webhook()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,38 @@
+import json
+import sys
+from typing import Any
+
+
+async def orders_create(
+    data: dict[str, Any],
+    context: dict[str, Any],
+) -> dict[str, Any]:
+    """Trigger after an order is created.
+
+    Args:
+        data: The message payload
+        context: Contextual information about the workflow being executed.
+    """
+    # all data preparation is completed by the trigger's event handler.
+    return data
+
+
+if __name__ == "__main__":  # pragma: no cover
+    import asyncio
+
+    try:
+        message = json.loads(sys.argv[1])
+    except IndexError:
+        raise ValueError("missing required `message` argument") from None
+
+    try:
+        context = json.loads(sys.argv[2])
+    except IndexError:
+        raise ValueError("missing `context` argument") from None
+
+    output = asyncio.run(orders_create(message, context))
+
+    if output is None:
+        sys.exit(1)
+
+    print(json.dumps(output))
@@ -0,0 +1,159 @@
+"""Map Shopify webhook topics to the trigger started for them.
+
+Each supported topic is declared once in :data:`registry` with the schema used to
+validate its payload and the identifier of the trigger node that starts a workflow.
+Adding support for a new topic only requires a new declaration (and the trigger
+node).
+"""
+
+from dataclasses import dataclass
+import enum
+from functools import lru_cache
+from typing import Any, Iterator, Optional, Type
+
+from pydantic import BaseModel
+
+from . import schemas
+from ..encoders import encode_default
+from ..schemas.webhooks import WebhookCustomer, WebhookOrder
+
+
+@dataclass(frozen=True)
+class Topic:
+    """Describe how a webhook topic is processed."""
+
+    #: Shopify's name for the topic (i.e. the ``x-shopify-topic`` header)
+    name: str
+    #: identifier of the trigger node started when the topic is received
+    trigger: str
+    #: validates the webhook's payload and translates it into the trigger's input
+    schema: Type[BaseModel]
+    #: bursts of webhooks about the same resource may be coalesced into the newest
+    #: (see :mod:`wkflws_shopify.triggers.coalesce`)
+    coalesce: bool = False
+
+    def process(self, payload: dict[str, Any]) -> dict[str, Any]:
+        """Validate ``payload`` and return the trigger's JSON serializable input.
+
+        Raises:
+            pydantic.ValidationError: The payload is invalid.
+        """
+        return jsonable(self.schema(**payload))
+
+
+#: Types which are output as they are by :func:`jsonable`.
+_JSON_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def jsonable(value: Any) -> Any:
+    """Return ``value`` with the types JSON doesn't support converted.
+
+    Models are converted like ``.dict(by_alias=True)`` and other values are encoded
+    like :mod:`wkflws_shopify.serialization` encodes them (e.g. ``Decimal`` as a
+    string), without serializing to JSON and parsing the result. Dictionary keys are
+    expected to be strings.
+    """
+    value_type = type(value)
+    if value_type in _JSON_TYPES:
+        return value
+    if isinstance(value, BaseModel):
+        aliases = _aliases(value_type)
+        return {aliases.get(k, k): jsonable(v) for k, v in value.__dict__.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {k: jsonable(v) for k, v in value.items()}
+    if isinstance(value, enum.Enum):
+        return jsonable(value.value)
+    return encode_default(value)
+
+
+@lru_cache(maxsize=None)
+def _aliases(model: Type[BaseModel]) -> dict[str, str]:
+    """Return the alias of each field of ``model`` keyed by the field's name."""
+    return {name: field.alias for name, field in model.__fields__.items()}
+
+
+class TopicRegistry:
+    """A collection of :class:`Topic` objects indexed by name."""
+
+    def __init__(self) -> None:
+        self._topics: dict[str, Topic] = {}
+
+    def register(
+        self,
+        name: str,
+        *,
+        trigger: str,
+        schema: Type[BaseModel],
+        coalesce: bool = False,
+    ) -> Topic:
+        """Declare how the topic ``name`` is processed.
+
+        Args:
+            name: Shopify's name for the topic (e.g. ``orders/create``)
+            trigger: The identifier of the trigger node to start.
+            schema: The model used to validate the topic's payload.
+            coalesce: Whether bursts of webhooks about the same resource may be
+                coalesced. The payload must contain ``id`` and ``updated_at``.
+
+        Raises:
+            ValueError: The topic has already been registered.
+        """
+        if name in self._topics:
+            raise ValueError(f"Topic {name} is already registered.")
+        topic = self._topics[name] = Topic(
+            name=name, trigger=trigger, schema=schema, coalesce=coalesce
+        )
+        return topic
+
+    def get(self, name: Optional[str]) -> Optional[Topic]:
+        """Return the topic ``name`` or ``None`` if it isn't supported."""
+        if name is None:
+            return None
+        return self._topics.get(name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._topics
+
+    def __iter__(self) -> Iterator[Topic]:
+        return iter(self._topics.values())
+
+    def __len__(self) -> int:
+        return len(self._topics)
+
+
+#: The topics supported by the listener.
+registry = TopicRegistry()
+registry.register(
+    "subscription_billing_attempt/failed",
+    trigger="wkflws_shopify.triggers.subscription_billing_attempt_failed",
+    schema=schemas.SubscriptionBillingAttempt,
+)
+registry.register(
+    "orders/create",
+    trigger="wkflws_shopify.triggers.orders_create",
+    schema=WebhookOrder,
+)
+registry.register(
+    "orders/updated",
+    trigger="wkflws_shopify.triggers.orders_updated",
+    schema=WebhookOrder,
+    coalesce=True,
+)
+registry.register(
+    "orders/cancelled",
+    trigger="wkflws_shopify.triggers.orders_cancelled",
+    schema=WebhookOrder,
+)
+registry.register(
+    "customers/create",
+    trigger="wkflws_shopify.triggers.customers_create",
+    schema=WebhookCustomer,
+)
+registry.register(
+    "customers/update",
+    trigger="wkflws_shopify.triggers.customers_update",
+    schema=WebhookCustomer,
+    coalesce=True,
+)
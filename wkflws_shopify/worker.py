@@ -0,0 +1,287 @@
+"""Long running worker executing many node requests in a single process.
+
+Running a node with ``python -m wkflws_shopify.get_order '<message>' '<context>'``
+pays for interpreter startup and imports on every execution. The worker instead reads
+newline delimited JSON requests from stdin (or a unix socket) and writes a JSON
+response for each one. Requests are executed concurrently on one event loop so HTTP
+connections, rate limits and caches are shared between executions.
+
+Each request is a JSON object on a single line:
+
+.. code::json
+   {"id": 1, "node": "wkflws_shopify.get_order", "message": {}, "context": {}}
+
+Each response contains the request's ``id`` and either the node's ``output`` or an
+``error``. Responses are written as requests complete and may be out of order. Nodes
+which record progress (see :data:`ON_DELIVERED`) only do so once their response was
+written. A request longer than :data:`MAX_REQUEST_SIZE` is skipped and answered with
+an error whose ``id`` is ``null``.
+
+.. code::json
+   {"id": 1, "output": {}}
+   {"id": 2, "error": {"type": "ValidationError", "message": "..."}}
+
+Usage::
+
+    python -m wkflws_shopify.worker [--socket PATH] [--max-concurrency N]
+"""
+
+import argparse
+import asyncio
+import functools
+import importlib
+from logging import getLogger
+import os
+import sys
+from typing import Any, Awaitable, Callable, Optional
+
+from . import __identifier__, serialization
+
+#: Nodes the worker can execute mapped to the ``module:function`` implementing them.
+#: Modules are imported the first time the node is requested.
+NODES = {
+    "wkflws_shopify.get_order": "wkflws_shopify.get_order.node:get_order",
+    "wkflws_shopify.get_orders": "wkflws_shopify.get_orders.node:get_orders",
+    "wkflws_shopify.sync_orders": "wkflws_shopify.sync_orders.node:sync_orders",
+    "wkflws_shopify.query_orders": "wkflws_shopify.query_orders.node:query_orders",
+    "wkflws_shopify.triggers.subscription_billing_attempt_failed": (
+        "wkflws_shopify.triggers.subscription_billing_attempt_failed:"
+        "subscription_billing_attempt_failed"
+    ),
+    "wkflws_shopify.triggers.orders_create": (
+        "wkflws_shopify.triggers.orders_create:orders_create"
+    ),
+    "wkflws_shopify.triggers.orders_updated": (
+        "wkflws_shopify.triggers.orders_updated:orders_updated"
+    ),
+    "wkflws_shopify.triggers.orders_cancelled": (
+        "wkflws_shopify.triggers.orders_cancelled:orders_cancelled"
+    ),
+    "wkflws_shopify.triggers.customers_create": (
+        "wkflws_shopify.triggers.customers_create:customers_create"
+    ),
+    "wkflws_shopify.triggers.customers_update": (
+        "wkflws_shopify.triggers.customers_update:customers_update"
+    ),
+}
+
+#: Functions called with a request's message, context and output once the node's
+#: output was written, mapped to the node.
+ON_DELIVERED = {
+    "wkflws_shopify.sync_orders": "wkflws_shopify.sync_orders.node:commit_checkpoint",
+}
+
+#: Maximum size in bytes of a request. Longer requests are answered with an error.
+MAX_REQUEST_SIZE = 2**24
+
+NodeFunc = Callable[[dict[str, Any], dict[str, Any]], Awaitable[dict[str, Any]]]
+
+logger = getLogger(f"{__identifier__}.worker")
+
+_node_funcs: dict[str, NodeFunc] = {}
+
+
+def get_node_func(node: str) -> NodeFunc:
+    """Return the function implementing ``node``.
+
+    Raises:
+        KeyError: The node is not supported by the worker.
+    """
+    try:
+        return _node_funcs[node]
+    except KeyError:
+        func = _node_funcs[node] = _import(NODES[node])
+        return func
+
+
+def _import(path: str) -> Any:
+    """Return the object at ``path`` (i.e. ``module:name``)."""
+    module_name, name = path.split(":")
+    return getattr(importlib.import_module(module_name), name)
+
+
+async def handle_request(line: bytes) -> dict[str, Any]:
+    """Execute the node request in ``line`` and return the response."""
+    response, _ = await _handle_request(line)
+    return response
+
+
+async def _handle_request(
+    line: bytes,
+) -> tuple[dict[str, Any], Optional[Callable[[], None]]]:
+    """Execute the node request in ``line``.
+
+    Returns the response and, if the node has one, the function to call once the
+    response was written. See :data:`ON_DELIVERED`.
+    """
+    request_id = None
+    try:
+        request = serialization.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+        request_id = request.get("id", None)
+
+        try:
+            func = get_node_func(request["node"])
+        except KeyError:
+            raise ValueError(f"unsupported node {request.get('node')!r}") from None
+
+        message = request.get("message", {})
+        context = request.get("context", {})
+        output = await func(message, context)
+        if output is None:
+            raise ValueError("received null output")
+    except Exception as e:
+        logger.exception("Request %s failed", request_id)
+        return {
+            "id": request_id,
+            "error": {"type": type(e).__name__, "message": str(e)},
+        }, None
+
+    delivered = None
+    if request["node"] in ON_DELIVERED:
+        on_delivered = _import(ON_DELIVERED[request["node"]])
+        delivered = functools.partial(on_delivered, message, context, output)
+    return {"id": request_id, "output": output}, delivered
+
+
+async def serve(
+    reader: asyncio.StreamReader,
+    write: Callable[[bytes], Awaitable[None]],
+    *,
+    max_concurrency: int = 100,
+):
+    """Execute each request read from ``reader`` until it is closed.
+
+    Args:
+        reader: The stream of newline delimited requests.
+        write: Writes a single encoded response.
+        max_concurrency: The maximum number of requests executed at once. Reading is
+            paused while this many requests are in progress.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks: set[asyncio.Task] = set()
+
+    async def run(line: bytes):
+        try:
+            response, delivered = await _handle_request(line)
+            await write(serialization.dumps(response) + b"\n")
+            if delivered is not None:
+                try:
+                    delivered()
+                except Exception:
+                    logger.exception("Request %s failed after delivery", response["id"])
+        finally:
+            semaphore.release()
+
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            line = e.partial  # the last request may not end with a newline.
+        except asyncio.LimitOverrunError:
+            await _discard_line(reader)
+            logger.error("Request exceeds %s bytes", MAX_REQUEST_SIZE)
+            error = {
+                "type": "LimitOverrunError",
+                "message": f"request exceeds {MAX_REQUEST_SIZE} bytes",
+            }
+            await write(serialization.dumps({"id": None, "error": error}) + b"\n")
+            continue
+        if not line:
+            break
+        if not line.strip():
+            continue
+
+        await semaphore.acquire()
+        task = asyncio.create_task(run(line))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def _discard_line(reader: asyncio.StreamReader):
+    """Discard the rest of the current line, which exceeds the reader's limit."""
+    while True:
+        try:
+            await reader.readuntil(b"\n")
+            return
+        except asyncio.LimitOverrunError as e:
+            # Drop the buffered part of the line (up to the newline if it was found).
+            await reader.readexactly(e.consumed)
+        except asyncio.IncompleteReadError:
+            return
+
+
+async def serve_stdio(*, max_concurrency: int = 100):
+    """Execute requests read from stdin writing responses to stdout."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_REQUEST_SIZE)
+    await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), sys.stdin
+    )
+
+    async def write(data: bytes):
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+    await serve(reader, write, max_concurrency=max_concurrency)
+
+
+async def serve_socket(path: str, *, max_concurrency: int = 100):
+    """Execute requests received on the unix socket ``path``.
+
+    Each connection is a separate stream of requests and responses.
+    """
+
+    async def handle_connection(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        lock = asyncio.Lock()
+
+        async def write(data: bytes):
+            async with lock:
+                writer.write(data)
+                await writer.drain()
+
+        try:
+            await serve(reader, write, max_concurrency=max_concurrency)
+        finally:
+            writer.close()
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(
+        handle_connection, path, limit=MAX_REQUEST_SIZE
+    )
+    logger.info("Listening on %s", path)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[list[str]] = None):
+    """Run the worker."""
+    parser = argparse.ArgumentParser(
+        prog="python -m wkflws_shopify.worker", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument(
+        "--socket", help="listen on this unix socket instead of stdin/stdout"
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=100,
+        help="maximum number of requests executed at once",
+    )
+    args = parser.parse_args(argv)
+
+    if args.socket:
+        asyncio.run(serve_socket(args.socket, max_concurrency=args.max_concurrency))
+    else:
+        asyncio.run(serve_stdio(max_concurrency=args.max_concurrency))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()